@@ -0,0 +1,310 @@
+import numpy as np
+
+import Greedy_MOD
+
+from Bitboard import ALL_CARDS, CARD_BITS
+
+
+## Card Arrays
+
+# Card ids are the bit indices of Bitboard (ALL_CARDS order); -1 marks an empty slot.
+
+# Index -1 (an empty slot) reads the extra last entry: rank 0, no card.
+RANKS = np.array([rank for rank, suit in ALL_CARDS] + [0])
+
+
+def PackCards(
+    Rows: list,
+    Width: int = None
+    ) -> np.ndarray:
+    """
+    Converts lists of cards (tuples) into a (N, Width) array of card ids, keeping their order, padded with -1.
+
+    Args:
+        Rows (list): N lists of cards, e.g. the hands or the tables of N positions.
+        Width (int, optional): the number of columns. Defaults to the longest row.
+
+    Returns:
+        np.ndarray: the card ids.
+    """
+
+    Width = max((len(row) for row in Rows), default=0) if Width is None else Width
+    Packed = np.full((len(Rows), Width), -1, dtype=np.int64)
+    for i, row in enumerate(Rows):
+        Packed[i, :len(row)] = [CARD_BITS[tuple(card)] for card in row]
+    return Packed
+
+
+def CardValues(values: dict = Greedy_MOD.values) -> np.ndarray:
+    """
+    The value of each card id, with a 0 for the empty slot at index -1.
+    """
+    return np.array([values[card] for card in ALL_CARDS] + [0], dtype=np.int64)
+
+
+## Capture Templates
+
+# A capture template is a rank multiset; BatchGreedy and BatchRollout.BatchRolloutEngine each enumerate their own templates
+# with Partitions and share the helpers below.
+
+def Partitions(
+    target: int,
+    rank: int = 1
+    ) -> list:
+    """
+    All the rank multisets (at most 4 cards per rank) adding up to target, using ranks >= rank, as lists of ten counts.
+    """
+
+    if target == 0:
+        return [[0] * 10]
+    if rank > target:
+        return []
+
+    partitions = []
+    for k in range(min(4, target // rank) + 1):
+        for rest in Partitions(target - k * rank, rank + 1):
+            rest = list(rest)
+            rest[rank - 1] = k
+            partitions.append(rest)
+
+    return partitions
+
+
+def TemplateGrid(
+    TemplateRanks: np.ndarray,
+    Padding: int
+    ) -> np.ndarray:
+    """
+    The templates of each rank: row r - 1 holds the indices of the templates of rank r, in order, padded with Padding
+    (at least one column).
+    """
+
+    Grid = np.full((10, max(np.bincount(TemplateRanks, minlength=11).max(), 1)), Padding)
+    for rank in range(1, 11):
+        templates = np.flatnonzero(TemplateRanks == rank)
+        Grid[rank - 1, :len(templates)] = templates
+
+    return Grid
+
+
+# Rank counts are packed in 4-bit fields, so that "the table holds the template" is one SWAR subtraction:
+# with the guard bit (8) set in every field, a field keeps it after subtracting the template count iff the count is enough.
+FIELDS = np.int64(16) ** np.arange(10, dtype=np.int64)
+GUARD = np.int64(8 * FIELDS.sum())
+
+
+def Holds(
+    Packed: np.ndarray,
+    PackedTemplates: np.ndarray
+    ) -> np.ndarray:
+    """
+    Whether each of the (N,) packed tables holds each of the (T,) packed templates, as a (N, T) boolean matrix.
+    """
+    return ((Packed | GUARD)[:, None] - PackedTemplates) & GUARD == GUARD
+
+
+# The combinations of BasicPlay are subsets of at least two table cards; their value only depends on their rank multiset,
+# because each rank is resolved to the first table card of that rank.
+TEMPLATES = np.array([counts for target in range(2, 11) for counts in Partitions(target) if sum(counts) >= 2])
+TEMPLATE_RANKS = TEMPLATES @ np.arange(1, 11)
+TEMPLATE_SIZES = TEMPLATES.sum(axis=1)
+PACKED_TEMPLATES = TEMPLATES @ FIELDS
+
+# TEMPLATE_GRID[r - 1]: the templates of rank r, padded with index T (a column that is never feasible).
+T = len(TEMPLATES)
+TEMPLATE_GRID = TemplateGrid(TEMPLATE_RANKS, T)
+
+# TEMPLATE_SLOTS[r * 4 + j, t]: whether template t takes the (j + 1)-th table card of rank r + 1 (never for the padding T).
+TEMPLATE_SLOTS = np.zeros((40, T + 1), dtype=np.int64)
+TEMPLATE_SLOTS[:, :T] = (np.arange(4)[None, :, None] < TEMPLATES.T[:, None, :]).reshape(40, T)
+GRID_SLOTS = TEMPLATE_SLOTS[:, TEMPLATE_GRID]
+
+# The score of a template is 16 times its value plus 15 minus its number of cards: the most valuable, then the smallest.
+# Scores are computed as floats, which numpy multiplies much faster than integers: they are small, so exact.
+SCORE_TEMPLATES = 16 * TEMPLATES.T.astype(np.float64)
+SCORE_SIZES = 15 - TEMPLATE_SIZES
+
+
+def SlotWeights(
+    Matches: np.ndarray,
+    Weights: np.ndarray
+    ) -> np.ndarray:
+    """
+    The weight of each table card by rank and ordinal: SlotWeights(...)[:, r * 4 + j] is the weight of the (j + 1)-th
+    table card of rank r + 1, 0 if there is none.
+
+    Args:
+        Matches (np.ndarray): a (K, M, 10) array, whether table slot p holds a card of rank r + 1.
+        Weights (np.ndarray): the (M,) weights of the table slots.
+    """
+
+    Ordinals = np.cumsum(Matches, axis=1)
+    NthWeights = np.zeros((len(Matches), 10, 4), dtype=np.int64)
+    for j in range(4):
+        NthWeights[:, :, j] = (Weights[None, :, None] * (Matches & (Ordinals == j + 1))).sum(axis=1)
+
+    return NthWeights.reshape(len(Matches), 40)
+
+
+## Batch Greedy
+
+# Kinds of decision, matching the shape of the move returned by Greedy_MOD.Greedy.
+PLACE, SINGLE, COMBINATION, SCOPA = 0, 1, 2, 3
+
+
+def BatchGreedy(
+    Hands: np.ndarray,
+    Tables: np.ndarray,
+    values: dict = Greedy_MOD.values
+    ) -> tuple:
+    """
+    Takes the decisions of Greedy_MOD.Greedy for N positions at once.
+
+    Hands and tables are arrays of card ids (see PackCards) in the order of the lists the scalar function would receive,
+    since its tie-breaks depend on it; -1 entries are skipped, so rows can have holes. The decisions match the scalar
+    function exactly, quirks included:
+
+    - a scopa plays the most valuable card whose rank is the sum of the table (the first one in the hand on ties);
+    - a card whose rank is on the table can only take the first table card of that rank;
+    - otherwise each combination of table cards adding up to the card is resolved rank by rank to the first table card of
+      that rank (so a rank can be repeated), and the most valuable one is kept, the first in itertools.combinations order;
+    - the capture with the most points (card plus taken cards) is played, the first in the hand on ties;
+    - without captures, the least valuable card is placed; ties follow the iteration order of the set built by BasicPlay,
+      and those rows are resolved by building that set.
+
+    Args:
+        Hands (np.ndarray): a (N, H) array of card ids.
+        Tables (np.ndarray): a (N, M) array of card ids, M <= 62.
+        values (dict, optional): points associated to each card. Defaults to Greedy_MOD.values.
+
+    Returns:
+        tuple:
+            - a (N,) array with the played cards (-1 for an empty hand);
+            - a (N, M) array with the taken cards, in the order of the scalar move, padded with -1;
+            - a (N,) array with the kind of each decision (PLACE, SINGLE, COMBINATION or SCOPA).
+    """
+
+    Hands = np.asarray(Hands, dtype=np.int64).reshape(len(Hands), -1)
+    Tables = np.asarray(Tables, dtype=np.int64).reshape(len(Tables), -1)
+    if Tables.shape[1] == 0:
+        Tables = np.full((len(Tables), 1), -1, dtype=np.int64)
+    N, M = Tables.shape
+    if M > 62:
+        raise ValueError(f"BatchGreedy supports tables of at most 62 slots, got {M}.")
+
+    Rows = np.arange(N)
+    Values = CardValues(values)
+
+    HandValid = Hands >= 0
+    HandRanks = RANKS[Hands]
+    HandValues = Values[Hands]
+    TableRanks = RANKS[Tables]
+
+    ### Scopa: the rank of the card is the sum of the table.
+
+    Brooms = HandValid & (HandRanks == TableRanks.sum(axis=1)[:, None])
+    HasScopa = Brooms.any(axis=1)
+    Broom = np.argmax(np.where(Brooms, HandValues, -1), axis=1)
+
+    ### The first table card of each rank, and the slots of the table cards of each rank.
+
+    Matches = TableRanks[:, :, None] == np.arange(1, 11)
+    OnTable = Matches.any(axis=1)
+    FirstIds = np.where(OnTable, Tables[Rows[:, None], Matches.argmax(axis=1)], -1)
+    FirstValues = Values[FirstIds]
+
+    # Slot p weighs 2 ** (M - 1 - p): among position sets of the same size, the larger key comes first in combinations order.
+    # The key of a template is the sum of the weights of the slots it takes (see SlotWeights and TEMPLATE_SLOTS).
+    Weights = np.left_shift(np.int64(1), np.arange(M - 1, -1, -1, dtype=np.int64))
+
+    ### Combinations: the best template of each rank (value, then fewer cards, then the first in combinations order).
+
+    Packed = Matches.sum(axis=1) @ FIELDS
+    Feasible = np.zeros((N, T + 1), dtype=bool)
+    Feasible[:, :T] = Holds(Packed, PACKED_TEMPLATES)
+
+    TemplateScores = np.full((N, T + 1), -1, dtype=np.int64)
+    TemplateScores[:, :T] = FirstValues @ SCORE_TEMPLATES + SCORE_SIZES
+    TemplateScores[~Feasible] = -1
+
+    GridScores = TemplateScores[:, TEMPLATE_GRID]
+    BestScores = GridScores.max(axis=2)
+    HasCombination = BestScores >= 0
+    BestValues = np.where(HasCombination, BestScores >> 4, -1)
+    Candidates = (GridScores == BestScores[:, :, None]) & HasCombination[:, :, None]
+    BestTemplates = TEMPLATE_GRID[np.arange(10), np.argmax(Candidates, axis=2)]
+
+    # Only the few (position, rank) cells left with several candidates need the keys of their templates.
+    TieRows, TieRanks = np.nonzero(Candidates.sum(axis=2) > 1)
+    if len(TieRows):
+        TieKeys = np.einsum("kj,jkt->kt", SlotWeights(Matches[TieRows], Weights), GRID_SLOTS[:, TieRanks])
+        TieKeys = np.where(Candidates[TieRows, TieRanks], TieKeys, -1)
+        BestTemplates[TieRows, TieRanks] = TEMPLATE_GRID[TieRanks, np.argmax(TieKeys, axis=1)]
+
+    ### The capture with the most points, the first in the hand on ties.
+
+    HandRankIndex = np.maximum(HandRanks - 1, 0)
+    Single = HandValid & OnTable[Rows[:, None], HandRankIndex]
+    Combination = HandValid & ~Single & HasCombination[Rows[:, None], HandRankIndex]
+    Picks = np.where(Single, FirstValues[Rows[:, None], HandRankIndex], BestValues[Rows[:, None], HandRankIndex])
+    Points = np.where(Single | Combination, HandValues + Picks, -1)
+    HasCapture = (Points >= 0).any(axis=1)
+    Capture = np.argmax(Points, axis=1)
+
+    ### Placing the least valuable card.
+
+    Lowest = np.where(HandValid, HandValues, np.iinfo(np.int64).max)
+    Place = np.argmin(Lowest, axis=1)
+    Tied = ((Lowest == Lowest[Rows, Place][:, None]).sum(axis=1) > 1) & HandValid.any(axis=1) & ~HasScopa & ~HasCapture
+    for row in np.flatnonzero(Tied):
+        # BasicPlay returns list(set(possible_plays)): the first least valuable card in that order is placed.
+        card = min(set(ALL_CARDS[k] for k in Hands[row] if k >= 0), key=values.__getitem__)
+        Place[row] = np.flatnonzero(Hands[row] == CARD_BITS[card])[0]
+
+    ### Decisions.
+
+    Kinds = np.select([HasScopa, HasCapture & Single[Rows, Capture], HasCapture], [SCOPA, SINGLE, COMBINATION], PLACE)
+    Choice = np.select([HasScopa, HasCapture], [Broom, Capture], Place)
+    Cards = np.where(HandValid.any(axis=1), Hands[Rows, Choice], -1)
+    Ranks = np.maximum(RANKS[Cards] - 1, 0)
+
+    Taken = np.full((N, M), -1, dtype=np.int64)
+    Taken[Kinds == SCOPA] = Tables[Kinds == SCOPA]
+
+    Taken[:, 0] = np.where(Kinds == SINGLE, FirstIds[Rows, Ranks], Taken[:, 0])
+
+    # A combination takes the slots of the first table cards of each rank of its template (as many as the template counts),
+    # and each slot resolves to the first table card of its rank.
+    Combined = np.flatnonzero(Kinds == COMBINATION)
+    Counts = TEMPLATES[BestTemplates[Combined, Ranks[Combined]]]
+    Ordinals = (np.cumsum(Matches[Combined], axis=1) * Matches[Combined]).sum(axis=2)
+    Slots = np.zeros((N, M), dtype=bool)
+    Slots[Combined] = (Tables[Combined] >= 0) & (Ordinals <= Counts[np.arange(len(Combined))[:, None], np.maximum(TableRanks[Combined] - 1, 0)])
+    SlotIds = FirstIds[Rows[:, None], np.maximum(TableRanks - 1, 0)]
+    Taken = np.where(Slots, SlotIds, Taken)
+
+    # Skip the holes, keeping the order.
+    Order = np.argsort(Taken < 0, axis=1, kind="stable")
+    Taken = np.take_along_axis(Taken, Order, axis=1)
+
+    return Cards, Taken, Kinds
+
+
+def DecisionToMove(
+    Card: int,
+    Taken: np.ndarray,
+    Kind: int
+    ) -> dict:
+    """
+    Converts one decision of BatchGreedy into the move returned by Greedy_MOD.Greedy(..., Standalone=False).
+
+    Returns:
+        dict: {card to be played: card (single pick), list of cards (combination or scopa) or [] (no pick)}.
+    """
+
+    card = ALL_CARDS[Card]
+    taken = [ALL_CARDS[k] for k in Taken if k >= 0]
+
+    if Kind == SINGLE:
+        return {card: taken[0]}
+    return {card: taken}
@@ -0,0 +1,289 @@
+import random
+
+import numpy as np
+
+import BatchGreedy
+
+from BatchGreedy import FIELDS, Holds, Partitions, TemplateGrid
+from Bitboard import ALL_CARDS, EncodeCards
+from MCTS import AgentCarletto
+
+
+## Precomputed Tables
+
+# Card k of the deck is bit k of a mask, as in Bitboard: k = (suit - 1) * 10 + (rank - 1).
+
+CARD_RANKS = np.array([rank for rank, suit in ALL_CARDS])
+
+# RANK_BITS[r - 1, s - 1] is the bit of the card of rank r and suit s.
+RANK_BITS = np.array([[(suit - 1) * 10 + rank - 1 for suit in range(1, 5)] for rank in range(1, 11)])
+RANK_MASKS = np.left_shift(np.int64(1), RANK_BITS.astype(np.int64))
+
+# A capture template is a rank multiset that can be taken by a card of rank TEMPLATE_RANKS[t].
+# The last row (index T) is the empty template, used for the moves that place a card on the table.
+TEMPLATES = np.array([counts for target in range(1, 11) for counts in Partitions(target)] + [[0] * 10])
+T = len(TEMPLATES) - 1
+TEMPLATE_RANKS = TEMPLATES @ np.arange(1, 11)
+TEMPLATE_ONEHOT = np.eye(11, dtype=np.int64)[TEMPLATE_RANKS[:T]][:, 1:]
+CARD_RANK_INDEX = CARD_RANKS - 1
+
+# Rank counts are packed as in BatchGreedy (see BatchGreedy.Holds).
+PACKED_TEMPLATES = TEMPLATES[:T] @ FIELDS
+
+# TEMPLATE_GRID[r - 1]: the templates of rank r (templates are sorted by rank), padded with the empty template T.
+TEMPLATE_GRID = TemplateGrid(TEMPLATE_RANKS[:T], T)
+
+# FIRST_K[pattern, k]: the k lowest set bits of a 4-bit suit pattern (suit Ori first, the most valuable).
+FIRST_K = np.zeros((16, 5), dtype=np.int64)
+for _pattern in range(16):
+    for _k in range(5):
+        _taken, _left = 0, _k
+        for _suit in range(4):
+            if _pattern >> _suit & 1 and _left:
+                _taken |= 1 << _suit
+                _left -= 1
+        FIRST_K[_pattern, _k] = _taken
+del _pattern, _k, _taken, _left, _suit
+
+
+def MaskBits(masks: np.ndarray) -> np.ndarray:
+    """
+    Expands an array of K masks into a (K, 40) boolean matrix.
+    """
+    return (masks[:, None] >> np.arange(40, dtype=np.int64)) & 1 == 1
+
+
+def BitIds(bits: np.ndarray) -> np.ndarray:
+    """
+    The card ids of a (K, 40) boolean matrix, in bit order, as a (K, W) array padded with -1 (see BatchGreedy.PackCards),
+    W being the most cards in a row.
+    """
+
+    Width = max(1, int(bits.sum(axis=1).max()))
+    Ids = np.sort(np.where(bits, np.arange(40), 40), axis=1)[:, :Width]
+    return np.where(Ids < 40, Ids, -1)
+
+
+def IdsMask(ids: np.ndarray) -> np.ndarray:
+    """
+    The (K,) masks of a (K, W) array of card ids padded with -1. A card repeated in a row counts once.
+    """
+    return np.bitwise_or.reduce(np.where(ids >= 0, np.left_shift(np.int64(1), np.maximum(ids, 0)), 0), axis=1)
+
+
+## `BatchRolloutEngine`
+
+class BatchRolloutEngine(object):
+    """
+    Plays K rollouts of the same leaf GameState at once, as NumPy arrays with one row per rollout:
+
+    - Hands: (K, 4) card masks;
+    - Table: (K,) card masks;
+    - Scores: (K, 2) team scores (Hand, Deck);
+    - LastTaker: (K,) position of the last player to take cards (-1 if nobody did).
+
+    All rows play in lockstep, in the same turn order as AgentCarletto.PlayTurn: the agent plays a uniformly random legal move,
+    the other players take the decisions of Greedy_MOD.Greedy (see BatchGreedy), rules and quirks included: a card whose rank
+    is on the table takes the single card, and a combination repeating a rank only takes its first table card once.
+    The hands and the table are masks, so Greedy sees their cards in bit order, not in the order of the scalar lists:
+    only its tie-breaks between equal moves may differ.
+
+    The agent's legal moves are vectorized at the level of rank multisets ("templates"): the taken cards of each rank are the
+    most valuable ones on the table. Its random move is uniform over (card, template) pairs instead of over the card subsets
+    of the scalar rollout, which is the remaining difference between the two (see Benchmarks.BenchmarkBatchRollout).
+    """
+
+    def __init__(
+        self,
+        GameState,
+        Count: int,
+        Generator: np.random.Generator = None
+        ) -> None:
+        """
+        Args:
+            GameState (IGameState): the leaf GameState, at the agent's turn.
+            Count (int): the number of rollouts K.
+            Generator (np.random.Generator, optional): the random generator. Defaults to one seeded from the random module.
+        """
+
+        self.Count = Count
+        self.Generator = Generator if Generator is not None else np.random.default_rng(random.getrandbits(64))
+        self.AgentPosition = GameState.PlayerPosition
+        self.AgentTeam = 0 if GameState.Team == "Hand" else 1
+        self.values = GameState.values
+        self.Values = BatchGreedy.CardValues(GameState.values)[:40]
+
+        self.Hands = np.tile(np.array([EncodeCards(GameState.PlayersCards[player]) for player in range(4)], dtype=np.int64), (Count, 1))
+        self.Table = np.full(Count, EncodeCards(GameState.Table), dtype=np.int64)
+        self.Scores = np.tile(np.array([GameState.TeamScores["Hand"], GameState.TeamScores["Deck"]], dtype=np.int64), (Count, 1))
+        LastTaker = GameState.LastTaker
+        self.LastTaker = np.full(Count, LastTaker if isinstance(LastTaker, int) else -1, dtype=np.int64)
+
+    def LegalCaptures(
+        self,
+        Player: int
+        ) -> tuple:
+        """
+        Computes which capture templates are legal in each row, given the cards on the table.
+
+        Returns:
+            tuple: the (K, 40) hand bits of the player, the (K, 40) table bits,
+                the (K,) packed table rank counts and the (K, T + 1) feasible templates (the empty one is never feasible).
+        """
+
+        HandBits = MaskBits(self.Hands[:, Player])
+        TableBits = MaskBits(self.Table)
+        Packed = TableBits[:, RANK_BITS].sum(axis=2) @ FIELDS
+
+        Feasible = np.zeros((self.Count, T + 1), dtype=bool)
+        Feasible[:, :T] = Holds(Packed, PACKED_TEMPLATES)
+
+        return HandBits, TableBits, Packed, Feasible
+
+    def RandomChoice(
+        self,
+        HandBits: np.ndarray,
+        Feasible: np.ndarray
+        ) -> tuple:
+        """
+        Picks a legal (card, template) pair uniformly at random in each row: a card is drawn with weight equal to its
+        number of captures (1 if it can only be placed), then one of its captures uniformly.
+
+        Returns:
+            tuple: the (K,) cards and the (K,) templates (T to place the card).
+        """
+
+        Captures = Feasible[:, :T].astype(np.int64) @ TEMPLATE_ONEHOT
+        Weights = np.cumsum(HandBits * np.maximum(Captures[:, CARD_RANK_INDEX], 1), axis=1)
+        Draws = self.Generator.random(self.Count) * Weights[:, -1]
+        Cards = np.minimum((Weights <= Draws[:, None]).sum(axis=1), 39)
+
+        Ranks = CARD_RANK_INDEX[Cards]
+        Keys = np.where(Feasible[np.arange(self.Count)[:, None], TEMPLATE_GRID[Ranks]], self.Generator.random((self.Count, TEMPLATE_GRID.shape[1])), -1.0)
+        Templates = np.where(Captures[np.arange(self.Count), Ranks] > 0, TEMPLATE_GRID[Ranks, Keys.argmax(axis=1)], T)
+
+        return Cards, Templates
+
+    def TemplateMasks(
+        self,
+        Templates: np.ndarray
+        ) -> np.ndarray:
+        """
+        The cards taken by a capture template in each row: the most valuable cards of each rank on the table.
+
+        Returns:
+            np.ndarray: the (K,) masks of the taken cards (0 for the empty template T).
+        """
+
+        Counts = TEMPLATES[Templates]
+        Patterns = ((self.Table[:, None, None] >> RANK_BITS[None, :, :].astype(np.int64)) & 1) << np.arange(4, dtype=np.int64)
+        TakenPatterns = FIRST_K[Patterns.sum(axis=2), Counts]
+        TakenBits = (TakenPatterns[:, :, None] >> np.arange(4, dtype=np.int64)) & 1
+
+        return (TakenBits * RANK_MASKS[None, :, :]).sum(axis=(1, 2))
+
+    def GreedyChoice(
+        self,
+        HandBits: np.ndarray,
+        TableBits: np.ndarray
+        ) -> tuple:
+        """
+        Takes the decision of Greedy_MOD.Greedy in each row, with BatchGreedy.
+
+        Returns:
+            tuple: the (K,) cards (0 where the hand is empty) and the (K,) masks of the taken cards.
+        """
+
+        Cards, Taken, Kinds = BatchGreedy.BatchGreedy(BitIds(HandBits), BitIds(TableBits), self.values)
+
+        return np.maximum(Cards, 0), IdsMask(Taken)
+
+    def Apply(
+        self,
+        Player: int,
+        Cards: np.ndarray,
+        Taken: np.ndarray,
+        Active: np.ndarray
+        ) -> None:
+        """
+        Applies the chosen moves of a player in every active row: Cards are played, taking the cards of the Taken masks
+        (placing the card if the mask is 0).
+        """
+
+        Taken = Taken & self.Table
+        Capture = (Taken != 0) & Active
+        Played = np.left_shift(np.int64(1), Cards.astype(np.int64))
+        TakenValue = (MaskBits(Taken) * self.Values).sum(axis=1)
+
+        self.Hands[:, Player] = np.where(Active, self.Hands[:, Player] & ~Played, self.Hands[:, Player])
+
+        NewTable = np.where(Capture, self.Table & ~Taken, np.where(Active, self.Table | Played, self.Table))
+        Gained = np.where(Capture, self.Values[Cards] + TakenValue + 1000 * (NewTable == 0), 0)
+
+        self.Table = NewTable
+        self.Scores[:, Player % 2] += Gained
+        self.LastTaker = np.where(Capture, Player, self.LastTaker)
+
+    def Ply(
+        self,
+        Player: int,
+        Greedy: bool
+        ) -> None:
+        """
+        Plays one move of a player in every row where the player still has cards.
+        """
+
+        Active = self.Hands[:, Player] != 0
+        if not Active.any():
+            return
+
+        if Greedy:
+            Cards, Taken = self.GreedyChoice(MaskBits(self.Hands[:, Player]), MaskBits(self.Table))
+        else:
+            HandBits, TableBits, Packed, Feasible = self.LegalCaptures(Player)
+            Cards, Templates = self.RandomChoice(HandBits, Feasible)
+            Taken = self.TemplateMasks(Templates)
+
+        self.Apply(Player, Cards, Taken, Active)
+
+    def Run(self) -> np.ndarray:
+        """
+        Plays every rollout until the end of the game.
+
+        Returns:
+            np.ndarray: the (K,) rewards of the finished games, for the agent's team.
+        """
+
+        Turns = AgentCarletto.TurnOrder(self.AgentPosition)
+
+        while self.Hands[0, self.AgentPosition] != 0:
+            self.Ply(self.AgentPosition, Greedy=False)
+            for turn in Turns:
+                self.Ply(turn, Greedy=True)
+
+        # The cards left on the table go to the team of the last taker (team Deck if nobody took any).
+        Leftover = (MaskBits(self.Table) * self.Values).sum(axis=1)
+        TakeAllTeam = np.where(self.LastTaker < 0, 1, self.LastTaker % 2)
+        self.Scores[np.arange(self.Count), TakeAllTeam] += Leftover
+
+        return (self.Scores[:, self.AgentTeam] - self.Scores[:, 1 - self.AgentTeam]).astype(float)
+
+
+def Rollouts(
+    GameState,
+    Count: int,
+    Generator: np.random.Generator = None
+    ) -> np.ndarray:
+    """
+    Plays Count rollouts of a leaf GameState at once and returns their rewards.
+
+    Args:
+        GameState (IGameState): the leaf GameState, at the agent's turn.
+        Count (int): the number of rollouts.
+        Generator (np.random.Generator, optional): the random generator. Defaults to one seeded from the random module.
+
+    Returns:
+        np.ndarray: the (Count,) rewards for the agent's team.
+    """
+
+    return BatchRolloutEngine(GameState, Count, Generator).Run()
@@ -0,0 +1,1653 @@
+import argparse
+import collections
+import compileall
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tempfile
+import tracemalloc
+
+import numpy as np
+
+import MCTS
+import Bitboard
+import CaptureIndex
+import Determinize
+import Endgame
+import ParallelMCTS
+import BatchRollout
+import BatchGreedy
+import Greedy_MOD
+import Intermediate
+import PolicyCache
+import Tournament
+
+
+## Helper Functions
+
+def DealGameState(
+    seed: int,
+    GameStateClass = MCTS.ScoponeGameState
+    ):
+    """
+    Deals a full 40-card game (10 cards per player) with a fixed seed and returns its starting state.
+
+    Args:
+        seed (int): the seed used to shuffle the deck.
+        GameStateClass (optional): the game state backend. Defaults to MCTS.ScoponeGameState.
+
+    Returns:
+        IGameState: the game state of player 0 at the first turn.
+    """
+
+    rng = random.Random(seed)
+    deck = [(rank, suit) for suit in range(1, 5) for rank in range(1, 11)]
+    rng.shuffle(deck)
+
+    return GameStateClass(
+        PlayerPosition=0,
+        PlayersCards={player: deck[player * 10:(player + 1) * 10] for player in range(4)},
+        Team="Hand",
+        TeamScores={"Hand": 0, "Deck": 0},
+        Table=[],
+        Deck=[]
+    )
+
+def TimeCall(
+    function,
+    repeat: int
+    ) -> float:
+    """
+    Calls a function `repeat` times and returns the mean time per call, in seconds.
+    """
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat
+
+def TimeBest(
+    function,
+    repeat: int,
+    rounds: int = 5
+    ) -> float:
+    """
+    Calls a function `repeat` times in each of `rounds` rounds, and returns the mean time per call of the fastest round,
+    in seconds: the least disturbed by the rest of the machine.
+    """
+
+    return min(TimeCall(function, repeat) for _ in range(rounds))
+
+
+def RandomTable(
+    size: int,
+    seed: int
+    ) -> list:
+    """
+    Draws `size` distinct cards from a seeded shuffled deck, as a list of (rank, suit) tuples.
+    """
+
+    deck = [(rank, suit) for suit in range(1, 5) for rank in range(1, 11)]
+    random.Random(seed).shuffle(deck)
+    return deck[:size]
+
+def LegacyCombinations(Table: list) -> dict:
+    """
+    The original ScoponeMove.GetCombinations enumeration, kept as a reference for benchmarks.
+    """
+
+    Combinations = {key: list() for key in range(1, 11)}
+
+    for L in range(2, len(Table) + 1):
+        for combination in itertools.combinations(Table, L):
+            combination_sum = sum(card[0] for card in combination)
+            if combination_sum < 11:
+                Combinations[combination_sum].append(list(combination))
+
+    return Combinations
+
+def LegacySimulate(GameState) -> float:
+    """
+    The clone-per-ply rollout used by AgentCarletto.Simulate before make/unmake, kept as a reference for benchmarks:
+    every ply goes through FindRandomChildren and SimulateTurn, each of them copying the whole GameState.
+    """
+
+    ExpandedGameState = GameState.CloneState()
+
+    while not ExpandedGameState.IsTerminal():
+        ExpandedGameState = ExpandedGameState.FindRandomChildren()
+        ExpandedGameState = MCTS.AgentCarletto(ExpandedGameState).SimulateTurn()
+
+    return ExpandedGameState.Reward
+
+def LegacyFindRandomChildren(GameState):
+    """
+    ScoponeGameState.FindRandomChildren before sampling a single move, kept as a reference for benchmarks:
+    every available move is applied (and the GameState copied), to keep one of them.
+    """
+
+    AllChildren = GameState.FindChildren()
+    return AllChildren[random.randint(0, len(AllChildren) - 1)]
+
+
+def TraceCall(
+    function,
+    repeat: int
+    ) -> float:
+    """
+    Calls a function `repeat` times under tracemalloc.
+
+    Returns:
+        float: the mean peak of memory allocated during a call, in bytes.
+    """
+
+    peaks = 0
+    tracemalloc.start()
+    for _ in range(repeat):
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+        peaks += peak - before
+    tracemalloc.stop()
+
+    return peaks / repeat
+
+def LegacyTreeSearch(agent) -> dict:
+    """
+    The pairwise Simulation comparison loop used by AgentCarletto.TreeSearch before UCT, kept as a reference for benchmarks.
+    """
+
+    Parents = agent.Expand()
+    BestMove = {key: 0 for key in Parents}
+
+    Simulation, Path = agent.Simulate()
+
+    for _ in range(agent.ComputationalBudget):
+        NeoSimulation, NeoPath = agent.Simulate()
+        for State in Simulation.keys():
+            for NeoState in NeoSimulation.keys():
+                if Path != NeoPath:
+                    if State == NeoState:
+                        BestMove[State] = max(Simulation[State], NeoSimulation[NeoState])
+                    elif Simulation[State] < NeoSimulation[NeoState]:
+                        BestMove[NeoState] = NeoSimulation[NeoState]
+
+    return max(BestMove, key=BestMove.get).ParentMove
+
+def LegacyGreedy(
+    legalMoves: list,
+    table: list,
+    Standalone: bool,
+    values: dict = Greedy_MOD.values
+    ):
+    """
+    Greedy_MOD.Greedy before the single-pass rewrite (two CheckForScopa and two BasicPlay calls), kept as a reference for benchmarks.
+    """
+
+    if Greedy_MOD.CheckForScopa(legalMoves, table, Standalone, values):
+        return Greedy_MOD.CheckForScopa(legalMoves, table, Standalone, values)
+    else:
+        return Greedy_MOD.BestMove(Greedy_MOD.BasicPlay(legalMoves, table)[0], Greedy_MOD.BasicPlay(legalMoves, table)[1], legalMoves, Standalone, values)
+
+def LegacyAvoidScopa(legalMoves, table, deck):
+    """
+    Intermediate.AvoidScopa before the unseen-rank histogram (linear searches in the deck ranks), kept as a reference for benchmarks.
+    """
+
+    list_table = [rank[0] for rank in table]
+    list_deck = [rank[0] for rank in deck]
+    possible_picks = {}
+    possible_plays = []
+    no_plays = []
+    for card in legalMoves:
+        if card[0] in list_table:
+            copy = list_table[:]
+            sum_table = sum(rank_table for rank_table in copy) - card[0]
+            if sum_table in list_deck:
+                pass
+            else:
+                possible_plays.append(card)
+                for pick in table:
+                    if pick[0] == card[0]:
+                        possible_picks[card] = pick
+                        break  
+        else:
+            copy = list_table[:]
+            copy.append(card[0])
+            sum_table = sum(rank_table for rank_table in copy)
+            if sum_table in list_deck:
+                pass
+            else:
+                possible_plays.append(card)
+            subsets = []
+            for r in range(2, len(list_table) + 1):
+                for subset in itertools.combinations(list_table, r):
+                    if sum(subset) == card[0]:
+                        copy = list_table[:]
+                        sum_table = sum(rank_table for rank_table in copy) - card[0]
+                        if sum_table in list_deck:
+                            no_plays.append(card)
+                        else:
+                            possible_plays.append(card)
+                            subsets.append(subset)
+                            sums = []
+                            for value_sum in subsets:
+                                sub = []
+                                for single_card in value_sum:
+                                    for pick in table:
+                                        if single_card == pick[0]:
+                                            single_card = pick
+                                            sub.append(single_card)
+                                sums.append(sub)
+                            possible_picks[card] = sums
+                    else:
+                        copy = list_table[:]
+                        copy.append(card[0])
+                        sum_table = sum(rank_table for rank_table in copy)
+                        if sum_table in list_deck:
+                            pass
+                        else:
+                            possible_plays.append(card)
+    possible_plays = list(set(possible_plays))
+    for i in no_plays:
+        if i in possible_plays:
+            possible_plays.remove(i)
+    return possible_picks, possible_plays
+
+def LegacyIntermediate(legalMoves, table, deck, Standalone, values = Intermediate.values):
+    """
+    Intermediate.Intermediate before the single pass (two CheckForScopa and two AvoidScopa calls), kept as a reference for benchmarks.
+    """
+
+    if Intermediate.CheckForScopa(legalMoves, table, Standalone, values):
+        return Intermediate.CheckForScopa(legalMoves, table, Standalone, values)
+    else:
+        return Intermediate.BestMove(LegacyAvoidScopa(legalMoves, table, deck)[0], LegacyAvoidScopa(legalMoves, table, deck)[1], legalMoves, Standalone, values)
+
+def MoveValues(
+    GameState,
+    rollouts: int
+    ) -> list:
+    """
+    Estimates the value of every move of the agent with `rollouts` rollouts each (flat Monte Carlo),
+    to be used as a reference when scoring decisions.
+
+    Returns:
+        list: (move, mean reward) pairs.
+    """
+
+    agent = MCTS.AgentCarletto(GameState)
+    state = agent.GetWorkingState()
+    values = []
+
+    for move in agent.LegalMoves(state):
+        total = 0
+        for _ in range(rollouts):
+            UndoLog = [state.DoMove(move)]
+            agent.PlayTurn(state, UndoLog)
+            total += agent.Rollout(state, UndoLog)
+            for Undo in reversed(UndoLog):
+                state.UndoMove(Undo)
+        values.append((move, total / rollouts))
+
+    return values
+
+## Benchmarks
+
+def BenchmarkSimulate(
+    repeat: int = 50,
+    seed: int = 0,
+    Iterations: int = 200
+    ) -> dict:
+    """
+    Measures the rollout throughput of AgentCarletto.Simulate on the list-based and the bitboard backends.
+    On the bitboard, the rollouts of AgentCarletto go through GetMaskMoves and DoMaskMove; they are also timed with
+    `MaskMoves` turned off, so through move dicts as on the list-based backend. End to end, a whole TreeSearch of
+    `Iterations` simulations is timed the same way. Random playouts are also timed at the level of the backend, each on
+    its own copy of the deal made beforehand.
+
+    Returns:
+        dict: rollouts and searches per second for each backend, and their ratios; random playouts per second.
+    """
+
+    def RandomPlayout(state, masks: bool) -> None:
+        for ply in range(40):
+            state.PlayerPosition = ply % 4
+            state.Team = "Hand" if ply % 2 == 0 else "Deck"
+            if masks:
+                state.DoMaskMove(*random.choice(state.GetMaskMoves()))
+            else:
+                if isinstance(state, MCTS.ScoponeGameState):
+                    state.Hand = state.PlayersCards[state.PlayerPosition]
+                state.DoMove(random.choice(list(MCTS.unpack_moves(state.GetAvailableMoves()))))
+
+    def Agent(state, masks: bool, budget: int = 1000) -> MCTS.AgentCarletto:
+        agent = MCTS.AgentCarletto(state, budget)
+        agent.MaskMoves = agent.MaskMoves and masks
+        return agent
+
+    results = {}
+    backends = (
+        ("ScoponeGameState", MCTS.ScoponeGameState, False),
+        ("BitboardGameState, moves", Bitboard.BitboardGameState, False),
+        ("BitboardGameState", Bitboard.BitboardGameState, True),
+    )
+
+    for name, backend, masks in backends:
+        random.seed(seed)
+        state = DealGameState(seed, backend)
+        results[name] = 1 / TimeCall(lambda: Agent(state, masks).Simulate(), repeat)
+
+    results["Speedup"] = results["BitboardGameState"] / results["ScoponeGameState"]
+
+    for name, backend, masks in backends:
+        random.seed(seed)
+        state = DealGameState(seed, backend)
+        results[f"TreeSearch of {Iterations}, {name} (/s)"] = 1 / TimeCall(
+            lambda: Agent(state, masks, Iterations).TreeSearch(), max(1, repeat // 10))
+
+    results["TreeSearch speedup"] = (results[f"TreeSearch of {Iterations}, BitboardGameState (/s)"]
+        / results[f"TreeSearch of {Iterations}, ScoponeGameState (/s)"])
+
+    for name, backend, masks in (
+        ("ScoponeGameState, moves", MCTS.ScoponeGameState, False),
+        ("BitboardGameState, moves", Bitboard.BitboardGameState, False),
+        ("BitboardGameState, masks", Bitboard.BitboardGameState, True),
+    ):
+        random.seed(seed)
+        states = [DealGameState(seed, backend) for _ in range(repeat)]
+        results[f"random playouts, {name} (/s)"] = 1 / TimeCall(lambda: RandomPlayout(states.pop(), masks), repeat)
+
+    return results
+
+
+def BenchmarkCombinations(
+    sizes: tuple = (4, 8, 12, 15, 18, 20, 25, 30),
+    repeat: int = 20,
+    LegacyMaxSize: int = 16
+    ) -> dict:
+    """
+    Stress benchmark of the capture option lookup on large tables, such as those of games where nobody captures.
+
+    The legacy itertools enumeration is exponential in the table size, so it is only measured up to `LegacyMaxSize` cards.
+    The index is timed both cold (memoization caches cleared before each call) and warm.
+
+    Returns:
+        dict: microseconds per call for each table size and method.
+    """
+
+    results = {}
+
+    for size in sizes:
+        table = RandomTable(size, seed=size)
+
+        def index():
+            CaptureIndex._RankChoices.cache_clear()
+            CaptureIndex.RankCaptures.cache_clear()
+            return CaptureIndex.CaptureOptions(table, MinSize=2)
+
+        results[f"CaptureIndex cold[{size}] (us)"] = TimeCall(index, repeat) * 1e6
+        results[f"CaptureIndex warm[{size}] (us)"] = TimeCall(lambda: CaptureIndex.CaptureOptions(table, MinSize=2), repeat) * 1e6
+        if size <= LegacyMaxSize:
+            results[f"itertools[{size}] (us)"] = TimeCall(lambda: LegacyCombinations(table), max(1, repeat // 10)) * 1e6
+
+    return results
+
+
+def BenchmarkCaptureTable(
+    count: int = 500,
+    seed: int = 0
+    ) -> dict:
+    """
+    Builds the offline capture table of CaptureIndex into a temporary file, then times GetCombinations and Greedy on seeded
+    tables of 4 to 12 cards with and without it: cold (a new process, every cache empty) and warm.
+
+    Returns:
+        dict: the build time and size of the table, and microseconds per call for each method.
+    """
+
+    rng = random.Random(seed)
+    tables = [RandomTable(rng.randint(4, 12), seed=seed + i) for i in range(count)]
+    hands = [[card for card in Greedy_MOD.values if card not in table][:3] for table in tables]
+
+    def clear():
+        CaptureIndex._RankChoices.cache_clear()
+        CaptureIndex.RankCaptures.cache_clear()
+        CaptureIndex._TableEntry.cache_clear()
+
+    def combinations():
+        for table in tables:
+            MCTS.ScoponeMove.GetCombinations(table)
+
+    def greedy():
+        for hand, table in zip(hands, tables):
+            Greedy_MOD.Greedy(hand, table, False)
+
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "captures.bin")
+        start = time.perf_counter()
+        CaptureIndex.BuildTable(path)
+        results["build (s)"] = time.perf_counter() - start
+        results["size (KB)"] = os.path.getsize(path) / 1024
+
+        for method, table in (("live", os.path.join(directory, "missing.bin")), ("table", path)):
+            CaptureIndex.LoadTable(table)
+            for name, function in (("GetCombinations", combinations), ("Greedy", greedy)):
+                clear()
+                results[f"{name} cold, {method} (us)"] = TimeCall(function, 1) / count * 1e6
+                results[f"{name} warm, {method} (us)"] = TimeBest(function, 1) / count * 1e6
+
+    CaptureIndex.LoadTable()
+
+    return results
+
+
+def MidGameState(
+    seed: int = 0,
+    plies: int = 3,
+    GameStateClass = MCTS.ScoponeGameState
+    ):
+    """
+    Plays `plies` random turns (the agent's move plus the Greedy replies) from a seeded deal,
+    to obtain a position with cards on the table.
+    """
+
+    random.seed(seed)
+    state = DealGameState(seed, GameStateClass)
+    for _ in range(plies):
+        state = MCTS.AgentCarletto(state.FindRandomChildren()).SimulateTurn()
+    return state
+
+def BenchmarkCards(
+    repeat: int = 2000,
+    seed: int = 0
+    ) -> dict:
+    """
+    Microbenchmark of the Card-heavy primitives: convert_to_card, ScoponeGameState.GetAvailableMoves and ScoponeMove.EvalMoves.
+
+    Returns:
+        dict: microseconds per call.
+    """
+
+    state = MidGameState(seed)
+    moves = list(MCTS.unpack_moves(state.GetAvailableMoves()))
+    move1, move2 = moves[0], moves[-1]
+
+    return {
+        "convert_to_card (us)": TimeCall(lambda: MCTS.convert_to_card((7, 1)), repeat * 10) * 1e6,
+        "GetAvailableMoves (us)": TimeCall(state.GetAvailableMoves, repeat) * 1e6,
+        "EvalMoves (us)": TimeCall(lambda: MCTS.ScoponeMove.EvalMoves(move1, move2), repeat) * 1e6,
+    }
+
+
+def BenchmarkRollout(
+    repeat: int = 50,
+    seed: int = 0
+    ) -> dict:
+    """
+    Compares the clone-per-ply rollout with the make/unmake rollout of AgentCarletto.Simulate,
+    reporting time and peak allocated memory per rollout.
+
+    Returns:
+        dict: milliseconds and KiB per rollout, before and after.
+    """
+
+    state = DealGameState(seed)
+    agent = MCTS.AgentCarletto(state)
+
+    random.seed(seed)
+    results = {
+        "clone per ply (ms/rollout)": TimeCall(lambda: LegacySimulate(state), repeat) * 1e3,
+        "make/unmake (ms/rollout)": TimeCall(agent.Simulate, repeat) * 1e3,
+        "clone per ply (KiB peak/rollout)": TraceCall(lambda: LegacySimulate(state), repeat) / 1024,
+        "make/unmake (KiB peak/rollout)": TraceCall(agent.Simulate, repeat) / 1024,
+    }
+
+    return results
+
+
+def BenchmarkNodeMemory(
+    iterations: int = 500,
+    seed: int = 0
+    ) -> dict:
+    """
+    Memory retained per tree node by a 500-iteration search: the deep-copied ScoponeGameState nodes of the legacy search
+    (the children of Expand plus the state that originates each rollout), and the MCTSNodes of TreeSearch, which store
+    moves instead of states.
+
+    Each search is run twice with the same seed, and measured the second time, so that the memoization caches are already warm.
+
+    Returns:
+        dict: bytes per node for each node type.
+    """
+
+    def legacy() -> list:
+        random.seed(seed)
+        agent = MCTS.AgentCarletto(MidGameState(seed))
+        nodes = agent.Expand()
+        for _ in range(iterations):
+            Simulation, _ = agent.Simulate()
+            nodes.extend(Simulation)
+        return nodes
+
+    def uct() -> list:
+        random.seed(seed)
+        agent = MCTS.AgentCarletto(MidGameState(seed), iterations)
+        agent.TreeSearch()
+        nodes, stack = [], [agent.Root]
+        while stack:
+            nodes.append(stack.pop())
+            stack.extend(nodes[-1].Children)
+        return nodes
+
+    results = {}
+
+    for name, search in (("ScoponeGameState", legacy), ("MCTSNode", uct)):
+        search()
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        nodes = search()
+        after, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[f"{name} (bytes/node)"] = (after - before) / len(nodes)
+        results[f"{name} (nodes)"] = len(nodes)
+
+    return results
+
+
+def BenchmarkDecisionQuality(
+    budgets: tuple = (10, 25, 50, 100),
+    seeds: tuple = (0, 1, 2, 3, 4, 5, 6, 7),
+    reference: int = 100
+    ) -> dict:
+    """
+    Fixed-seed comparison of the UCT TreeSearch with the legacy pairwise loop, at the same number of rollouts.
+
+    For each mid-game position, every move is valued with `reference` flat Monte Carlo rollouts;
+    the regret of a decision is the value of the best move minus the value of the chosen one (lower is better).
+
+    Returns:
+        dict: mean regret for each search and budget.
+    """
+
+    regrets = {}
+
+    for seed in seeds:
+        state = MidGameState(seed, plies=2)
+        random.seed(seed)
+        values = {MCTS.move_key(move): value for move, value in MoveValues(state, reference)}
+        best = max(values.values())
+
+        for budget in budgets:
+            for name, search in (("legacy", LegacyTreeSearch), ("UCT", lambda agent: agent.TreeSearch())):
+                random.seed(seed + budget)
+                move = search(MCTS.AgentCarletto(state, budget))
+                key = f"{name}[{budget}] (regret)"
+                regrets[key] = regrets.get(key, 0) + (best - values[MCTS.move_key(move)]) / len(seeds)
+
+    return regrets
+
+
+def Percentile(
+    samples: list,
+    q: float
+    ) -> float:
+    """
+    The q-th percentile (0 to 100) of a list of samples, with the nearest-rank method.
+    """
+
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))]
+
+def BenchmarkDeadline(
+    deadlines: tuple = (10, 50),
+    decisions: int = 50,
+    seed: int = 0
+    ) -> dict:
+    """
+    Latency of TreeSearch in deadline mode, on early-game (first turn) and late-game (two turns left) positions.
+
+    Returns:
+        dict: p50 and p99 latency (ms), mean iterations per decision and whether the p99 meets the deadline, for each phase and deadline.
+    """
+
+    phases = {"early": MidGameState(seed, plies=0), "late": MidGameState(seed, plies=8)}
+    results = {}
+
+    for phase, state in phases.items():
+        for deadline in deadlines:
+            latencies, iterations = [], []
+            random.seed(seed)
+            for _ in range(decisions):
+                agent = MCTS.AgentCarletto(state)
+                start = time.perf_counter()
+                agent.TreeSearch(Deadline=deadline)
+                latencies.append((time.perf_counter() - start) * 1e3)
+                iterations.append(agent.Iterations)
+            results[f"{phase}[{deadline}ms] p50 (ms)"] = Percentile(latencies, 50)
+            results[f"{phase}[{deadline}ms] p99 (ms)"] = Percentile(latencies, 99)
+            results[f"{phase}[{deadline}ms] iterations"] = sum(iterations) / decisions
+            results[f"{phase}[{deadline}ms] p99 within deadline"] = Percentile(latencies, 99) <= deadline
+
+    return results
+
+
+def BenchmarkRootParallel(
+    deadline: float = 500,
+    workers: int = os.cpu_count(),
+    seed: int = 0
+    ) -> dict:
+    """
+    Scaling of root-parallel MCTS: total iterations per second with 1 to `workers` processes,
+    each searching the same early-game position for `deadline` milliseconds.
+
+    The pool is warmed up with a first decision, so that process spawn time is not measured.
+
+    Returns:
+        dict: iterations per second for each number of workers.
+    """
+
+    state = MidGameState(seed, plies=0)
+    results = {}
+
+    for count in sorted({1, 2, 4, 8, 16, 32, workers}):
+        if count > workers:
+            continue
+        with ParallelMCTS.RootParallelCarletto(Workers=count, Seed=seed) as agent:
+            agent.TreeSearch(state, Deadline=10)
+            start = time.perf_counter()
+            agent.TreeSearch(state, Deadline=deadline)
+            results[f"workers[{count}] (iterations/s)"] = agent.Iterations / (time.perf_counter() - start)
+
+    return results
+
+
+def BenchmarkTreeParallel(
+    threads: tuple = (2, 4),
+    deadline: float = 300,
+    budget: int = 100,
+    seeds: tuple = (0, 1, 2, 3),
+    reference: int = 100
+    ) -> dict:
+    """
+    Compares the tree-parallel search with the sequential TreeSearch:
+
+    - throughput: iterations per second on an early-game position within `deadline` milliseconds;
+    - decision quality: mean regret (see BenchmarkDecisionQuality) at the same total budget.
+
+    Threads are forced even with the GIL, to measure its cost; the GIL status is reported. The threads can only pay off
+    on a free-threaded build: with the GIL, expect the iterations per second of the sequential search, and a regret
+    that differs from the sequential one by the noise of the few seeds only.
+
+    Returns:
+        dict: iterations per second and mean regret, for the sequential search and each number of threads.
+    """
+
+    results = {"GIL enabled": ParallelMCTS.GILEnabled()}
+    state = MidGameState(0, plies=0)
+
+    searches = {"sequential": lambda GameState, Budget: MCTS.AgentCarletto(GameState, Budget)}
+    for count in threads:
+        searches[f"threads[{count}]"] = lambda GameState, Budget, count=count: ParallelMCTS.TreeParallelCarletto(GameState, Budget, Threads=count, Force=True)
+
+    for name, search in searches.items():
+        agent = search(state, budget)
+        start = time.perf_counter()
+        agent.TreeSearch(Deadline=deadline)
+        results[f"{name} (iterations/s)"] = agent.Iterations / (time.perf_counter() - start)
+
+    for seed in seeds:
+        position = MidGameState(seed, plies=2)
+        random.seed(seed)
+        values = {MCTS.move_key(move): value for move, value in MoveValues(position, reference)}
+        best = max(values.values())
+        for name, search in searches.items():
+            random.seed(seed + budget)
+            move = search(position, budget).TreeSearch()
+            key = f"{name} (regret)"
+            results[key] = results.get(key, 0) + (best - values[MCTS.move_key(move)]) / len(seeds)
+
+    return results
+
+
+def BenchmarkBatchRollout(
+    batches: tuple = (16, 64, 256, 1024),
+    repeat: int = 2000,
+    seed: int = 0
+    ) -> dict:
+    """
+    Compares the scalar rollout (AgentCarletto.Rollout on the working state) with BatchRollout,
+    playing K rollouts of the same early-game leaf at once: rollouts per second and mean reward, with its standard error,
+    over about `repeat` rollouts each.
+
+    The other players' decisions of the batch engine are also checked against Greedy_MOD.Greedy on a corpus of positions
+    (see GreedyPositions), with the cards in bit order: the drift of the mean reward then only comes from the agent's
+    random moves (see BatchRollout.BatchRolloutEngine).
+
+    Returns:
+        dict: rollouts per second and mean reward, for the scalar rollout and each batch size, and the number of
+            different Greedy decisions.
+    """
+
+    state = MidGameState(seed, plies=0)
+    agent = MCTS.AgentCarletto(state)
+    leaf = agent.GetWorkingState()
+
+    def ScalarRollout():
+        UndoLog = list()
+        reward = agent.Rollout(leaf, UndoLog)
+        for Undo in reversed(UndoLog):
+            leaf.UndoMove(Undo)
+        return reward
+
+    def Summary(name, rewards, elapsed):
+        rewards = np.asarray(rewards, dtype=float)
+        results[f"{name} (rollouts/s)"] = len(rewards) / elapsed
+        results[f"{name} (mean reward)"] = float(rewards.mean())
+        results[f"{name} (standard error)"] = float(rewards.std(ddof=1) / math.sqrt(len(rewards)))
+
+    results = {}
+
+    random.seed(seed)
+    start = time.perf_counter()
+    rewards = [ScalarRollout() for _ in range(repeat)]
+    Summary("scalar", rewards, time.perf_counter() - start)
+
+    for count in batches:
+        calls = max(1, repeat // count)
+        start = time.perf_counter()
+        rewards = np.concatenate([BatchRollout.Rollouts(leaf, count) for _ in range(calls)])
+        Summary(f"batch[{count}]", rewards, time.perf_counter() - start)
+
+    positions = [(sorted(hand, key=Bitboard.CARD_BITS.get), sorted(table, key=Bitboard.CARD_BITS.get)) for hand, table in GreedyPositions(repeat, seed)]
+    engine = BatchRollout.BatchRolloutEngine(state, len(positions))
+    Cards, Taken = engine.GreedyChoice(
+        BatchRollout.MaskBits(np.array([Bitboard.EncodeCards(hand) for hand, table in positions], dtype=np.int64)),
+        BatchRollout.MaskBits(np.array([Bitboard.EncodeCards(table) for hand, table in positions], dtype=np.int64)),
+    )
+    mismatches = 0
+    for i, (hand, table) in enumerate(positions):
+        ((card, picks),) = Greedy_MOD.Greedy(hand, table, False).items()
+        picks = [picks] if isinstance(picks, tuple) else picks
+        mismatches += (Bitboard.ALL_CARDS[Cards[i]], Bitboard.EncodeCards(set(picks))) != (card, int(Taken[i]))
+    results["greedy decisions, mismatches"] = mismatches
+
+    return results
+
+
+def GreedyPositions(
+    count: int,
+    seed: int = 0
+    ) -> list:
+    """
+    A seeded corpus of (hand, table) pairs: 1 to 10 cards in hand and up to 8 on the table, from a shuffled deck.
+    """
+
+    rng = random.Random(seed)
+    positions = []
+    for _ in range(count):
+        deck = [card for card in Greedy_MOD.values]
+        rng.shuffle(deck)
+        hand = rng.randint(1, 10)
+        positions.append((deck[:hand], deck[hand:hand + rng.randint(0, 8)]))
+    return positions
+
+
+def BenchmarkBatchGreedy(
+    counts: tuple = (16, 64, 256, 1024, 5000),
+    rounds: int = 5,
+    seed: int = 0
+    ) -> dict:
+    """
+    Compares Greedy_MOD.Greedy, called once per position, with BatchGreedy on the same corpus of positions,
+    for growing batches (BatchRollout plays 16 to 1024 rollouts at once), checking that every decision is the same.
+
+    Returns:
+        dict: decisions per second of both for each batch size (the fastest of `rounds` rounds), and the number of
+            different decisions.
+    """
+
+    positions = GreedyPositions(max(counts), seed)
+    results = {}
+
+    scalar = [Greedy_MOD.Greedy(hand, table, False) for hand, table in positions]
+    Hands = BatchGreedy.PackCards([hand for hand, table in positions])
+    Tables = BatchGreedy.PackCards([table for hand, table in positions])
+
+    for count in counts:
+        batch = positions[:count]
+        results[f"scalar[{count}] (decisions/s)"] = 1 / TimeBest(lambda: [Greedy_MOD.Greedy(hand, table, False) for hand, table in batch], 1, rounds) * count
+        results[f"batch[{count}] (decisions/s)"] = 1 / TimeBest(lambda: BatchGreedy.BatchGreedy(Hands[:count], Tables[:count]), 1, rounds) * count
+
+    Cards, Taken, Kinds = BatchGreedy.BatchGreedy(Hands, Tables)
+    results["mismatches"] = sum(
+        BatchGreedy.DecisionToMove(Cards[i], Taken[i], Kinds[i]) != scalar[i]
+        for i in range(len(positions))
+    )
+
+    return results
+
+
+def BenchmarkGreedy(
+    sizes: tuple = (0, 2, 4, 6, 8, 10, 12),
+    count: int = 300,
+    seed: int = 0
+    ) -> dict:
+    """
+    Compares the legacy Greedy with the single-pass Greedy_MOD.Greedy on seeded positions with a full hand
+    and a growing table, checking that every decision (with and without Standalone) is the same.
+
+    Returns:
+        dict: microseconds per decision for each table size, and the number of different decisions.
+    """
+
+    rng = random.Random(seed)
+    results = {}
+    mismatches = 0
+
+    for size in sizes:
+        positions = []
+        for _ in range(count):
+            deck = [card for card in Greedy_MOD.values]
+            rng.shuffle(deck)
+            positions.append((deck[:10], deck[10:10 + size]))
+
+        for name, function in (("legacy", LegacyGreedy), ("single pass", Greedy_MOD.Greedy)):
+            start = time.perf_counter()
+            for hand, table in positions:
+                function(hand, table, False)
+            results[f"{name}, table[{size}] (us/decision)"] = (time.perf_counter() - start) / count * 1e6
+
+        mismatches += sum(
+            LegacyGreedy(hand, table, Standalone) != Greedy_MOD.Greedy(hand, table, Standalone)
+            for hand, table in positions
+            for Standalone in (False, True)
+        )
+
+    results["mismatches"] = mismatches
+    return results
+
+
+def BenchmarkIntermediate(
+    sizes: tuple = (0, 2, 4, 6, 8),
+    count: int = 300,
+    budget: int = 100,
+    seed: int = 0
+    ) -> dict:
+    """
+    Compares the legacy Intermediate with Intermediate.Intermediate on seeded positions with a full hand, a growing table
+    and the other 30 cards unseen, checking that every decision is the same; then times TreeSearch
+    with Greedy and with Intermediate opponents.
+
+    Returns:
+        dict: microseconds per decision for each table size, the number of different decisions,
+            and milliseconds per TreeSearch for both opponent models.
+    """
+
+    rng = random.Random(seed)
+    results = {}
+    mismatches = 0
+
+    for size in sizes:
+        positions = []
+        for _ in range(count):
+            deck = [card for card in Intermediate.values]
+            rng.shuffle(deck)
+            positions.append((deck[:10], deck[10:10 + size], deck[10 + size:]))
+
+        for name, function in (("legacy", LegacyIntermediate), ("histogram", Intermediate.Intermediate)):
+            start = time.perf_counter()
+            for hand, table, unseen in positions:
+                function(hand, table, unseen, False)
+            results[f"{name}, table[{size}] (us/decision)"] = (time.perf_counter() - start) / count * 1e6
+
+        mismatches += sum(
+            LegacyIntermediate(hand, table, unseen, Standalone) != Intermediate.Intermediate(hand, table, unseen, Standalone)
+            for hand, table, unseen in positions
+            for Standalone in (False, True)
+        )
+
+    results["mismatches"] = mismatches
+
+    state = MidGameState(seed, plies=1)
+    for name, greedy in (("Greedy", True), ("Intermediate", False)):
+        random.seed(seed)
+        agent = MCTS.AgentCarletto(state, budget, GreedyOpponents=greedy)
+        results[f"TreeSearch, {name} opponents (ms)"] = TimeCall(agent.TreeSearch, 1) * 1e3
+
+    return results
+
+
+def BenchmarkDecisionCache(
+    count: int = 2000,
+    repeat: int = 5,
+    budget: int = 100,
+    searches: int = 5,
+    seed: int = 0
+    ) -> dict:
+    """
+    Compares the rule-based policies with their calls through a PolicyCache.DecisionCache on a seeded corpus of positions,
+    each seen repeat times with a reshuffled hand (so that ties are broken differently), checking that every decision is
+    the same; then times consecutive TreeSearch calls with and without a shared cache, from the same seeds. The cache is
+    expected to speed up the decisions of the corpus but not TreeSearch, where it is left off (see PolicyCache.DecisionCache).
+
+    Returns:
+        dict: microseconds per decision, the number of different decisions, milliseconds per TreeSearch and the cache counters.
+    """
+
+    rng = random.Random(seed)
+    positions = [(hand, table, [card for card in Greedy_MOD.values if card not in hand and card not in table])
+                 for hand, table in GreedyPositions(count, seed)]
+    calls = []
+    for _ in range(repeat):
+        for hand, table, unseen in positions:
+            hand = list(hand)
+            rng.shuffle(hand)
+            calls.append((hand, table, unseen))
+
+    results = {}
+    mismatches = 0
+    for name in ("Greedy", "Intermediate"):
+        cache = PolicyCache.DecisionCache()
+        if name == "Greedy":
+            function = lambda hand, table, unseen: Greedy_MOD.Greedy(hand, table, False)
+            cached = lambda hand, table, unseen: cache.Greedy(hand, table, False)
+        else:
+            function = lambda hand, table, unseen: Intermediate.Intermediate(hand, table, unseen, False)
+            cached = lambda hand, table, unseen: cache.Intermediate(hand, table, unseen, False)
+
+        start = time.perf_counter()
+        expected = [function(*call) for call in calls]
+        results[f"{name} (us/decision)"] = (time.perf_counter() - start) / len(calls) * 1e6
+
+        start = time.perf_counter()
+        decided = [cached(*call) for call in calls]
+        results[f"{name}, cached (us/decision)"] = (time.perf_counter() - start) / len(calls) * 1e6
+        results[f"{name}, cached (hit rate)"] = cache.Hits / len(calls)
+
+        mismatches += sum(move != reference for move, reference in zip(decided, expected))
+
+    results["mismatches"] = mismatches
+
+    # Consecutive searches share the cache, as the decisions of a game would.
+    state = MidGameState(seed, plies=1)
+    decisions = PolicyCache.DecisionCache()
+    moves = {}
+    for name, cache in (("without cache", None), ("with cache", decisions)):
+        moves[name] = []
+        start = time.perf_counter()
+        for search in range(searches):
+            random.seed(seed + search)
+            moves[name].append(MCTS.move_key(MCTS.AgentCarletto(state, budget, Decisions=cache).TreeSearch()))
+        results[f"TreeSearch, {name} (ms)"] = (time.perf_counter() - start) / searches * 1e3
+
+    results["TreeSearch, same moves"] = moves["without cache"] == moves["with cache"]
+    results.update({f"TreeSearch cache ({key})": value for key, value in decisions.Stats().items()})
+
+    return results
+
+
+def PlainMinimax(GameState) -> int:
+    """
+    Plain minimax over ScoponeGameState (GetAvailableMoves, DoMove and UndoMove), without pruning nor memo,
+    kept as a reference for the endgame solver: the final score difference "Hand" - "Deck" with perfect play.
+    The GameState is modified and restored.
+    """
+
+    position = GameState.PlayerPosition
+    if not any(GameState.PlayersCards[player] for player in range(4)):
+        GameState.Team = "Hand"
+        return MCTS.AgentCarletto(GameState).FinalReward(GameState)
+
+    values = []
+    for move in (MCTS.unpack_moves(GameState.GetAvailableMoves()) if GameState.Hand else [None]):
+        Undo = GameState.DoMove(move) if move is not None else None
+        GameState.PlayerPosition = (position + 1) % 4
+        GameState.Hand = GameState.PlayersCards[GameState.PlayerPosition]
+        GameState.Team = "Hand" if GameState.PlayerPosition % 2 == 0 else "Deck"
+        values.append(PlainMinimax(GameState))
+        if Undo is not None:
+            GameState.UndoMove(Undo)
+        GameState.PlayerPosition = position
+        GameState.Hand = GameState.PlayersCards[position]
+        GameState.Team = "Hand" if position % 2 == 0 else "Deck"
+
+    return max(values) if position % 2 == 0 else min(values)
+
+
+def EndgameState(
+    seed: int,
+    cards: int,
+    table: int
+    ):
+    """
+    Deals an endgame with a fixed seed: cards / 4 cards to each player and `table` cards on the table, with team "Deck"
+    having taken last. Crowded tables are the slowest endgames to solve.
+    """
+
+    rng = random.Random(seed)
+    deck = [(rank, suit) for suit in range(1, 5) for rank in range(1, 11)]
+    rng.shuffle(deck)
+    size = cards // 4
+
+    return MCTS.ScoponeGameState(
+        PlayerPosition=0,
+        PlayersCards={player: deck[player * size:(player + 1) * size] for player in range(4)},
+        Team="Hand",
+        TeamScores={"Hand": 0, "Deck": 0},
+        Table=deck[cards:cards + table],
+        LastTaker=1
+        )
+
+
+def BenchmarkEndgame(
+    thresholds: tuple = (0, 4, 8),
+    count: int = 100,
+    budget: int = 200,
+    seed: int = 0
+    ) -> dict:
+    """
+    Times Endgame.EndgameSolver on seeded endgames with 4 and 8 cards left (a fresh solver for each one): positions
+    of random games, and dealt positions with 4 and 10 cards on the table (see EndgameState). The time of a solve
+    grows with the cards left and with the table, so the p99 and the slowest solve are reported with the mean.
+    Its values are checked against PlainMinimax. The solver is scoped to Endgame.MAX_CARDS cards: solves with 12 cards
+    are timed too, labelled as beyond it, to show the cost of a higher cutover. Then TreeSearch is timed from a position
+    with 20 cards left for each cutover threshold (AgentCarletto.EndgameCards, 0 for full rollouts).
+
+    Returns:
+        dict: milliseconds per solve, the number of different values, and milliseconds per TreeSearch with the solver counters.
+    """
+
+    results = {}
+    mismatches = 0
+
+    for plies, cards in ((9, 4), (8, 8), (7, 12)):
+        positions = {
+            "games": [MidGameState(seed + i, plies) for i in range(count)],
+            "4 on the table": [EndgameState(seed + i, cards, 4) for i in range(count)],
+            "10 on the table": [EndgameState(seed + i, cards, 10) for i in range(count)],
+        }
+        scope = "" if cards <= Endgame.MAX_CARDS else ", beyond MAX_CARDS"
+        for name, states in positions.items():
+            times = []
+            for state in states:
+                start = time.perf_counter()
+                reward, move = Endgame.EndgameSolver().Solve(state)
+                times.append(time.perf_counter() - start)
+                if cards <= Endgame.MAX_CARDS:
+                    mismatches += reward != PlainMinimax(state.CloneState()) * (1 if state.Team == "Hand" else -1)
+            results[f"solve[{cards} cards{scope}, {name}], mean (ms)"] = sum(times) / count * 1e3
+            results[f"solve[{cards} cards{scope}, {name}], p99 (ms)"] = Percentile(times, 99) * 1e3
+            results[f"solve[{cards} cards{scope}, {name}], slowest (ms)"] = max(times) * 1e3
+
+    results["mismatches"] = mismatches
+
+    state = MidGameState(seed, plies=5)
+    for threshold in thresholds:
+        random.seed(seed)
+        agent = MCTS.AgentCarletto(state, budget, EndgameCards=threshold)
+        results[f"TreeSearch, cutover at {threshold} cards (ms)"] = TimeCall(agent.TreeSearch, 1) * 1e3
+        if agent.Solver is not None:
+            stats = agent.Solver.Stats()
+            results[f"TreeSearch, cutover at {threshold} cards (solves)"] = stats["Solves"]
+            results[f"TreeSearch, cutover at {threshold} cards (memo hits)"] = stats["Hits"]
+
+    return results
+
+
+def BenchmarkInformationSet(
+    determinizations: int = 8,
+    budget: int = 200,
+    repeat: int = 2000,
+    seed: int = 0
+    ) -> dict:
+    """
+    Compares the hidden-information searches from an early position: one perfect-information TreeSearch on each of K
+    sampled deals (with a vote on the moves) against one information-set TreeSearch sharing its tree across deals
+    (AgentCarletto.Determinizations), with the same budget per search. Also times Determinize.DeterminizationSampler
+    against shuffling a deck per deal.
+
+    Returns:
+        dict: deals per second, milliseconds per decision, and the votes of the determinized searches.
+    """
+
+    state = MidGameState(seed, plies=1)
+    sampler = Determinize.DeterminizationSampler(state, Generator=np.random.default_rng(seed))
+
+    def ShuffledDeal():
+        unseen = [card for player in sampler.Players for card in state.PlayersCards[player]]
+        random.shuffle(unseen)
+        bounds = list(itertools.accumulate([0] + sampler.Sizes))
+        return {player: unseen[bounds[i]:bounds[i + 1]] for i, player in enumerate(sampler.Players)}
+
+    results = {
+        "random.shuffle (deals/s)": 1 / TimeCall(ShuffledDeal, repeat),
+        "sampler, arrays (deals/s)": repeat / TimeCall(lambda: sampler.Sample(repeat), 1),
+        "sampler, hands (deals/s)": repeat / TimeCall(lambda: sampler.Deals(repeat), 1),
+    }
+
+    random.seed(seed)
+    votes = collections.Counter()
+    start = time.perf_counter()
+    for deal in sampler.Deals(determinizations):
+        determinized = state.CloneState()
+        determinized.Redeal(deal)
+        votes[MCTS.move_key(MCTS.AgentCarletto(determinized, budget).TreeSearch())] += 1
+    results[f"{determinizations} determinized searches (ms)"] = (time.perf_counter() - start) * 1e3
+
+    random.seed(seed)
+    agent = MCTS.AgentCarletto(state, budget, Determinizations=determinizations)
+    start = time.perf_counter()
+    move = agent.TreeSearch()
+    results["information-set search (ms)"] = (time.perf_counter() - start) * 1e3
+    results["votes for the information-set move"] = votes[MCTS.move_key(move)]
+    results["votes for the most voted move"] = max(votes.values())
+
+    # The search redeals the hands of the working state in place (IGameState.Redeal): on both backends,
+    # it must leave the working state as it found it.
+    for name, backend in (("ScoponeGameState", state), ("BitboardGameState", Bitboard.BitboardGameState.FromGameState(state))):
+        random.seed(seed)
+        agent = MCTS.AgentCarletto(backend, budget, Determinizations=determinizations)
+        working = agent.GetWorkingState()
+        before = (working.CloneState(), hash(working))
+        start = time.perf_counter()
+        agent.TreeSearch()
+        results[f"information-set search, {name} (ms)"] = (time.perf_counter() - start) * 1e3
+        results[f"working state restored, {name}"] = before == (working, hash(working))
+
+    return results
+
+
+def BenchmarkTournament(
+    workers: tuple = (1, 2, 4),
+    games: int = 64,
+    seed: int = 0
+    ) -> dict:
+    """
+    Plays the same Greedy vs Intermediate match (Tournament.Tournament) with a growing number of worker processes,
+    to measure the scaling of the self-play engine, then a short match of the MCTS agent against Greedy.
+
+    Returns:
+        dict: games per second for each number of workers, and decisions per second of each agent.
+    """
+
+    results = {}
+    for count in workers:
+        for stats in Tournament.Tournament(("greedy", 0), ("intermediate", 0), games, count, seed):
+            pass
+        summary = stats.Summary()
+        results[f"workers[{count}] (games/s)"] = summary["games/s"]
+        results[f"workers[{count}], score difference"] = summary["score difference"]
+
+    results.update({key: value for key, value in summary.items() if key.endswith("decisions/s")})
+
+    for stats in Tournament.Tournament(("mcts", 50), ("greedy", 0), 2, 1, seed):
+        pass
+    results.update({key: value for key, value in stats.Summary().items() if key.startswith("mcts")})
+
+    return results
+
+
+def BenchmarkInstrumentation(
+    budget: int = 200,
+    rounds: int = 5,
+    seed: int = 0
+    ) -> dict:
+    """
+    Times TreeSearch with and without AgentCarletto's Instrument (same seeds, same moves),
+    and reports the statistics of the instrumented search (see Instrumentation.SearchStats).
+
+    Returns:
+        dict: milliseconds per TreeSearch without and with instrumentation, then the statistics of the last search
+            (AgentCarletto.Stats).
+    """
+
+    state = MidGameState(seed, plies=1)
+    results = {}
+
+    for instrument in (False, True):
+        times = []
+        for _ in range(rounds):
+            random.seed(seed)
+            agent = MCTS.AgentCarletto(state, budget, Instrument=instrument)
+            times.append(TimeCall(agent.TreeSearch, 1))
+        results[f"TreeSearch, {'instrumented' if instrument else 'plain'} (ms)"] = min(times) * 1e3
+
+    results.update(agent.Stats())
+
+    return results
+
+
+# The process timed by BenchmarkColdStart: the import of the agent and the first decision of a Greedy player.
+COLD_START = """
+import time
+start = time.perf_counter()
+import MCTS
+imported = time.perf_counter()
+MCTS.ScoponeMove(LegalMoves=[(7, 1), (3, 2), (10, 4)], Table=[(4, 3), (6, 1)]).GetMove(Greedy=True)
+print((imported - start) * 1e3, (time.perf_counter() - start) * 1e3)
+"""
+
+
+def BenchmarkColdStart(
+    budget: float = 50.0,
+    runs: int = 5
+    ) -> dict:
+    """
+    Times the cold start of a worker: a new interpreter importing MCTS and taking its first Greedy decision
+    (with up-to-date bytecode, as in an installed package), under `python -X importtime`.
+    A cold start over the budget (the fastest of `runs`) is a failure, which makes the command exit with an error.
+
+    Returns:
+        dict: milliseconds to import MCTS and to the first decision, the heaviest module imported, and the failures.
+    """
+
+    directory = os.path.dirname(os.path.abspath(__file__))
+    compileall.compile_dir(directory, maxlevels=0, quiet=1)
+
+    imports, starts = [], []
+    for _ in range(runs):
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", COLD_START],
+            cwd=directory, capture_output=True, text=True, check=True
+        )
+        imported, started = map(float, process.stdout.split())
+        imports.append(imported)
+        starts.append(started)
+
+    # Lines of -X importtime: "import time: self [us] | cumulative | imported package", each module after its imports.
+    # The interpreter's own imports end with site: the rest is imported by MCTS.
+    modules = {}
+    for line in process.stderr.splitlines()[1:]:
+        own, cumulative, name = line.split(":", 1)[1].split("|")
+        if name.strip() == "site":
+            modules.clear()
+        else:
+            modules[name.strip()] = int(cumulative) / 1e3
+
+    heaviest = max((name for name in modules if name != "MCTS"), key=modules.get)
+
+    return {
+        "import MCTS (ms)": min(imports),
+        "cold start (ms)": min(starts),
+        "budget (ms)": budget,
+        "modules imported": len(modules),
+        "heaviest import": f"{heaviest} ({modules[heaviest]:.2f} ms)",
+        "pandas imported": "pandas" in modules,
+        "failures": int(min(starts) > budget),
+    }
+
+
+def BenchmarkTrace(
+    budget: int = 200,
+    rounds: int = 10,
+    seed: int = 0
+    ) -> dict:
+    """
+    Times TreeSearch with and without a Trace.RolloutTracer (same seeds, same moves), the tracer writing to a temporary file,
+    then reads the trace back.
+
+    Returns:
+        dict: milliseconds per TreeSearch without and with tracing, the overhead, and the summary of the trace.
+    """
+
+    import Trace
+
+    state = MidGameState(seed, plies=1)
+    results = {}
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rollouts.trace")
+        tracer = Trace.RolloutTracer(path)
+
+        # Rounds alternate between the two, so that both see the same load.
+        times = {False: [], True: []}
+        for _ in range(rounds):
+            for traced in (False, True):
+                random.seed(seed)
+                agent = MCTS.AgentCarletto(state, budget, Tracer=tracer if traced else None)
+                times[traced].append(TimeCall(agent.TreeSearch, 1))
+        for traced in (False, True):
+            results[f"TreeSearch, {'traced' if traced else 'plain'} (ms)"] = min(times[traced]) * 1e3
+
+        tracer.Close()
+        results["overhead (%)"] = (results["TreeSearch, traced (ms)"] / results["TreeSearch, plain (ms)"] - 1) * 100
+        results["record (bytes)"] = Trace.RECORD.itemsize
+        results.update(Trace.TraceSummary(Trace.ReadTrace(path)))
+
+    return results
+
+
+def BenchmarkTreeReuse(
+    games: int = 4,
+    budget: int = 100,
+    seed: int = 0
+    ) -> dict:
+    """
+    Plays seeded games of an MCTS player 0 against Greedy players, once with a new AgentCarletto at every decision and once
+    with one agent for the whole game reusing its tree (AgentCarletto.Advance), for the perfect-information and the
+    information-set searches.
+
+    Returns:
+        dict: milliseconds per decision, the visits carried over per decision and their share of the visits of the root,
+        the decisions that reused a subtree, and the mean score difference of player 0's team.
+    """
+
+    results = {}
+
+    for name, determinizations in (("mcts", 0), ("ismcts", 16)):
+        for reuse in (False, True):
+            label = f"{name}, {'reuse' if reuse else 'fresh'}"
+            elapsed, decisions, carried, reused, visits, difference = 0.0, 0, 0, 0, 0, 0
+
+            for game in range(games):
+                random.seed(seed + game)
+                state = Tournament.DealGame(seed + game)
+                agent, move = None, None
+
+                for ply in range(40):
+                    player = ply % 4
+                    state.PlayerPosition = player
+                    state.Team = "Hand" if player % 2 == 0 else "Deck"
+                    state.Hand = state.PlayersCards[player]
+                    state.Reward = state.ComputeRewards()
+
+                    if player == 0:
+                        start = time.perf_counter()
+                        if agent is None or not reuse:
+                            agent = MCTS.AgentCarletto(state, budget, Determinizations=determinizations, ReuseTree=reuse)
+                        else:
+                            agent.Advance(state, move)
+                        move = agent.TreeSearch()
+                        elapsed += time.perf_counter() - start
+
+                        decisions += 1
+                        carried += agent.CarriedVisits
+                        reused += agent.CarriedVisits > 0
+                        visits += agent.Root.Visits
+                        state.DoMove(move)
+                    else:
+                        state.DoMove(Tournament.Decide(("greedy", 0), state))
+
+                difference += state.TeamScores["Hand"] - state.TeamScores["Deck"]
+
+            results[f"{label} (ms/decision)"] = elapsed / decisions * 1e3
+            if reuse:
+                results[f"{label}, carried visits/decision"] = carried / decisions
+                results[f"{label}, carried share of root visits (%)"] = carried / visits * 100
+                results[f"{label}, decisions reusing a subtree"] = f"{reused}/{decisions}"
+            results[f"{label}, score difference"] = difference / games
+
+    return results
+
+
+def BenchmarkRandomChild(
+    positions: int = 10,
+    repeat: int = 20,
+    seed: int = 0
+    ) -> dict:
+    """
+    Times FindRandomChildren, which applies a single sampled move, against LegacyFindRandomChildren, which applies all of
+    them, on seeded early-, mid- and late-game positions (see SUITE_PHASES), checking that with the same seed both
+    return the same child.
+
+    Returns:
+        dict: microseconds per call of each method, the mean branching factor, and the number of different children.
+    """
+
+    results = {}
+    mismatches = 0
+
+    for phase, plies in SUITE_PHASES:
+        corpus = [MidGameState(seed + i, plies) for i in range(positions)]
+        branching = sum(len(list(MCTS.unpack_moves(state.GetAvailableMoves()))) for state in corpus) / positions
+
+        for state in corpus:
+            for draw in range(repeat):
+                random.seed(draw)
+                legacy = LegacyFindRandomChildren(state)
+                random.seed(draw)
+                child = state.FindRandomChildren()
+                mismatches += hash(child) != hash(legacy) or MCTS.move_key(child.ParentMove) != MCTS.move_key(legacy.ParentMove)
+
+        random.seed(seed)
+        results[f"{phase}, legacy (us)"] = sum(TimeCall(lambda: LegacyFindRandomChildren(state), repeat) for state in corpus) / positions * 1e6
+        random.seed(seed)
+        results[f"{phase}, single move (us)"] = sum(TimeCall(state.FindRandomChildren, repeat) for state in corpus) / positions * 1e6
+        results[f"{phase}, branching factor"] = branching
+
+    results["mismatches"] = mismatches
+
+    return results
+
+
+## Regression Suite
+
+# The positions of the suite: (phase, plies played from the deal). Every phase has `positions` seeded deals.
+SUITE_PHASES = (("early", 1), ("mid", 4), ("late", 8))
+
+# Calls per round of each primitive, before scaling by the `repeat` argument of BenchmarkSuite.
+SUITE_CALLS = {
+    "convert_to_card": 2000,
+    "GetCombinations": 200,
+    "GetAvailableMoves": 200,
+    "unpack_moves": 200,
+    "ApplyMove": 100,
+    "CloneState": 100,
+    "Greedy": 500,
+    "Intermediate": 500,
+    "SimulateTurn": 50,
+    "Simulate": 5,
+    "TreeSearch": 1,
+}
+
+# The keys compared by the regression gate: times, for which lower is better, and their scale in microseconds.
+TIME_UNITS = ("(us)", "(ms)")
+TIME_SCALES = {"(us)": 1.0, "(ms)": 1e3}
+
+# A fixed pure-Python workload timed along the suite: the speed of the machine at the time of the run. CompareResults
+# divides the slowdowns by its own, so that a machine slower as a whole (a busy neighbour, a lower clock) is no regression.
+CALIBRATION = "machine/calibration (us)"
+
+
+def Calibration() -> int:
+    """
+    The calibration workload: list, dictionary and integer operations, as in the agent's hot loops.
+    """
+
+    cards = [(rank, suit) for suit in range(1, 5) for rank in range(1, 11)]
+    counts = dict()
+    for rank, suit in sorted(cards, key=lambda card: (card[1] * 7 + card[0]) % 11):
+        counts[rank] = counts.get(rank, 0) + suit
+    return sum(counts.values())
+
+
+def SuitePrimitives(
+    state,
+    budget: int
+    ) -> dict:
+    """
+    The hot primitives of the suite on one position, as zero-argument callables.
+    """
+
+    available = state.GetAvailableMoves()
+    moves = list(MCTS.unpack_moves(available))
+    unseen = [card for player in range(4) if player != state.PlayerPosition for card in state.PlayersCards[player]]
+    played = state.ApplyMove(moves[0])
+
+    return {
+        "convert_to_card": lambda: MCTS.convert_to_card(state.Hand[0]),
+        "GetCombinations": lambda: MCTS.ScoponeMove.GetCombinations(state.Table),
+        "GetAvailableMoves": state.GetAvailableMoves,
+        "unpack_moves": lambda: list(MCTS.unpack_moves(available)),
+        "ApplyMove": lambda: state.ApplyMove(moves[0]),
+        "CloneState": state.CloneState,
+        "Greedy": lambda: Greedy_MOD.Greedy(state.Hand, state.Table, False),
+        "Intermediate": lambda: Intermediate.Intermediate(state.Hand, state.Table, unseen, False),
+        "SimulateTurn": lambda: MCTS.AgentCarletto(played).SimulateTurn(),
+        "Simulate": lambda: MCTS.AgentCarletto(state).Simulate(),
+        "TreeSearch": lambda: MCTS.AgentCarletto(state, budget).TreeSearch(),
+    }
+
+
+def BenchmarkSuite(
+    positions: int = 4,
+    repeat: float = 1.0,
+    rounds: int = 3,
+    samples: int = 5,
+    budget: int = 20,
+    seed: int = 0
+    ) -> dict:
+    """
+    Times every hot primitive on a fixed, seeded corpus of early-, mid- and late-game positions (see SUITE_PHASES).
+
+    The whole suite is measured `samples` times, one pass after the other, so that a slow spell of the machine only
+    disturbs one sample of each entry: in a pass, each entry is the mean time per call over the positions, each from the
+    fastest of `rounds` rounds (see TimeBest). The result of an entry is the median of its samples.
+    Every pass also times the CALIBRATION workload. The results can be saved and compared with a baseline
+    (see SaveResults and CompareResults).
+
+    Returns:
+        dict: median microseconds per call, as "phase/primitive (us)", and the CALIBRATION time.
+    """
+
+    corpus = {phase: [SuitePrimitives(MidGameState(seed + i, plies), budget) for i in range(positions)] for phase, plies in SUITE_PHASES}
+    timings = collections.defaultdict(list)
+
+    for _ in range(samples):
+        timings[CALIBRATION].append(TimeBest(Calibration, 1000, rounds) * 1e6)
+        for phase, primitives in corpus.items():
+            for name, calls in SUITE_CALLS.items():
+                calls = max(1, int(calls * repeat))
+                random.seed(seed)
+                total = sum(TimeBest(functions[name], calls, rounds) for functions in primitives)
+                timings[f"{phase}/{name} (us)"].append(total / positions * 1e6)
+
+    return {key: Percentile(values, 50) for key, values in timings.items()}
+
+
+def SaveResults(
+    results: dict,
+    path: str,
+    benchmark: str
+    ) -> None:
+    """
+    Saves the results of a benchmark as JSON, with the machine they were measured on.
+    """
+
+    with open(path, "w") as file:
+        json.dump(
+            {
+                "benchmark": benchmark,
+                "python": platform.python_version(),
+                "machine": platform.platform(),
+                "processor": platform.processor() or platform.machine(),
+                "results": results,
+            },
+            file,
+            indent=2,
+            sort_keys=True,
+        )
+
+
+def CompareResults(
+    results: dict,
+    baseline: dict,
+    threshold: float,
+    floor: float = 1.0
+    ) -> list:
+    """
+    Compares the times of a benchmark (keys ending in a TIME_UNITS) with those of a baseline.
+
+    A time is a regression when it is slower than the baseline both by more than `threshold` (0.25 = 25%) and by more
+    than `floor` microseconds: the timer and the interpreter make sub-microsecond calls too noisy for a ratio alone.
+    If both runs timed the CALIBRATION workload, the times are first divided by the slowdown of the machine.
+
+    Returns:
+        list: (key, baseline, current, ratio) for every regression, with the current time and ratio corrected for the machine.
+    """
+
+    machine = 1.0
+    if results.get(CALIBRATION) and baseline.get(CALIBRATION):
+        machine = results[CALIBRATION] / baseline[CALIBRATION]
+
+    regressions = []
+    for key, value in results.items():
+        if key != CALIBRATION and key.endswith(TIME_UNITS) and baseline.get(key):
+            value = value / machine
+            ratio = value / baseline[key]
+            scale = next(TIME_SCALES[unit] for unit in TIME_UNITS if key.endswith(unit))
+            if ratio > 1 + threshold and (value - baseline[key]) * scale > floor:
+                regressions.append((key, baseline[key], value, ratio))
+
+    return regressions
+
+
+BENCHMARKS = {
+    "simulate": BenchmarkSimulate,
+    "combinations": BenchmarkCombinations,
+    "capture-table": BenchmarkCaptureTable,
+    "cards": BenchmarkCards,
+    "rollout": BenchmarkRollout,
+    "nodes": BenchmarkNodeMemory,
+    "quality": BenchmarkDecisionQuality,
+    "deadline": BenchmarkDeadline,
+    "root-parallel": BenchmarkRootParallel,
+    "tree-parallel": BenchmarkTreeParallel,
+    "batch-rollout": BenchmarkBatchRollout,
+    "batch-greedy": BenchmarkBatchGreedy,
+    "greedy": BenchmarkGreedy,
+    "intermediate": BenchmarkIntermediate,
+    "decision-cache": BenchmarkDecisionCache,
+    "endgame": BenchmarkEndgame,
+    "ismcts": BenchmarkInformationSet,
+    "tournament": BenchmarkTournament,
+    "instrumentation": BenchmarkInstrumentation,
+    "trace": BenchmarkTrace,
+    "tree-reuse": BenchmarkTreeReuse,
+    "random-child": BenchmarkRandomChild,
+    "suite": BenchmarkSuite,
+    "cold-start": BenchmarkColdStart,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the Scopone agents.")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--save", metavar="PATH", help="save the results as JSON")
+    parser.add_argument("--baseline", metavar="PATH", help="fail if a time regresses against the results saved in PATH")
+    parser.add_argument("--threshold", type=float, default=0.25, help="the slowdown tolerated by --baseline (default: 0.25)")
+    parser.add_argument("--floor", type=float, default=1.0, help="the slowdown in microseconds tolerated by --baseline (default: 1)")
+    args = parser.parse_args()
+
+    results = BENCHMARKS[args.benchmark]()
+
+    for key, value in results.items():
+        print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+
+    if args.save:
+        SaveResults(results, args.save, args.benchmark)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)["results"]
+
+        regressions = CompareResults(results, baseline, args.threshold, args.floor)
+        for key, before, after, ratio in regressions:
+            print(f"REGRESSION {key}: {before:.2f} -> {after:.2f} ({ratio:.2f}x)")
+
+        if regressions:
+            sys.exit(1)
+        print(f"No regression over {args.threshold:.0%} and {args.floor:g} us against {args.baseline}.")
+
+    if results.get("failures"):
+        sys.exit(1)
@@ -0,0 +1,618 @@
+import functools
+import random
+
+import Greedy_MOD
+
+from MCTS import IGameState, Card, ScoponeGameState, convert_to_card
+
+from Missing import NA
+
+
+## Card Encoding
+
+# Each of the 40 cards owns one bit of a 40-bit integer mask:
+# bit = (suit - 1) * 10 + (rank - 1).
+
+ALL_CARDS = [(rank, suit) for suit in range(1, 5) for rank in range(1, 11)]
+
+CARD_BITS = {card: index for index, card in enumerate(ALL_CARDS)}
+
+FULL_MASK = (1 << len(ALL_CARDS)) - 1
+
+RANK_MASKS = {
+    rank: sum(1 << CARD_BITS[rank, suit] for suit in range(1, 5))
+    for rank in range(1, 11)
+}
+
+
+def CardBit(card) -> int:
+    """
+    Returns the bit index of a card, given either as a (rank, suit) tuple or a Card object.
+    """
+    if isinstance(card, Card):
+        return CARD_BITS[card.Rank, card.Suit]
+    return CARD_BITS[card[0], card[1]]
+
+
+def EncodeCards(cards) -> int:
+    """
+    This routine converts a list of cards (tuples or Card objects) into a 40-bit mask.
+
+    Args:
+        cards (list): a list of (rank, suit) tuples or Card objects.
+
+    Returns:
+        int: a mask with one bit set for each card.
+    """
+    mask = 0
+    for card in cards:
+        mask |= 1 << CardBit(card)
+    return mask
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _DecodeMask(mask: int) -> tuple:
+    cards = []
+    while mask:
+        low = mask & -mask
+        cards.append(ALL_CARDS[low.bit_length() - 1])
+        mask ^= low
+    return tuple(cards)
+
+
+def DecodeMask(mask: int) -> list:
+    """
+    This routine converts a 40-bit mask back into a list of (rank, suit) tuples.
+
+    Args:
+        mask (int): a card mask.
+
+    Returns:
+        list: a new list of tuples, ordered by suit and rank.
+    """
+    return list(_DecodeMask(mask))
+
+
+def BuildValueTables(values: dict = Greedy_MOD.values) -> tuple:
+    """
+    Precomputes, for each of the five bytes of a mask, the total value of every possible byte.
+    The value of a whole mask is then the sum of five table lookups.
+
+    Args:
+        values (dict, optional): points associated to each card. Defaults to Greedy_MOD.values.
+
+    Returns:
+        tuple: five lists of 256 integers.
+    """
+    tables = []
+    for byte in range(5):
+        table = []
+        for pattern in range(256):
+            total = 0
+            for bit in range(8):
+                index = byte * 8 + bit
+                if pattern >> bit & 1 and index < len(ALL_CARDS):
+                    total += values[ALL_CARDS[index]]
+            table.append(total)
+        tables.append(table)
+    return tuple(tables)
+
+
+VALUE_TABLES = BuildValueTables()
+
+
+def MaskValue(mask: int, tables: tuple = VALUE_TABLES) -> int:
+    """
+    Returns the total value of the cards in a mask, using the precomputed byte tables.
+    """
+    return (tables[0][mask & 0xFF]
+            + tables[1][mask >> 8 & 0xFF]
+            + tables[2][mask >> 16 & 0xFF]
+            + tables[3][mask >> 24 & 0xFF]
+            + tables[4][mask >> 32 & 0xFF])
+
+
+def MaskRanks(mask: int) -> list:
+    """
+    Returns the list of (rank, bit) pairs for every card in a mask.
+    """
+    ranks = []
+    while mask:
+        low = mask & -mask
+        index = low.bit_length() - 1
+        ranks.append((index % 10 + 1, low))
+        mask ^= low
+    return ranks
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def CaptureMasks(table: int) -> dict:
+    """
+    Finds every subset of the table that can be captured, grouped by the rank of the capturing card.
+
+    As in ScoponeGameState.GetAvailableMoves, a rank has a single pick: the last table card of that rank, which is
+    the highest in the order of the Table property (by card id: the table mask keeps no order of play).
+    It comes first, followed by every combination of two or more cards whose ranks add up to the rank,
+    as ScoponeMove.GetCombinations does.
+
+    Args:
+        table (int): a mask of the cards on the table.
+
+    Returns:
+        dict: rank (1 to 10) as keys, a tuple of capture masks as values.
+    """
+    captures = {rank: [] for rank in range(1, 11)}
+    cards = MaskRanks(table)
+
+    def extend(start, total, mask, size):
+        for position in range(start, len(cards)):
+            rank, bit = cards[position]
+            new_total = total + rank
+            if new_total > 10:
+                continue
+            if size >= 1:
+                captures[new_total].append(mask | bit)
+            extend(position + 1, new_total, mask | bit, size + 1)
+
+    for rank, bit in cards:
+        captures[rank][:] = [bit]
+    extend(0, 0, 0, 0)
+
+    return {rank: tuple(masks) for rank, masks in captures.items()}
+
+
+## `BitboardGameState`
+
+class BitboardGameState(IGameState):
+    """
+    This object is an alternative backend for ScoponeGameState.
+
+    Hands, table, unseen cards and each team's captures are stored as 40-bit integer masks,
+    so that cloning a state copies a handful of integers and legality checks,
+    captures and scoring are bit operations.
+
+    The ScoponeGameState attributes (Hand, PlayersCards, Table, Deck) are exposed as properties
+    that decode the masks into lists of tuples, so AgentCarletto runs on this class unchanged.
+    GetMaskMoves, DoMaskMove and GetGreedyMaskMove are the fast path: AgentCarletto plays its rollouts and the Greedy
+    replies of the other players with them, and only goes through the lists and move dicts in the tree
+    (see the "simulate" benchmark).
+    """
+
+    def __init__(
+        self,
+        PlayerPosition: int,
+        PlayersCards: dict,
+        Team: str,
+        TeamScores: dict,
+        Table: list = [],
+        Deck: list = [],
+        LastTaker: int = NA,
+        ParentMove: dict = NA,
+        values: dict = Greedy_MOD.values
+        ) -> None:
+        """
+        Same arguments as ScoponeGameState.
+
+        Args:
+            PlayerPosition (int): the position of the current player. Might be a number from 0 to 3, based on the starting turn.
+            PlayersCards (dict): a dictionary containing a list of tuples representing each player's hand.
+            Team(str): a string representing the current player's team.
+            TeamScores (dict): a dictionary representing team A (player 0, 2) and team B (player 1, 3) scores.
+            Table (list, optional): a list of tuples containing all the cards on the table. Defaults to [].
+            Deck (list, optional): a list of tuples containing all the cards on the deck Defaults to [].
+            LastTaker(int, optional): the position of the last player that has picked cards from the table.
+            ParentMove(dict, optional): a dictionary representing the MCTS move that originated the current GameState.
+            values (dict, optional): points associated to each card. Defaults to Greedy_MOD.values.
+        """
+
+        self.PlayerPosition = PlayerPosition
+        self.Hands = [EncodeCards(PlayersCards.get(player, [])) for player in range(4)]
+        self.Team = Team
+        self.TeamScores = dict(TeamScores)
+        self.Captures = {"Hand": 0, "Deck": 0}
+        self.TableMask = EncodeCards(Table)
+        self.DeckMask = EncodeCards(Deck)
+        self.LastTaker = LastTaker
+        self.ParentMove = ParentMove
+        self.values = values
+        self.ValueTables = VALUE_TABLES if values is Greedy_MOD.values else BuildValueTables(values)
+        self.Reward = self.ComputeRewards()
+
+    @classmethod
+    def FromGameState(
+        cls,
+        GameState: ScoponeGameState
+        ) -> "BitboardGameState":
+        """
+        Builds a BitboardGameState equivalent to a given ScoponeGameState.
+        """
+        return cls(
+            PlayerPosition=GameState.PlayerPosition,
+            PlayersCards=GameState.PlayersCards,
+            Team=GameState.Team,
+            TeamScores=GameState.TeamScores,
+            Table=GameState.Table,
+            Deck=GameState.Deck,
+            LastTaker=GameState.LastTaker,
+            ParentMove=GameState.ParentMove,
+            values=GameState.values
+        )
+
+    def ToGameState(self) -> ScoponeGameState:
+        """
+        Builds a ScoponeGameState equivalent to the current BitboardGameState.
+        """
+        return ScoponeGameState(
+            PlayerPosition=self.PlayerPosition,
+            PlayersCards=self.PlayersCards,
+            Team=self.Team,
+            TeamScores=dict(self.TeamScores),
+            Table=self.Table,
+            Deck=self.Deck,
+            LastTaker=self.LastTaker,
+            ParentMove=self.ParentMove,
+            values=self.values
+        )
+
+    ### List views over the masks
+
+    @property
+    def Hand(self) -> list:
+        return DecodeMask(self.Hands[self.PlayerPosition])
+
+    @Hand.setter
+    def Hand(self, cards: list) -> None:
+        self.Hands[self.PlayerPosition] = EncodeCards(cards)
+
+    @property
+    def PlayersCards(self) -> dict:
+        return {player: DecodeMask(hand) for player, hand in enumerate(self.Hands)}
+
+    @property
+    def Table(self) -> list:
+        return DecodeMask(self.TableMask)
+
+    @Table.setter
+    def Table(self, cards: list) -> None:
+        self.TableMask = EncodeCards(cards)
+
+    @property
+    def Deck(self) -> list:
+        return DecodeMask(self.DeckMask)
+
+    @Deck.setter
+    def Deck(self, cards: list) -> None:
+        self.DeckMask = EncodeCards(cards)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, BitboardGameState):
+            return False
+        return (self.PlayerPosition == other.PlayerPosition
+                and self.Team == other.Team
+                and self.Hands == other.Hands
+                and self.TableMask == other.TableMask
+                and self.DeckMask == other.DeckMask
+                and self.TeamScores == other.TeamScores)
+
+    def __hash__(self) -> int:
+        return hash((self.PlayerPosition, tuple(self.Hands), self.TableMask, self.TeamScores["Hand"], self.TeamScores["Deck"]))
+
+    def __repr__(self) -> str:
+        return f"###\nBitboardGameState:\n###\n>Parent Move: {self.ParentMove}.\n> Current hand: {self.Hand}\n> Current table: {self.Table}\n> Points: {self.TeamScores}\nThe reward for this State is: {self.Reward}.\n###"
+
+    def CloneState(self) -> IGameState:
+        """
+        This method creates a copy of the current game state. Masks are integers, so only the
+        containers holding them are copied.
+
+        Returns:
+            BitboardGameState: a copy of the current BitboardGameState.
+        """
+
+        new_game_state = object.__new__(BitboardGameState)
+        new_game_state.__dict__.update(self.__dict__)
+        new_game_state.Hands = self.Hands[:]
+        new_game_state.TeamScores = self.TeamScores.copy()
+        new_game_state.Captures = self.Captures.copy()
+
+        return new_game_state
+
+    def Derive(
+        self,
+        GameState: IGameState,
+        ParentMove: dict = NA
+        ) -> IGameState:
+        """
+        Copies a BitboardGameState reached from the current one, to be stored as a tree node.
+        """
+
+        new_game_state = GameState.CloneState()
+        new_game_state.ParentMove = ParentMove
+
+        return new_game_state
+
+    def IsTerminal(self) -> bool:
+        """
+        This is method to check whether the GameState corresponds to the last turn.
+
+        Returns:
+            bool: True if the current player has no cards left, otherwise False.
+        """
+
+        return self.Hands[self.PlayerPosition] == 0
+
+    def ComputeRewards(self) -> int:
+        """
+        This method takes the two teams' scores and computes their difference, from the point of view of the current team.
+
+        Returns:
+            int: the difference between the player's and the other's teams scores.
+        """
+
+        if self.Team == "Hand":
+            return self.TeamScores["Hand"] - self.TeamScores["Deck"]
+        elif self.Team == "Deck":
+            return self.TeamScores["Deck"] - self.TeamScores["Hand"]
+
+    def GetMaskMoves(self) -> list:
+        """
+        This method lists all the legal moves of the current player as pairs of masks.
+
+        Returns:
+            list: a list of (played card bit, captured cards mask) tuples. A captured mask of 0 means the card is placed on the table.
+        """
+
+        hand = self.Hands[self.PlayerPosition]
+        captures = CaptureMasks(self.TableMask)
+
+        Moves = []
+
+        for rank, bit in MaskRanks(hand):
+            picks = captures[rank]
+            if picks:
+                for pick in picks:
+                    Moves.append((bit, pick))
+            else:
+                Moves.append((bit, 0))
+
+        return Moves
+
+    def GetAvailableMoves(self) -> dict:
+        """
+        This method indicates all the available moves in the same format as ScoponeGameState.GetAvailableMoves.
+
+        Returns:
+            dict: played Card as keys, a list of picks (a Card or a list of Cards) as values.
+        """
+
+        LegalMoves = {}
+
+        for bit, pick in self.GetMaskMoves():
+            move = convert_to_card(ALL_CARDS[bit.bit_length() - 1])
+            picks = LegalMoves.setdefault(move, list())
+            if pick == 0:
+                continue
+            cards = [convert_to_card(card) for card in _DecodeMask(pick)]
+            picks.append(cards[0] if len(cards) == 1 else cards)
+
+        return LegalMoves
+
+    def GetGreedyMaskMove(self) -> tuple:
+        """
+        The move of Greedy_MOD.Greedy for the current player, as masks (see GreedyMasks). The hand must not be empty.
+
+        Returns:
+            tuple: the (played card bit, captured cards mask) pair.
+        """
+
+        return GreedyMasks(self.Hands[self.PlayerPosition], self.TableMask)
+
+    def DoMaskMove(
+        self,
+        played: int,
+        pick: int
+        ) -> tuple:
+        """
+        Applies a move given as masks to the current state, in place, and returns an undo entry for UndoMove.
+
+        Args:
+            played (int): the bit of the card to be played.
+            pick (int): the mask of the cards to be taken from the table.
+
+        Returns:
+            tuple: the undo entry, made of integers and strings only.
+        """
+
+        position = self.PlayerPosition
+        Undo = (
+            position,
+            self.Team,
+            self.Hands[position],
+            self.TableMask,
+            self.TeamScores[self.Team],
+            self.Captures[self.Team],
+            self.LastTaker,
+            self.Reward
+        )
+
+        self.Hands[position] &= ~played
+        pick &= self.TableMask
+
+        if pick == 0 or self.TableMask == 0:
+            self.TableMask |= played
+            return Undo
+
+        self.TableMask &= ~pick
+        taken = played | pick
+        new_score = MaskValue(taken, self.ValueTables)
+        if self.TableMask == 0:
+            # Scopa: the table has been swept.
+            new_score += 1000
+
+        self.Captures[self.Team] |= taken
+        self.TeamScores[self.Team] += new_score
+        self.LastTaker = position
+        self.Reward = self.ComputeRewards()
+
+        return Undo
+
+    def DoMove(
+        self,
+        Move: dict
+        ) -> tuple:
+        """
+        Applies a move IN PLACE and returns a compact undo entry for UndoMove.
+
+        Args:
+            Move (dict): a dictionary in the form {card to be played: card or combination of cards to be taken}.
+
+        Returns:
+            tuple: the undo entry, made of integers and strings only.
+        """
+
+        ((played, picks),) = Move.items()
+
+        return self.DoMaskMove(1 << CardBit(played), EncodePicks(picks))
+
+    def UndoMove(
+        self,
+        Undo: tuple
+        ) -> None:
+        """
+        Restores the state as it was before the DoMove (or DoMaskMove) call that returned the undo entry.
+        """
+
+        (self.PlayerPosition, self.Team, hand, self.TableMask,
+         self.TeamScores[self.Team], self.Captures[self.Team], self.LastTaker, self.Reward) = Undo
+        self.Hands[self.PlayerPosition] = hand
+
+    def Redeal(
+        self,
+        Hands: dict
+        ) -> tuple:
+        """
+        Replaces the hands of some players IN PLACE and returns an undo entry for Restore.
+        The hash is computed from the masks, so there is no key to maintain.
+
+        Args:
+            Hands (dict): the new hands, {player: list of cards}.
+
+        Returns:
+            tuple: the undo entry, the previous hand masks.
+        """
+
+        Undo = tuple(self.Hands)
+        for player, cards in Hands.items():
+            self.Hands[player] = EncodeCards(cards)
+
+        return Undo
+
+    def Restore(
+        self,
+        Undo: tuple
+        ) -> None:
+        """
+        Restores the hands replaced by the Redeal call that returned the undo entry.
+        """
+
+        self.Hands[:] = Undo
+
+    def ApplyMove(
+        self,
+        BestMove: dict
+        ) -> IGameState:
+        """
+        Given a move in the format {card to be played: card or combination of cards to be taken},
+        returns a copy of the current state with the move applied.
+
+        Args:
+            BestMove (dict): a dictionary in the form {card to be played: card or combination of cards to be taken}.
+
+        Returns:
+            IGameState: a copy of the starting GameState modified by the effects of the BestMove.
+        """
+
+        ((played, picks),) = BestMove.items()
+
+        new_game_state = self.CloneState()
+        new_game_state.DoMaskMove(1 << CardBit(played), EncodePicks(picks))
+
+        return new_game_state
+
+    def FindChildren(self) -> list:
+        """
+        This methods applies all available moves and returns a list containing
+        each of the corresponding modified GameStates.
+
+        Returns:
+            list: a list of modified GameStates.
+        """
+
+        Childrens = list()
+
+        for played, pick in self.GetMaskMoves():
+            new_child = self.CloneState()
+            new_child.DoMaskMove(played, pick)
+            new_child.ParentMove = MaskMoveToDict(played, pick)
+            Childrens.append(new_child)
+
+        return Childrens
+
+    def FindRandomChildren(self) -> IGameState:
+        """
+        Returns a child chosen uniformly at random among the available moves, applying only that move.
+
+        Returns:
+            IGameState: a BitboardGameState.
+        """
+
+        played, pick = random.choice(self.GetMaskMoves())
+
+        RandomChild = self.CloneState()
+        RandomChild.DoMaskMove(played, pick)
+        RandomChild.ParentMove = MaskMoveToDict(played, pick)
+
+        return RandomChild
+
+
+def EncodePicks(picks) -> int:
+    """
+    Converts the pick of a move (an empty list, a card, or a list of cards) into a mask.
+    """
+    if isinstance(picks, Card):
+        return 1 << CardBit(picks)
+    if isinstance(picks, tuple):
+        return 1 << CardBit(picks)
+    return EncodeCards(picks)
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def GreedyMasks(
+    hand: int,
+    table: int
+    ) -> tuple:
+    """
+    The move of Greedy_MOD.Greedy (with its default values, as ScoponeMove.GetMove plays it) for a non-empty hand
+    and a table given as masks. Greedy is called on the cards in the order of the masks, as through the Hand and Table
+    properties of BitboardGameState, so the move is the one of the dict path; it is memoized for every (hand, table).
+
+    Returns:
+        tuple: the (played card bit, captured cards mask) pair.
+    """
+
+    ((played, picks),) = Greedy_MOD.Greedy(DecodeMask(hand), DecodeMask(table), False).items()
+    return 1 << CardBit(played), EncodePicks(picks)
+
+
+def MaskMoveToDict(
+    played: int,
+    pick: int
+    ) -> dict:
+    """
+    Converts a move given as masks into the {card to be played: cards to be taken} format used by AgentCarletto.
+    """
+    move = convert_to_card(ALL_CARDS[played.bit_length() - 1])
+    if pick == 0:
+        return {move: list()}
+    cards = [convert_to_card(card) for card in _DecodeMask(pick)]
+    return {move: cards[0] if len(cards) == 1 else cards}
@@ -0,0 +1,271 @@
+import functools
+import itertools
+import mmap
+import os
+import struct
+import sys
+
+
+## Rank Multiset
+
+def RankCounts(
+    Table: list,
+    RankOf = lambda card: card[0]
+    ) -> tuple:
+    """
+    Returns the rank multiset of a table, as a tuple with the number of cards of each rank 1 to 10.
+
+    Args:
+        Table (list): a list of cards.
+        RankOf (callable, optional): returns the rank of a card. Defaults to the first element of a tuple.
+
+    Returns:
+        tuple: ten counts, one for each rank.
+    """
+
+    counts = [0] * 10
+    for card in Table:
+        counts[RankOf(card) - 1] += 1
+    return tuple(counts)
+
+
+@functools.lru_cache(maxsize=1 << 18)
+def _RankChoices(
+    counts: tuple,
+    rank: int,
+    target: int
+    ) -> tuple:
+    """
+    Memoized DP over the rank multiset: all the ways to reach `target` using ranks >= `rank`.
+
+    Returns:
+        tuple: each element is a tuple of (rank, number of cards of that rank) pairs.
+    """
+
+    if target == 0:
+        return ((),)
+    if rank > target:
+        return ()
+
+    choices = []
+    # Take k cards of the current rank, then complete the sum with higher ranks.
+    for k in range(min(counts[rank - 1], target // rank), -1, -1):
+        for rest in _RankChoices(counts, rank + 1, target - k * rank):
+            choices.append(((rank, k),) + rest if k else rest)
+
+    return tuple(choices)
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def RankCaptures(counts: tuple) -> dict:
+    """
+    Given a rank multiset, returns for each rank 1 to 10 the multisets of table ranks that add up to it.
+
+    Args:
+        counts (tuple): ten counts, as returned by RankCounts.
+
+    Returns:
+        dict: rank as keys, a tuple of rank choices ((rank, number of cards), ...) as values.
+    """
+
+    return {target: _RankChoices(counts, 1, target) for target in range(1, 11)}
+
+
+## Offline Capture Table
+
+# The captures of two or more cards only depend on the table cards of rank 1 to 9, and on at most 10 // rank of each:
+# the table is reduced to these capped counts, one of 5 * 5 * 4 * 3 * 3 * 2 * 2 * 2 * 2 = 14400 states.
+# The file stores, for each state and target rank, its rank choices (as _RankChoices returns them, in the same order)
+# of at least two cards. It is built offline (python CaptureIndex.py) and memory-mapped read-only:
+# the worker processes share one copy of it through the page cache.
+#
+# Layout (native byte order): the header (MAGIC, the number of offsets, the size of the data), the offsets (uint32)
+# of the entries state * 11 + target, then the data: each choice as (rank, count) byte pairs, ended by a 0 byte.
+
+CAPTURE_TABLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "captures.bin")
+MAGIC = b"SCOPCAP" + (b"<" if sys.byteorder == "little" else b">")
+HEADER = struct.Struct("8sII")
+CAPS = tuple(min(4, 10 // rank) for rank in range(1, 10))
+
+
+def TableState(counts: tuple) -> int:
+    """
+    The state of a rank multiset (ten counts, as returned by RankCounts) in the capture table.
+    """
+
+    state = 0
+    for cap, count in zip(CAPS, counts):
+        state = state * (cap + 1) + min(count, cap)
+    return state
+
+
+def _TableStates():
+    """
+    The capped counts of every state, in state order.
+    """
+
+    return itertools.product(*(range(cap + 1) for cap in CAPS))
+
+
+def BuildTable(Path: str = CAPTURE_TABLE) -> int:
+    """
+    Builds the capture table file.
+
+    Returns:
+        int: the size of the file, in bytes.
+    """
+
+    offsets = [0]
+    data = bytearray()
+    for counts in _TableStates():
+        choices = RankCaptures(counts + (0,))
+        for target in range(11):
+            for choice in choices.get(target, ()):
+                if sum(k for _, k in choice) >= 2:
+                    for rank, k in choice:
+                        data += bytes((rank, k))
+                    data.append(0)
+            offsets.append(len(data))
+
+    with open(Path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, len(offsets), len(data)))
+        file.write(struct.pack(f"{len(offsets)}I", *offsets))
+        file.write(data)
+
+    return HEADER.size + 4 * len(offsets) + len(data)
+
+
+class CaptureTable(object):
+    """
+    The capture table file, memory-mapped read-only (see BuildTable).
+    """
+
+    def __init__(
+        self,
+        Path: str = CAPTURE_TABLE
+        ) -> None:
+        with open(Path, "rb") as file:
+            self.Map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, count, size = HEADER.unpack_from(self.Map) if len(self.Map) >= HEADER.size else (None, 0, 0)
+        if magic != MAGIC or HEADER.size + 4 * count + size != len(self.Map):
+            raise ValueError(f"{Path} is not a capture table.")
+
+        self.Offsets = memoryview(self.Map)[HEADER.size:HEADER.size + 4 * count].cast("I")
+        self.Data = memoryview(self.Map)[HEADER.size + 4 * count:]
+
+    def Choices(
+        self,
+        state: int,
+        target: int
+        ) -> tuple:
+        """
+        The rank choices of at least two cards adding up to the target, for a state (see TableState).
+        """
+
+        entry = state * 11 + target
+        data = bytes(self.Data[self.Offsets[entry]:self.Offsets[entry + 1]])
+
+        return tuple(tuple(zip(choice[::2], choice[1::2])) for choice in data.split(b"\0")[:-1])
+
+
+_TABLE = []
+
+
+def LoadTable(Path: str = CAPTURE_TABLE):
+    """
+    Memory-maps the capture table, used from then on by TableChoices. Without a (valid) file, captures are computed live.
+
+    Returns:
+        CaptureTable: the table, or None.
+    """
+
+    try:
+        table = CaptureTable(Path)
+    except (OSError, ValueError):
+        table = None
+
+    _TABLE[:] = [table]
+    _TableEntry.cache_clear()
+
+    return table
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _TableEntry(
+    state: int,
+    target: int
+    ) -> tuple:
+    return _TABLE[0].Choices(state, target)
+
+
+def TableChoices(
+    counts: tuple,
+    targets = range(2, 11)
+    ) -> dict:
+    """
+    For a rank multiset, the rank choices of at least two cards adding up to each target rank, read from the capture table
+    (loaded with LoadTable on the first call).
+
+    Returns:
+        dict: rank as keys, a tuple of rank choices ((rank, number of cards), ...) as values; None without a capture table.
+    """
+
+    if not _TABLE:
+        LoadTable()
+    if _TABLE[0] is None:
+        return None
+
+    state = TableState(counts)
+    return {target: _TableEntry(state, target) if target > 1 else () for target in targets}
+
+
+## Capture Options
+
+def CaptureOptions(
+    Table: list,
+    RankOf = lambda card: card[0],
+    MinSize: int = 1
+    ) -> dict:
+    """
+    This routine returns, for each rank 1 to 10, every subset of the table whose ranks add up to it.
+
+    The rank multiset of the table is solved once (and memoized), or read from the capture table for subsets of at least
+    two cards, then each rank choice is expanded into the actual cards, so the work is proportional to the number of
+    subsets returned.
+
+    Args:
+        Table (list): a list of cards (tuples or Card objects).
+        RankOf (callable, optional): returns the rank of a card. Defaults to the first element of a tuple.
+        MinSize (int, optional): the minimum number of cards in a subset. Defaults to 1.
+
+    Returns:
+        dict: rank as keys, a list of subsets (lists of cards) as values.
+    """
+
+    by_rank = {rank: [] for rank in range(1, 11)}
+    for card in Table:
+        by_rank[RankOf(card)].append(card)
+
+    Options = {rank: list() for rank in range(1, 11)}
+    counts = tuple(len(by_rank[rank]) for rank in range(1, 11))
+
+    Captures = TableChoices(counts) if MinSize >= 2 else None
+    if Captures is None:
+        Captures = RankCaptures(counts)
+
+    for target, choices in Captures.items():
+        for choice in choices:
+            if sum(k for _, k in choice) < MinSize:
+                continue
+            groups = [itertools.combinations(by_rank[rank], k) for rank, k in choice]
+            for cards in itertools.product(*groups):
+                Options[target].append([card for group in cards for card in group])
+
+    return Options
+
+
+if __name__ == "__main__":
+    # python CaptureIndex.py [PATH]: builds the capture table (argparse would weigh on the import of the agent).
+    Path = sys.argv[1] if len(sys.argv) > 1 else CAPTURE_TABLE
+    print(f"{Path}: {BuildTable(Path)} bytes")
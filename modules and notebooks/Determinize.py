@@ -0,0 +1,69 @@
+import random
+
+import numpy as np
+
+from Bitboard import ALL_CARDS, CARD_BITS
+
+
+## `DeterminizationSampler`
+
+class DeterminizationSampler(object):
+    """
+    Samples determinizations of a GameState from the point of view of the player to move: deals of the cards they have
+    not seen to the other players, consistent with what has been shown.
+
+    In Scopone nothing else constrains the hidden hands: the cards seen (the player's own hand, the table and the cards
+    already played) are out of the deal, and each other player holds as many cards as they have left.
+    The K deals of a batch are drawn at once, as K independent permutations of the unseen cards.
+    """
+
+    def __init__(
+        self,
+        GameState,
+        Generator: np.random.Generator = None
+        ) -> None:
+        """
+        Args:
+            GameState (ScoponeGameState): the position of the observer (the player to move).
+            Generator (np.random.Generator, optional): the random generator. Defaults to one seeded from the random module.
+        """
+
+        self.Observer = GameState.PlayerPosition
+        self.Players = [player for player in range(4) if player != self.Observer]
+        self.Sizes = [len(GameState.PlayersCards[player]) for player in self.Players]
+        self.Unseen = np.array(
+            sorted(CARD_BITS[tuple(card)] for player in self.Players for card in GameState.PlayersCards[player]),
+            dtype=np.int64
+        )
+        self.Generator = Generator if Generator is not None else np.random.default_rng(random.getrandbits(64))
+
+    def Sample(
+        self,
+        Count: int
+        ) -> np.ndarray:
+        """
+        Draws Count deals.
+
+        Returns:
+            np.ndarray: a (Count, N) array of card ids: each row is a permutation of the N unseen cards,
+                whose consecutive blocks of Sizes cards are the hands of Players.
+        """
+
+        return self.Generator.permuted(np.broadcast_to(self.Unseen, (Count, len(self.Unseen))), axis=1)
+
+    def Deals(
+        self,
+        Count: int
+        ) -> list:
+        """
+        Draws Count deals, as dictionaries {player: hand} (lists of (rank, suit) tuples) for the other players.
+        """
+
+        Bounds = np.cumsum([0] + self.Sizes)
+        return [
+            {
+                player: [ALL_CARDS[card] for card in row[Bounds[i]:Bounds[i + 1]]]
+                for i, player in enumerate(self.Players)
+            }
+            for row in self.Sample(Count).tolist()
+        ]
@@ -0,0 +1,328 @@
+import Greedy_MOD
+
+from Missing import NAType
+
+
+## Endgame Positions
+
+# Captures and points only depend on the rank and the value of the cards: cards with the same rank and value are
+# interchangeable, and the solver works on their classes. Hands are sorted tuples of classes, the table a tuple of classes
+# sorted by rank (see Canonical), the cards of a rank in the order of the GameState: the single pick of a rank is its last
+# card on the table, as in ScoponeGameState.GetAvailableMoves.
+# Values are differences "Hand" - "Deck": team "Hand" (players 0 and 2) maximizes them, team "Deck" (1 and 3) minimizes them.
+
+CLASSES = sorted({(card[0], value) for card, value in Greedy_MOD.values.items()})
+CLASS_OF = {card: CLASSES.index((card[0], value)) for card, value in Greedy_MOD.values.items()}
+RANKS = [rank for rank, value in CLASSES]
+VALUES = [value for rank, value in CLASSES]
+SCOPA = 1000
+
+# The endgames the solver is meant for: at most this many cards left in the hands, solved in milliseconds.
+MAX_CARDS = 8
+
+# Bounds stored in the memo table, relative to the alpha-beta window of the search that stored them.
+EXACT, LOWER, UPPER = 0, 1, 2
+
+
+def TeamSign(player: int) -> int:
+    """
+    +1 for the players of team "Hand" (0 and 2), -1 for those of team "Deck" (1 and 3).
+    """
+    return 1 if player % 2 == 0 else -1
+
+
+def Canonical(table) -> tuple:
+    """
+    The table in canonical order: sorted by rank, the cards of the same rank in the order of the table. Only that order
+    matters (the single pick of a rank is its last card): positions reached with the tables in different orders are one.
+    """
+    return tuple(sorted(table, key=RANKS.__getitem__))
+
+
+def RankCaptures(
+    table: tuple,
+    rank: int
+    ) -> list:
+    """
+    The groups of table cards a card of the given rank can take, as tuples of positions on the table:
+    the last table card of that rank, then every combination of at least two cards adding up to it
+    (one for each multiset of classes).
+    """
+
+    captures = []
+    singles = [position for position, card in enumerate(table) if RANKS[card] == rank]
+    if singles:
+        captures.append((singles[-1],))
+
+    seen = set()
+    chosen = []
+
+    def extend(start, total):
+        for position in range(start, len(table)):
+            new_total = total + RANKS[table[position]]
+            if new_total > rank:
+                continue
+            chosen.append(position)
+            if new_total < rank:
+                extend(position + 1, new_total)
+            elif len(chosen) >= 2:
+                classes = tuple(sorted(table[other] for other in chosen))
+                if classes not in seen:
+                    seen.add(classes)
+                    captures.append(tuple(chosen))
+            chosen.pop()
+
+    extend(0, 0)
+
+    return captures
+
+
+## `EndgameSolver`
+
+class EndgameSolver(object):
+    """
+    An exact solver of the end of a game with all the hands known (a determinization), by alpha-beta search:
+    every player moves in turn (clockwise) to maximize the final score difference of their team,
+    with the moves of ScoponeGameState.GetAvailableMoves, the scopa bonus of ResolveMove and the leftovers of FinalReward.
+
+    Moves are ordered by the points they take (scopas first, then the most valuable captures, then the cheapest cards placed),
+    and every position searched is stored in a memo table, shared by all the calls to Solve: the value of a position
+    only depends on the hands, the table, the player to move and the team that took last, not on the scores so far.
+    Cards with the same rank and value are interchangeable, so equivalent moves are searched once, and tables that only
+    differ in the order of their ranks are one position.
+
+    The solver is scoped to endgames of at most MAX_CARDS (8) cards left: a solve takes well under a millisecond at 4 cards,
+    a few at 8 (tens on a full table). Beyond that it is still exact, but not fast: at 12 cards a solve takes from a few
+    to around a hundred milliseconds, growing with the cards on the table, and a TreeSearch cutting over at 12 is slower
+    than one with full rollouts (see the "endgame" benchmark). Rollouts should cut over at MAX_CARDS or fewer
+    (AgentCarletto.EndgameCards).
+
+    The memo table is cleared when it grows over Size. Solves, nodes, memo hits and clears are counted.
+    """
+
+    def __init__(
+        self,
+        Size: int = 1 << 20
+        ) -> None:
+        """
+        Args:
+            Size (int, optional): the maximum number of positions in the memo table. Defaults to 1048576.
+        """
+
+        self.Size = Size
+        self.Memo = dict()
+        self.Captures = dict()
+
+        self.Solves = 0
+        self.Nodes = 0
+        self.Hits = 0
+        self.Clears = 0
+
+    def __len__(self) -> int:
+        return len(self.Memo)
+
+    def Moves(
+        self,
+        hand: tuple,
+        table: tuple
+        ) -> list:
+        """
+        The moves of a hand on a table, one for each class of card played and of cards taken,
+        as (points taken or None for a card placed, class played, positions taken, new table), ordered by the points taken.
+        """
+
+        taking = []
+        placing = []
+        for card in sorted(set(hand)):
+            key = (table, RANKS[card])
+            options = self.Captures.get(key)
+            if options is None:
+                # As (points taken from the table, positions taken, new table).
+                options = self.Captures[key] = [
+                    (
+                        sum(VALUES[table[position]] for position in taken) + (0 if len(taken) < len(table) else SCOPA),
+                        taken,
+                        Canonical(other for position, other in enumerate(table) if position not in taken)
+                    )
+                    for taken in RankCaptures(table, RANKS[card])
+                ]
+
+            if not options:
+                placing.append((None, card, (), Canonical(table + (card,))))
+                continue
+            for points, taken, new_table in options:
+                taking.append((VALUES[card] + points, card, taken, new_table))
+
+        taking.sort(key=lambda move: -move[0])
+        placing.sort(key=lambda move: VALUES[move[1]])
+
+        return taking + placing
+
+    @staticmethod
+    def Play(
+        hands: tuple,
+        player: int,
+        card: int
+        ) -> tuple:
+        """
+        The hands after the player has played a card of the given class.
+        """
+
+        hand = list(hands[player])
+        hand.remove(card)
+        return hands[:player] + (tuple(hand),) + hands[player + 1:]
+
+    def Search(
+        self,
+        hands: tuple,
+        table: tuple,
+        player: int,
+        last: int,
+        alpha: float,
+        beta: float
+        ) -> int:
+        """
+        The value of the rest of the game (a score difference "Hand" - "Deck") with perfect play, within the window (alpha, beta).
+
+        Args:
+            hands (tuple): the four hands, as sorted tuples of card classes.
+            table (tuple): the table, as a tuple of card classes.
+            player (int): the player to move.
+            last (int): the TeamSign of the team that took last (-1 if nobody did: the leftovers go to team "Deck").
+            alpha (float): the value team "Hand" is already sure of.
+            beta (float): the value team "Deck" is already sure of.
+
+        Returns:
+            int: the value, exact if it lies inside the window, otherwise a bound.
+        """
+
+        self.Nodes += 1
+
+        if not any(hands):
+            return last * sum(VALUES[card] for card in table)
+
+        hand = hands[player]
+        if not hand:
+            return self.Search(hands, table, (player + 1) % 4, last, alpha, beta)
+
+        key = (hands, table, player, last)
+        stored = self.Memo.get(key)
+        if stored is not None:
+            value, bound = stored
+            if bound == EXACT or (bound == LOWER and value >= beta) or (bound == UPPER and value <= alpha):
+                self.Hits += 1
+                return value
+
+        window = alpha, beta
+        sign = TeamSign(player)
+        best = float("-inf") if sign > 0 else float("inf")
+
+        for points, card, taken, new_table in self.Moves(hand, table):
+            new_hands = self.Play(hands, player, card)
+            if points is None:
+                value = self.Search(new_hands, new_table, (player + 1) % 4, last, alpha, beta)
+            else:
+                value = sign * points + self.Search(new_hands, new_table, (player + 1) % 4, sign, alpha - sign * points, beta - sign * points)
+
+            if sign > 0:
+                best = max(best, value)
+                alpha = max(alpha, best)
+            else:
+                best = min(best, value)
+                beta = min(beta, best)
+            if alpha >= beta:
+                break
+
+        if best <= window[0]:
+            bound = UPPER
+        elif best >= window[1]:
+            bound = LOWER
+        else:
+            bound = EXACT
+
+        if len(self.Memo) >= self.Size:
+            self.Memo.clear()
+            self.Captures.clear()
+            self.Clears += 1
+        self.Memo[key] = (best, bound)
+
+        return best
+
+    def Solve(
+        self,
+        GameState
+        ) -> tuple:
+        """
+        Solves the rest of the game from a GameState, which is left unchanged.
+
+        Args:
+            GameState (ScoponeGameState): a position, with all the hands known.
+
+        Returns:
+            tuple:
+                - int: the reward of the game for the GameState's team with perfect play (as FinalReward would compute it);
+                - dict: the best move of the player to move, in the format of ScoponeGameState.DoMove (None if their hand is empty).
+        """
+
+        self.Solves += 1
+
+        hands = tuple(tuple(sorted(CLASS_OF[tuple(card)] for card in GameState.PlayersCards[player])) for player in range(4))
+        table = tuple(CLASS_OF[tuple(card)] for card in GameState.Table)
+        last = -1 if isinstance(GameState.LastTaker, NAType) else TeamSign(GameState.LastTaker)
+        player = GameState.PlayerPosition
+
+        hand = hands[player]
+        move = None
+
+        if not hand:
+            value = self.Search(hands, table, player, last, float("-inf"), float("inf"))
+        else:
+            # The root is searched move by move, to keep the best one.
+            sign = TeamSign(player)
+            value = float("-inf") if sign > 0 else float("inf")
+            alpha, beta = float("-inf"), float("inf")
+            for points, card, taken, new_table in self.Moves(hand, table):
+                new_hands = self.Play(hands, player, card)
+                if points is None:
+                    child = self.Search(new_hands, new_table, (player + 1) % 4, last, alpha, beta)
+                else:
+                    child = sign * points + self.Search(new_hands, new_table, (player + 1) % 4, sign, alpha - sign * points, beta - sign * points)
+
+                if (sign > 0 and child > value) or (sign < 0 and child < value):
+                    value = child
+                    move = (card, taken)
+                    if sign > 0:
+                        alpha = value
+                    else:
+                        beta = value
+
+        reward = GameState.TeamScores["Hand"] - GameState.TeamScores["Deck"] + value
+        if GameState.Team == "Deck":
+            reward = -reward
+
+        if move is not None:
+            # Back from classes to the cards of the GameState.
+            card, taken = move
+            played = next(tuple(other) for other in GameState.PlayersCards[player] if CLASS_OF[tuple(other)] == card)
+            if not taken:
+                picks = []
+            elif len(taken) == 1:
+                picks = tuple(GameState.Table[taken[0]])
+            else:
+                picks = [tuple(GameState.Table[position]) for position in taken]
+            move = {played: picks}
+
+        return reward, move
+
+    def Stats(self) -> dict:
+        """
+        Returns the solver counters.
+        """
+
+        return {
+            "Entries": len(self),
+            "Solves": self.Solves,
+            "Nodes": self.Nodes,
+            "Hits": self.Hits,
+            "Clears": self.Clears,
+        }
@@ -1,16 +1,132 @@
 import itertools
 
+import CaptureIndex
+
 values = {(1, 1): 26, (2, 1): 22, (3, 1): 23, (4, 1): 24, (5, 1): 25, (6, 1): 28, (7, 1): 139, (8, 1): 20, (9, 1): 20, (10, 1): 139,
           (1, 2): 16, (2, 2): 12, (3, 2): 13, (4, 2): 14, (5, 2): 15, (6, 2): 18, (7, 2): 29, (8, 2): 10, (9, 2): 10, (10, 2): 10,
           (1, 3): 16, (2, 3): 12, (3, 3): 13, (4, 3): 14, (5, 3): 15, (6, 3): 18, (7, 3): 29, (8, 3): 10, (9, 3): 10, (10, 3): 10,
           (1, 4): 16, (2, 4): 12, (3, 4): 13, (4, 4): 14, (5, 4): 15, (6, 4): 18, (7, 4): 29, (8, 4): 10, (9, 4): 10, (10, 4): 10}
 
 def Greedy(legalMoves, table, Standalone, values = values):
-    if CheckForScopa(legalMoves, table, Standalone, values):
-        return CheckForScopa(legalMoves, table, Standalone, values)
+    # Same decision as CheckForScopa, then BestMove(*BasicPlay(...)), in a single pass:
+    # the subset sums of the table are enumerated once and shared by all the cards in hand.
+    table_sum = sum(card[0] for card in table)
+
+    best_broom = None
+    max_value = float('-inf')
+    for card in legalMoves:
+        if card[0] == table_sum and values[card] > max_value:
+            max_value = values[card]
+            best_broom = card
+    if best_broom is not None:
+        return best_broom if Standalone else {best_broom: table}
+
+    # BasicPlay takes, for each rank, the first card of that rank on the table.
+    first_of_rank = {}
+    for pick in table:
+        first_of_rank.setdefault(pick[0], pick)
+
+    targets = {card[0] for card in legalMoves if card[0] not in first_of_rank}
+    combinations = BestCombinations([card[0] for card in table], first_of_rank, targets, values) if targets else {}
+
+    risultato = []
+    cards_to_be_taken = []
+    max_score = float('-inf')
+    for card in legalMoves:
+        if card[0] in first_of_rank:
+            pick = first_of_rank[card[0]]
+            score = values[card] + values[pick]
+        elif card[0] in combinations:
+            pick_value, pick = combinations[card[0]]
+            score = values[card] + pick_value
+        else:
+            continue
+        if score > max_score:
+            max_score = score
+            risultato = card
+            cards_to_be_taken = pick
+
+    if max_score == float('-inf'):
+        # No captures: the least valuable card, in the same (set) order as BasicPlay.
+        min_score = float('inf')
+        for choice in list(set(legalMoves)):
+            if values[choice] < min_score:
+                min_score = values[choice]
+                risultato = choice
+
+    if Standalone:
+        return risultato
     else:
-        return BestMove(BasicPlay(legalMoves, table)[0], BasicPlay(legalMoves, table)[1], legalMoves, Standalone, values)
+        return {
+            risultato: cards_to_be_taken
+        }
+
+
+def BestCombinations(list_table, first_of_rank, targets, values = values):
+    # For each target rank, the most valuable combination of at least two table cards adding up to it,
+    # as (value, cards): the first one in itertools.combinations order, each rank resolved to its first card on the table.
+    # The combinations are read from the capture table of CaptureIndex, if there is one.
+    counts = [0] * 10
+    for rank in list_table:
+        counts[rank - 1] += 1
+    captures = CaptureIndex.TableChoices(tuple(counts), targets)
+    if captures is None:
+        return SearchCombinations(list_table, first_of_rank, targets, values)
+
+    positions = {}
+    for position, rank in enumerate(list_table):
+        positions.setdefault(rank, []).append(position)
+
+    best = {}
+    for target in targets:
+        top = None
+        for choice in captures[target]:
+            value = sum(k * values[first_of_rank[rank]] for rank, k in choice)
+            if top is not None and value < top[0]:
+                continue
+            # The first subset of cards of these ranks in itertools.combinations order: the smallest, then the first positions.
+            taken = sorted(position for rank, k in choice for position in positions[rank][:k])
+            if top is None or value > top[0] or (len(taken), taken) < (len(top[1]), top[1]):
+                top = (value, taken)
+        if top is not None:
+            best[target] = (top[0], [first_of_rank[list_table[position]] for position in top[1]])
+
+    return best
+
+
+def SearchCombinations(list_table, first_of_rank, targets, values = values):
+    # BestCombinations, enumerating the subsets of the table.
+    best = {}
+    limit = max(targets)
+    n = len(list_table)
+    subset = []
+
+    def extend(start, size, total):
+        if size == 0:
+            if total in targets:
+                value = sum(values[first_of_rank[rank]] for rank in subset)
+                if total not in best or value > best[total][0]:
+                    best[total] = (value, [first_of_rank[rank] for rank in subset])
+            return
+        for i in range(start, n - size + 1):
+            rank = list_table[i]
+            # Every other card adds at least 1.
+            if total + rank + size - 1 <= limit:
+                subset.append(rank)
+                extend(i + 1, size - 1, total + rank)
+                subset.pop()
+
+    for size in range(2, min(n, limit) + 1):
+        extend(0, size, 0)
+    # extend refers to itself through its closure: without this cycle, best and the table are freed on return,
+    # instead of piling up in the rollouts until the next garbage collection.
+    del extend
+
+    return best
+
 
+# The original two-pass Greedy: Greedy no longer calls these, they are kept as the reference it must agree with
+# (Benchmarks.LegacyGreedy replays them against Greedy), and PolicyCache and BatchGreedy document their rules by them.
 
 def CheckForScopa(legalMoves, table, Standalone, values): # check if it's possible to do a scopa
     best_broom = None
@@ -0,0 +1,114 @@
+import time
+
+
+## Search Phases
+
+# The phases of an iteration of TreeSearch: selection, expansion, rollout and backpropagation split the iteration;
+# opponents (the other players' policy, in PlayTurn) and endgame (the exact solver) are parts of them,
+# clone is the time spent copying GameStates.
+PHASES = ("selection", "expansion", "rollout", "backpropagation", "opponents", "endgame", "clone")
+
+
+## `SearchStats`
+
+class SearchStats(object):
+    """
+    The instrumentation of one decision of AgentCarletto (see its Instrument argument): wall time per phase (see PHASES)
+    and counters of the search, filled in by TreeSearch.
+
+    - Rollouts: the rollouts played (a batch of RolloutBatch counts as that many);
+    - Nodes: the tree nodes created, the root included;
+    - Moves: the moves applied to the working state (by the agent and by the other players);
+    - Clones: the GameStates copied;
+    - Branching: the total number of legal moves of the nodes created, for the average branching factor;
+    - Carried: the visits of the tree carried over from the previous decision (see AgentCarletto.Advance).
+    """
+
+    def __init__(self) -> None:
+        self.Times = dict.fromkeys(PHASES, 0.0)
+        self.Iterations = 0
+        self.Rollouts = 0
+        self.Nodes = 0
+        self.Moves = 0
+        self.Clones = 0
+        self.Branching = 0
+        self.Solves = 0
+        self.Carried = 0
+        self.Elapsed = 0.0
+
+    def Add(
+        self,
+        Phase: str,
+        Seconds: float
+        ) -> None:
+        self.Times[Phase] += Seconds
+
+    def AddNode(
+        self,
+        Moves: int
+        ) -> None:
+        """
+        Counts a new node with that many legal moves.
+        """
+
+        self.Nodes += 1
+        self.Branching += Moves
+
+    def Merge(
+        self,
+        Other: "SearchStats"
+        ) -> None:
+        """
+        Adds the times and counters of another SearchStats (for instance those of a search thread) to these.
+        """
+
+        for Phase, Seconds in Other.Times.items():
+            self.Times[Phase] += Seconds
+        self.Rollouts += Other.Rollouts
+        self.Nodes += Other.Nodes
+        self.Moves += Other.Moves
+        self.Clones += Other.Clones
+        self.Branching += Other.Branching
+        self.Solves += Other.Solves
+
+    def Stats(self) -> dict:
+        """
+        Returns the statistics of the decision, with CamelCase keys as the other Stats of the agent modules:
+
+        - SelectionMs, ExpansionMs, RolloutMs, BackpropagationMs, OpponentsMs, EndgameMs, CloneMs: the time of each phase
+          (see PHASES), and TotalMs the wall time of the decision, in milliseconds;
+        - Iterations, Rollouts, Nodes, Moves, Clones, Solves, Carried: the counters (see the class);
+        - BranchingFactor: the average number of legal moves of the nodes created;
+        - RolloutsPerSecond: the rollouts per second of wall time.
+        """
+
+        Stats = {f"{Phase.capitalize()}Ms": Seconds * 1000 for Phase, Seconds in self.Times.items()}
+        Stats.update({
+            "TotalMs": self.Elapsed * 1000,
+            "Iterations": self.Iterations,
+            "Rollouts": self.Rollouts,
+            "Nodes": self.Nodes,
+            "Moves": self.Moves,
+            "Clones": self.Clones,
+            "Solves": self.Solves,
+            "Carried": self.Carried,
+            "BranchingFactor": self.Branching / self.Nodes if self.Nodes else 0.0,
+            "RolloutsPerSecond": self.Rollouts / self.Elapsed if self.Elapsed > 0 else 0.0,
+        })
+
+        return Stats
+
+    def Export(
+        self,
+        Path: str,
+        **Fields
+        ) -> None:
+        """
+        Appends the statistics of the decision to a JSON lines file, one object per decision: Time (the Unix time of
+        the export), any extra Fields (for instance the game and the ply) and the keys of Stats.
+        """
+
+        import json
+
+        with open(Path, "a") as file:
+            file.write(json.dumps({"Time": time.time(), **Fields, **self.Stats()}) + "\n")
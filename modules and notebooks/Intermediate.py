@@ -1,5 +1,3 @@
-import itertools
-
 values = {(1, 1): 26, (2, 1): 22, (3, 1): 23, (4, 1): 24, (5, 1): 25, (6, 1): 28, (7, 1): 139, (8, 1): 20, (9, 1): 20, (10, 1): 139,
           (1, 2): 16, (2, 2): 12, (3, 2): 13, (4, 2): 14, (5, 2): 15, (6, 2): 18, (7, 2): 29, (8, 2): 10, (9, 2): 10, (10, 2): 10,
           (1, 3): 16, (2, 3): 12, (3, 3): 13, (4, 3): 14, (5, 3): 15, (6, 3): 18, (7, 3): 29, (8, 3): 10, (9, 3): 10, (10, 3): 10,
@@ -31,61 +29,76 @@ def CheckForScopa(legalMoves, table, Standalone, values = values): # check if it
                 best_broom: table
             }
 
-def AvoidScopa(legalMoves, table, deck):
-    list_table = [rank[0] for rank in table]
-    list_deck = [rank[0] for rank in deck]
+def UnseenRanks(deck):
+    # How many unseen cards there are of each rank (index 0 is unused): a scopa-risk check is then a single lookup.
+    counts = [0] * 11
+    for card in deck:
+        counts[card[0]] += 1
+    return counts
+
+def TableCombinations(list_table, first_of_rank, targets):
+    # For each target rank, all the combinations of at least two table cards adding up to it, in itertools.combinations order,
+    # each rank resolved to its first card on the table (as the sums of the original AvoidScopa loop).
+    combinations = {}
+    limit = max(targets)
+    n = len(list_table)
+    subset = []
+
+    def extend(start, size, total):
+        if size == 0:
+            if total in targets:
+                combinations.setdefault(total, []).append([first_of_rank[rank] for rank in subset])
+            return
+        for i in range(start, n - size + 1):
+            rank = list_table[i]
+            # Every other card adds at least 1.
+            if total + rank + size - 1 <= limit:
+                subset.append(rank)
+                extend(i + 1, size - 1, total + rank)
+                subset.pop()
+
+    for size in range(2, min(n, limit) + 1):
+        extend(0, size, 0)
+    del extend  # breaks the cycle through its closure, as in Greedy_MOD.SearchCombinations
+
+    return combinations
+
+def AvoidScopa(legalMoves, table, deck, unseen = None):
+    # The unseen ranks are counted once; the table subsets are enumerated once and shared by all the cards in hand.
+    if unseen is None:
+        unseen = UnseenRanks(deck)
+    table_sum = sum(rank[0] for rank in table)
+
+    def risky(sum_table):
+        # an unseen card of this rank would sweep the table
+        return 0 < sum_table < 11 and unseen[sum_table] > 0
+
+    first_of_rank = {}
+    for pick in table:
+        first_of_rank.setdefault(pick[0], pick)
+
+    targets = {card[0] for card in legalMoves if card[0] not in first_of_rank}
+    combinations = TableCombinations([rank[0] for rank in table], first_of_rank, targets) if targets else {}
+
     possible_picks = {}
     possible_plays = []
     no_plays = []
     for card in legalMoves:
-        if card[0] in list_table:
-            copy = list_table[:]
-            sum_table = sum(rank_table for rank_table in copy) - card[0]
-            if sum_table in list_deck:
-                pass
-            else:
+        if card[0] in first_of_rank:
+            if not risky(table_sum - card[0]):
                 possible_plays.append(card)
-                for pick in table:
-                    if pick[0] == card[0]:
-                        possible_picks[card] = pick
-                        break  
+                possible_picks[card] = first_of_rank[card[0]]
         else:
-            copy = list_table[:]
-            copy.append(card[0])
-            sum_table = sum(rank_table for rank_table in copy)
-            if sum_table in list_deck:
-                pass
-            else:
+            subsets = combinations.get(card[0])
+            risky_pick = risky(table_sum - card[0])
+            # placing the card is safe, or it can take a combination safely
+            if not risky(table_sum + card[0]) or (subsets and not risky_pick):
                 possible_plays.append(card)
-            subsets = []
-            for r in range(2, len(list_table) + 1):
-                for subset in itertools.combinations(list_table, r):
-                    if sum(subset) == card[0]:
-                        copy = list_table[:]
-                        sum_table = sum(rank_table for rank_table in copy) - card[0]
-                        if sum_table in list_deck:
-                            no_plays.append(card)
-                        else:
-                            possible_plays.append(card)
-                            subsets.append(subset)
-                            sums = []
-                            for value_sum in subsets:
-                                sub = []
-                                for single_card in value_sum:
-                                    for pick in table:
-                                        if single_card == pick[0]:
-                                            single_card = pick
-                                            sub.append(single_card)
-                                sums.append(sub)
-                            possible_picks[card] = sums
-                    else:
-                        copy = list_table[:]
-                        copy.append(card[0])
-                        sum_table = sum(rank_table for rank_table in copy)
-                        if sum_table in list_deck:
-                            pass
-                        else:
-                            possible_plays.append(card)
+            if subsets:
+                if risky_pick:
+                    no_plays.append(card)
+                else:
+                    possible_picks[card] = subsets
     possible_plays = list(set(possible_plays))
     for i in no_plays:
         if i in possible_plays:
@@ -196,8 +209,10 @@ def BestMove(possible_picks, possible_plays, legalMoves, Standalone, values = va
                 risultato: ()
             }
 def Intermediate(legalMoves, table, deck, Standalone, values = values):
-    if CheckForScopa(legalMoves, table, Standalone, values):
-        return CheckForScopa(legalMoves, table, Standalone, values)
+    scopa = CheckForScopa(legalMoves, table, Standalone, values)
+    if scopa:
+        return scopa
     else:
-        return BestMove(AvoidScopa(legalMoves, table, deck)[0], AvoidScopa(legalMoves, table, deck)[1], legalMoves, Standalone, values)
+        possible_picks, possible_plays = AvoidScopa(legalMoves, table, deck)
+        return BestMove(possible_picks, possible_plays, legalMoves, Standalone, values)
 
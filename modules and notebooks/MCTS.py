@@ -1,15 +1,19 @@
 import copy
-import itertools
-import typing
+import gc
+import math
 import random
+import time
 
+import CaptureIndex
+import Endgame
 import Greedy_MOD
+import Instrumentation
 import Intermediate
+import PolicyCache
 
 from Greedy_MOD import values
 
-from pandas import NA
-from pandas._libs.missing import NAType
+from Missing import NA, NAType
 
 
 ## Helper Functions and Variables
@@ -79,6 +83,46 @@ class IGameState(object):
         '''
         raise NotImplementedError()
 
+    def Derive(
+        self
+    ):
+        '''
+        This method returns a copy of a GameState descending from the current one, to be stored as a tree node.
+        '''
+        raise NotImplementedError()
+
+    def DoMove(
+        self
+    ):
+        '''
+        This method applies a move in place and returns an undo entry.
+        '''
+        raise NotImplementedError()
+
+    def UndoMove(
+        self
+    ):
+        '''
+        This method reverts a move applied in place, given its undo entry.
+        '''
+        raise NotImplementedError()
+
+    def Redeal(
+        self
+    ):
+        '''
+        This method replaces the hands of some players in place and returns an undo entry.
+        '''
+        raise NotImplementedError()
+
+    def Restore(
+        self
+    ):
+        '''
+        This method reverts a Redeal, given its undo entry.
+        '''
+        raise NotImplementedError()
+
 class IGameMove(object):
     '''
     This interface class represents a MOVE in the game.
@@ -113,8 +157,38 @@ class Card(object):
     
     - Rank: the number corresponding to the card.
     - Suit (Seme): the suit to which it belongs.
+
+    The 40 cards of the deck are interned: Card(rank, suit) always returns the same immutable instance,
+    which carries a precomputed value and an integer Id from 0 to 39.
     """
 
+    __slots__ = ("Rank", "Suit", "Id", "_value")
+
+    _interned = {}
+
+    def __new__(
+        cls,
+        Rank: int = NA,
+        Suit: int = NA
+        ):
+        card = cls._interned.get((Rank, Suit))
+        if card is not None:
+            return card
+
+        card = super().__new__(cls)
+        object.__setattr__(card, "Rank", Rank)
+        object.__setattr__(card, "Suit", Suit)
+
+        if (Rank, Suit) in Greedy_MOD.values:
+            object.__setattr__(card, "Id", (Suit - 1) * 10 + Rank - 1)
+            object.__setattr__(card, "_value", Greedy_MOD.values[Rank, Suit])
+            cls._interned[Rank, Suit] = card
+        else:
+            object.__setattr__(card, "Id", 40)
+            object.__setattr__(card, "_value", NA)
+
+        return card
+
     def __init__(
         self,
         Rank: int = NA,
@@ -124,12 +198,24 @@ class Card(object):
         To instantiate a Card object, a Rank and Suit have to be specified.
         It is possible to instantiate an "empty" card, in which both Rank and Suits NA.
 
+        Attributes are set once in __new__: a Card is immutable.
+
         Args:
             Rank (int, optional): Defaults to NA.
             Suit (int, optional): Defaults to NA.
         """
-        self.Rank = Rank
-        self.Suit = Suit
+
+    def __setattr__(self, name, value) -> None:
+        raise AttributeError(f"Card objects are immutable, cannot set {name}.")
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return Card, (self.Rank, self.Suit)
 
     def __str__(self) -> str:
         """
@@ -151,26 +237,15 @@ class Card(object):
 
     def __hash__(self) -> int:
         """
-        Card objects need to be hashable.
-        """
-        return 666
-
-    def __iter__(self) -> list:
-        """
-        Card objects are iterable, only once, returning theirself.
+        Card objects need to be hashable: the hash is the card Id.
         """
-        self.n = 0
-        return self
+        return self.Id
 
-    def __next__(self) -> None:
+    def __iter__(self):
         """
         Card objects are iterable, only once, returning theirself.
         """
-        if self.n < 1:
-            self.n += 1
-            return self
-        else:
-            raise StopIteration
+        return iter((self,))
 
     def __len__(self) -> int:
         """
@@ -178,21 +253,11 @@ class Card(object):
         """
         return 1
 
-    def Rank(self) -> int:
-        return self.Rank
-
-    def Suit(self) -> int:
-        return self.Suit
-
     def Value(self) -> int:
         """
-        This method is used to store and retrieve the reward associated with a Card.
+        This method is used to retrieve the reward associated with a Card.
         """
-        values = {(1, 1): 26, (2, 1): 22, (3, 1): 23, (4, 1): 24, (5, 1): 25, (6, 1): 28, (7, 1): 139, (8, 1): 20, (9, 1): 20, (10, 1): 139,
-          (1, 2): 16, (2, 2): 12, (3, 2): 13, (4, 2): 14, (5, 2): 15, (6, 2): 18, (7, 2): 29, (8, 2): 10, (9, 2): 10, (10, 2): 10,
-          (1, 3): 16, (2, 3): 12, (3, 3): 13, (4, 3): 14, (5, 3): 15, (6, 3): 18, (7, 3): 29, (8, 3): 10, (9, 3): 10, (10, 3): 10,
-          (1, 4): 16, (2, 4): 12, (3, 4): 13, (4, 4): 14, (5, 4): 15, (6, 4): 18, (7, 4): 29, (8, 4): 10, (9, 4): 10, (10, 4): 10}
-        return values[self.Rank, self.Suit]
+        return self._value
 
     def __add__(self, other) -> int:
         if isinstance(other, Card):
@@ -208,29 +273,27 @@ class Card(object):
 
     def __mul__(self, other) -> int:
         if isinstance(other, Card):
-            return self.Value() + other.Value()
+            return self._value + other._value
         raise TypeError(
             (f"unsupported operand type(s) for *: "
              f"{type(self)} and {type(other)}"))
 
     def __eq__(self, other) -> bool:
-        if isinstance(self, Card) and isinstance(other, Card):
-            if self.Rank == other.Rank and self.Suit == other.Suit:
-                return True
-            else:
-                return False
-        elif isinstance(self, tuple) and isinstance(other, Card):
-            rank, suit = other.Rank, other.Suit
-            if self[0] == rank and self[1] == suit:
-                return True
-            else:
-                return False
-        elif isinstance(self, Card) and isinstance(other, tuple):
-            rank, suit = self.Rank, self.Suit
-            if other[0] == rank and other[1] == suit:
-                return True
-            else:
-                return False
+        if self is other:
+            return True
+        if isinstance(other, Card):
+            return self.Rank == other.Rank and self.Suit == other.Suit
+        if isinstance(other, tuple):
+            return other[0] == self.Rank and other[1] == self.Suit
+        return False
+
+    def __ne__(self, other) -> bool:
+        return not self.__eq__(other)
+
+# Intern the whole deck up front.
+for _rank, _suit in Greedy_MOD.values:
+    Card(_rank, _suit)
+del _rank, _suit
 
 def convert_to_card(
     card: tuple
@@ -243,18 +306,17 @@ def convert_to_card(
         card (tuple): a tuple describing a card, (rank, suit).
 
     Returns:
-        Card: a Card describing a card.
+        Card: the interned Card describing a card.
     """
 
-    if not isinstance(card, Card):
-
-        new_card = Card()
-        new_card.Rank, new_card.Suit = card
+    if isinstance(card, Card):
+        return card
 
-        return new_card
+    interned = Card._interned.get((card[0], card[1]))
+    if interned is not None:
+        return interned
 
-    elif isinstance(card, Card):
-        return card
+    return Card(*card)
 
 def convert_to_tuple(
     card: Card
@@ -282,6 +344,106 @@ def sum_combination_ranks(
 
     return combination_sum
 
+def move_key(Move: dict) -> tuple:
+    """
+    Returns a canonical, hashable key for a move, so that equal moves built in different processes
+    or with a different order of the picked cards can be matched.
+
+    Args:
+        Move (dict): a dictionary in the form {card to be played: card or combination of cards to be taken}.
+
+    Returns:
+        tuple: the Id of the played card and the sorted Ids of the taken cards.
+    """
+
+    ((played, picks),) = Move.items()
+    if isinstance(picks, (Card, tuple)):
+        picks = [picks]
+
+    return convert_to_card(played).Id, tuple(sorted(convert_to_card(pick).Id for pick in picks))
+
+
+# How a rollout ended (see AgentCarletto.Rollout and Trace): at the end of the game, or solved exactly.
+# Code 1 stood for a cutoff on a transposition table, in older traces.
+ROLLOUT_FINISHED, ROLLOUT_ENDGAME = 0, 2
+
+
+## Zobrist Hashing
+
+# One random 64-bit key for each card in each location: the four hands (0 to 3) and the table (4).
+# Cards in no location have been taken. A key for each player to move is mixed in by __hash__.
+
+ZOBRIST_MASK = (1 << 64) - 1
+ZOBRIST_TABLE = 4
+
+_zobrist_rng = random.Random(19)
+ZOBRIST_CARDS = [[_zobrist_rng.getrandbits(64) for location in range(5)] for card in range(40)]
+ZOBRIST_PLAYERS = [_zobrist_rng.getrandbits(64) for player in range(4)]
+del _zobrist_rng
+
+def zobrist_scores(
+    HandScore: int,
+    DeckScore: int
+    ) -> int:
+    """
+    Mixes the two team scores into a 64-bit key, so that positions with the same cards but different scores differ.
+    """
+
+    return (HandScore * 0x9E3779B97F4A7C15 ^ DeckScore * 0xC2B2AE3D27D4EB4F) & ZOBRIST_MASK
+
+def zobrist_key(
+    PlayersCards: dict,
+    Table: list,
+    TeamScores: dict
+    ) -> int:
+    """
+    Computes from scratch the Zobrist key of a position: the XOR of the keys of each card in its location, and of the scores.
+
+    Args:
+        PlayersCards (dict): the cards in each player's hand.
+        Table (list): the cards on the table.
+        TeamScores (dict): the scores of the two teams.
+
+    Returns:
+        int: a 64-bit key.
+    """
+
+    key = zobrist_scores(TeamScores["Hand"], TeamScores["Deck"])
+
+    for player in range(4):
+        for card in PlayersCards[player]:
+            key ^= ZOBRIST_CARDS[convert_to_card(card).Id][player]
+
+    for card in Table:
+        key ^= ZOBRIST_CARDS[convert_to_card(card).Id][ZOBRIST_TABLE]
+
+    return key
+
+def zobrist_delta(
+    Position: int,
+    OldHand: list,
+    NewHand: list,
+    OldTable: list,
+    NewTable: list
+    ) -> int:
+    """
+    Computes the XOR that updates a Zobrist key after a move, from the hand and table before and after it.
+    """
+
+    delta = 0
+
+    new_hand = {convert_to_card(card).Id for card in NewHand}
+    for card in OldHand:
+        if convert_to_card(card).Id not in new_hand:
+            delta ^= ZOBRIST_CARDS[convert_to_card(card).Id][Position]
+
+    old_table = {convert_to_card(card).Id for card in OldTable}
+    new_table = {convert_to_card(card).Id for card in NewTable}
+    for card in old_table ^ new_table:
+        delta ^= ZOBRIST_CARDS[card][ZOBRIST_TABLE]
+
+    return delta
+
 def unpack_moves(MovesDict: dict) -> dict:
     """
     This unpack a moves dictionary by yielding a simpler data structure.
@@ -343,13 +505,16 @@ class ScoponeMove(IGameMove):
     def GetMove(
         self,
         Greedy: bool = True,
-        Standalone:bool = False
+        Standalone:bool = False,
+        Cache: PolicyCache.DecisionCache = None
         ) -> tuple:
         """
         This method, given the elements of the game (LegalMoves, Table, Deck), outputs a tuple representing the card chosen by applying the Intermediate or Greedy (default) strategies.
 
         Args:
-            game_mode (bool, optional): Decide whether to use the Greedy strategy or not. Defaults to False.
+            Greedy (bool, optional): Decide whether to use the Greedy strategy or the Intermediate one. Defaults to True.
+            Standalone (bool, optional): return only the card to be played. Defaults to False.
+            Cache (PolicyCache.DecisionCache, optional): a decision cache shared across calls; the move is the same. Defaults to None.
 
         Returns:
             tuple: a card, representing the move chosen by the AI.
@@ -359,27 +524,35 @@ class ScoponeMove(IGameMove):
         """
 
         if Greedy:
-            return Greedy_MOD.Greedy(
+            return (Greedy_MOD.Greedy if Cache is None else Cache.Greedy)(
                 legalMoves = self.Hand,
                 table = self.Table,
                 Standalone=Standalone,
                 values = values
                 )
 
-        # else:
-        #     return Intermediate.Intermediate(
-        #         legalMoves = self.Hand,
-        #         table = self.Table,
-        #         deck = self.Deck,
-        #         standalone=standalone,
-        #         values = values
-        #         )
+        else:
+            # Deck holds the cards unseen by the player: AvoidScopa counts their ranks once per call.
+            Move = (Intermediate.Intermediate if Cache is None else Cache.Intermediate)(
+                legalMoves = self.Hand,
+                table = self.Table,
+                deck = self.Deck,
+                Standalone = Standalone,
+                values = values
+                )
+            if Standalone:
+                return Move
+            # Intermediate places a card as {card: ()}: use the [] of the other moves.
+            return {card: ([] if picks == () else picks) for card, picks in Move.items()}
 
     def GetCombinations(
         Table: list
         ) -> dict:
         """
-        This method returns all possible combinations of table cards
+        This method returns all possible combinations of table cards.
+
+        Combinations are read from the subset-sum index in CaptureIndex, instead of enumerating
+        every itertools.combinations of the table and discarding those summing over 10.
 
         Args:
             Table (tuple): a list of tuples representing cards.
@@ -388,23 +561,11 @@ class ScoponeMove(IGameMove):
             Combinations: a dictionary of summed ranks as keys and combinations of cards as values representing the legal combined picks.
         """
 
-        available_combinations = []
-
-        for L in range(2, len(Table) + 1):
-            available_combinations.append(itertools.combinations(map(convert_to_card, Table), L))
-
-        Combinations = {key: list() for key in range(1, 11)}
-
-        for combinations in available_combinations:
-            for combination in combinations:
-                combination_sum = 0
-                combination_cards = []
-                for card in combination:
-                    combination_sum += card.Rank
-                    combination_cards.append(card)
-                if combination_sum < 11:
-                    Combinations[combination_sum].append(combination_cards)
-
+        Combinations = CaptureIndex.CaptureOptions(
+            list(map(convert_to_card, Table)),
+            RankOf=lambda card: card.Rank,
+            MinSize=2
+            )
 
         return Combinations
 
@@ -533,6 +694,7 @@ class ScoponeGameState(IGameState):
         self.LastTaker = LastTaker
         self.ParentMove = ParentMove
         self.values = values
+        self.ZobristKey = zobrist_key(PlayersCards, Table, TeamScores)
 
     def __eq__(self, other) -> bool:
         check = [self.PlayerPosition == other.PlayerPosition,
@@ -551,7 +713,10 @@ class ScoponeGameState(IGameState):
             return False
 
     def __hash__(self) -> int:
-        return super().__hash__()
+        """
+        The hash is the Zobrist key of the position, maintained incrementally by DoMove, combined with the player to move.
+        """
+        return self.ZobristKey ^ ZOBRIST_PLAYERS[self.PlayerPosition]
 
     def __repr__(self) -> str:
         if isinstance(self.ParentMove, Card):
@@ -572,6 +737,28 @@ class ScoponeGameState(IGameState):
 
         return copy.deepcopy(self)
 
+    def Derive(
+        self,
+        GameState: IGameState,
+        ParentMove: dict = NA
+        ) -> IGameState:
+        """
+        This method copies a GameState reached from the current one (for instance the working state of a rollout),
+        so that it can be stored as a tree node.
+
+        Args:
+            GameState (IGameState): a GameState descending from the current one.
+            ParentMove (dict, optional): the move that originated the copy. Defaults to NA.
+
+        Returns:
+            ScoponeGameState: a deepcopy of GameState.
+        """
+
+        new_game_state = GameState.CloneState()
+        new_game_state.ParentMove = ParentMove
+
+        return new_game_state
+
     def IsTerminal(self) -> bool:
         """
         This is method to check whether the GameState corresponds to the last turn.
@@ -672,6 +859,163 @@ class ScoponeGameState(IGameState):
 
         return LegalMoves
 
+    def DoMove(
+            self,
+            Move: dict
+            ) -> tuple:
+        """
+        Applies a move to the current GameState IN PLACE and returns a compact undo entry,
+        to be passed to UndoMove to restore the GameState as it was before the move.
+
+        The move has the same format as in ApplyMove:
+
+        {card to be played: card or combination of cards to be taken}
+
+        The card played is removed from the hand list and a card placed is appended to the table list, in place:
+        the entry only stores where the card was. A capture replaces the table list, and its entry also keeps
+        the previous table, score, LastTaker, Reward and ZobristKey.
+
+        Args:
+            Move (dict): a dictionary in the form {card to be played: card or combination of cards to be taken}.
+
+        Returns:
+            tuple: the undo entry (PlayerPosition, Team, the card played, its index in the hand,
+                and (Table, team score, LastTaker, Reward, ZobristKey) for a capture or None).
+        """
+
+        new_hand, new_table, new_score = self.ResolveMove(self.Hand, self.Table, Move)
+
+        played = convert_to_card(next(iter(Move)))
+        card = (played.Rank, played.Suit)
+        index = self.Hand.index(card)
+        del self.Hand[index]
+
+        if new_score is None:
+            self.Table.append(card)
+            self.ZobristKey ^= ZOBRIST_CARDS[played.Id][self.PlayerPosition] ^ ZOBRIST_CARDS[played.Id][ZOBRIST_TABLE]
+            return (self.PlayerPosition, self.Team, card, index, None)
+
+        Captured = (self.Table, self.TeamScores[self.Team], self.LastTaker, self.Reward, self.ZobristKey)
+
+        self.ZobristKey ^= ZOBRIST_CARDS[played.Id][self.PlayerPosition] ^ zobrist_delta(self.PlayerPosition, (), (), self.Table, new_table)
+        self.Table = new_table
+
+        self.ZobristKey ^= zobrist_scores(self.TeamScores["Hand"], self.TeamScores["Deck"])
+        self.LastTaker = self.PlayerPosition
+        self.TeamScores[self.Team] += new_score
+        self.Reward = self.ComputeRewards()
+        self.ZobristKey ^= zobrist_scores(self.TeamScores["Hand"], self.TeamScores["Deck"])
+
+        return (self.PlayerPosition, self.Team, card, index, Captured)
+
+    @staticmethod
+    def ResolveMove(
+            Hand: list,
+            Table: list,
+            Move: dict
+            ) -> tuple:
+        """
+        Computes the effects of a move on a hand and a table, without modifying them.
+
+        Args:
+            Hand (list): the cards in the hand of the player making the move.
+            Table (list): the cards on the table.
+            Move (dict): a dictionary in the form {card to be played: card or combination of cards to be taken}.
+
+        Returns:
+            tuple: the new hand and the new table (lists of tuples), and the points scored by the move
+                (None if no card has been taken, and the played card has been placed on the table).
+        """
+
+        ((played, picks),) = Move.items()
+        played = convert_to_card(played)
+
+        new_hand = list(Hand)
+        new_hand.remove((played.Rank, played.Suit))
+
+        if isinstance(picks, (Card, tuple)):
+            picks = [picks]
+
+        if len(picks) == 0 or len(Table) == 0:
+            return new_hand, list(Table) + [(played.Rank, played.Suit)], None
+
+        taken = set(map(convert_to_card, picks))
+        new_table = list()
+        new_score = played.Value()
+
+        for card in map(convert_to_card, Table):
+            if card in taken:
+                new_score += card.Value()
+            else:
+                new_table.append((card.Rank, card.Suit))
+
+        if len(new_table) == 0:
+            #aggiungi un punto perché hai fatto scopa
+            new_score += 1000
+
+        return new_hand, new_table, new_score
+
+    def UndoMove(
+            self,
+            Undo: tuple
+            ) -> None:
+        """
+        Restores the GameState as it was before the DoMove call that returned the undo entry.
+        Undo entries must be applied in the reverse order of their moves.
+
+        Args:
+            Undo (tuple): an undo entry returned by DoMove.
+        """
+
+        self.PlayerPosition, self.Team, card, index, Captured = Undo
+        self.Hand = self.PlayersCards[self.PlayerPosition]
+        self.Hand.insert(index, card)
+
+        if Captured is None:
+            self.Table.pop()
+            Id = convert_to_card(card).Id
+            self.ZobristKey ^= ZOBRIST_CARDS[Id][self.PlayerPosition] ^ ZOBRIST_CARDS[Id][ZOBRIST_TABLE]
+        else:
+            self.Table, self.TeamScores[self.Team], self.LastTaker, self.Reward, self.ZobristKey = Captured
+
+    def Redeal(
+            self,
+            Hands: dict
+            ) -> tuple:
+        """
+        Replaces the hands of some players IN PLACE (a determinization of the hidden cards, see AgentCarletto.Determinizations)
+        and returns an undo entry, to be passed to Restore. The Zobrist key is recomputed.
+
+        Args:
+            Hands (dict): the new hands, {player: list of cards}.
+
+        Returns:
+            tuple: the undo entry (the previous hands of those players, ZobristKey).
+        """
+
+        Undo = ({player: self.PlayersCards[player] for player in Hands}, self.ZobristKey)
+
+        self.PlayersCards.update(Hands)
+        self.Hand = self.PlayersCards[self.PlayerPosition]
+        self.ZobristKey = zobrist_key(self.PlayersCards, self.Table, self.TeamScores)
+
+        return Undo
+
+    def Restore(
+            self,
+            Undo: tuple
+            ) -> None:
+        """
+        Restores the hands replaced by the Redeal call that returned the undo entry.
+
+        Args:
+            Undo (tuple): an undo entry returned by Redeal.
+        """
+
+        Hands, self.ZobristKey = Undo
+        self.PlayersCards.update(Hands)
+        self.Hand = self.PlayersCards[self.PlayerPosition]
+
     def ApplyMove(
             self,
             BestMove: dict
@@ -700,82 +1044,10 @@ class ScoponeGameState(IGameState):
             IGameState: a copy of the starting GameState modified by the effects of the BestMove.
         """
 
-        # Reminder:
-        #
-        # BestMove key = card in your hand to be played.
-        # BestMove value = card/combinations of cards to be taken from the table.
-
         new_game_state = self.CloneState()
-        new_table = list(map(convert_to_card, new_game_state.Table))
-        new_hand = list(map(convert_to_card, new_game_state.Hand))
-        new_score = 0
-        updated_scores = new_game_state.TeamScores
-
-        picks_check = len(list(BestMove.values())[0])
-
-        if picks_check == 0 or len(new_game_state.Table) == 0:
-            card_to_be_played = [card for card in map(convert_to_card, BestMove.keys())][0]
+        new_game_state.DoMove(BestMove)
 
-            new_table.append(card_to_be_played)
-            new_hand.remove(card_to_be_played)
-
-            new_game_state.Hand = list(map(convert_to_tuple, new_hand))
-            new_game_state.PlayersCards[new_game_state.PlayerPosition] = new_game_state.Hand
-            new_game_state.Table = list(map(convert_to_tuple, new_table))
-
-            return new_game_state
-
-        else:
-            self.LastTaker = new_game_state.PlayerPosition
-            for card_to_be_taken in BestMove.values():
-                card_to_be_played = list(map(convert_to_card, [BestMove.keys()][0]))
-
-
-                for card in new_hand:
-                    # scorre tutte le carte in mano e toglie dalla lista la carta che vuole giocare
-                    for move in card_to_be_played:
-                        if move == card:
-                            new_hand.remove(card)
-                            new_score += card.Value()
-
-
-
-                    for card in card_to_be_taken:
-                        #scorre tutte le carte in tavola e toglie dalla lista tavolo la carta/combinazione di carte
-                        if isinstance(card_to_be_taken, tuple):
-                            card_to_be_taken = convert_to_card(card_to_be_taken)
-                        if isinstance(card, int):
-                            card = card_to_be_taken
-                        for pick in new_table:
-                            if isinstance(pick, list):
-                                for card_to_remove in pick:
-                                    if card_to_remove == card:
-                                        new_table.remove(pick)
-                                        new_score += pick.Value()
-                            elif isinstance(pick, Card) and pick == card:
-                                new_table.remove(pick)
-                                new_score += pick.Value()
-                            elif isinstance(pick, tuple) and pick == card:
-                                pick = convert_to_card(pick)
-                                new_table.remove(pick)
-                                new_score += pick.Value()
-
-            if len(new_table) == 0 and not self.IsTerminal():
-                #aggiungi un punto perché hai fatto scopa
-                new_score += 1000
-
-            new_players_cards = new_game_state.PlayersCards
-            new_players_cards[new_game_state.PlayerPosition] = list(map(convert_to_tuple, new_hand))
-
-            updated_scores[new_game_state.Team] += new_score
-
-            new_game_state.PlayersCards = new_players_cards
-            new_game_state.Hand = new_hand
-            new_game_state.TeamScores = updated_scores
-            new_game_state.Reward = new_game_state.ComputeRewards()
-            new_game_state.Table = list(map(convert_to_tuple, new_table))
-            
-            return new_game_state
+        return new_game_state
 
     def FindChildren(self) -> list:
         """
@@ -805,17 +1077,133 @@ class ScoponeGameState(IGameState):
         To efficiently simulate a game, this method returns a random ScoponeGameState
         chosen from the available moves.
 
+        The move is drawn uniformly (with the same random call as picking among FindChildren, so seeded games are unchanged)
+        and only that move is applied: one copy per call instead of one per available move.
+
         Returns:
             IGameState: a ScoponeGameState.
         """
 
-        AllChildren = self.FindChildren()
+        AvailableMoves = list(unpack_moves(self.GetAvailableMoves()))
+
+        move = AvailableMoves[random.randint(0, len(AvailableMoves) -1)]
 
-        RandomChild = AllChildren[random.randint(0, len(AllChildren) -1)]
+        RandomChild = self.ApplyMove(move)
+        RandomChild.ParentMove = move
 
         return RandomChild
 
 
+## `MCTSNode`
+
+class MCTSNode(object):
+    """
+    A node of the UCT search tree. Each node is reached from its parent by one move of the agent
+    (followed by the other players' replies), and stores:
+
+    - Move: the move leading to the node.
+    - Parent: the parent node (None for the root).
+    - Children: the expanded child nodes.
+    - UntriedMoves: the legal moves not yet expanded.
+    - Visits and TotalReward: the statistics of the rollouts through the node.
+    - Availability: in an information-set search, the number of visits of the parent in which the move was legal.
+
+    Nodes do not store GameStates: the search replays their moves on AgentCarletto's working state.
+    """
+
+    __slots__ = ("Move", "Parent", "Children", "UntriedMoves", "Visits", "TotalReward", "Availability")
+
+    def __init__(
+        self,
+        Move: dict = NA,
+        Parent: "MCTSNode" = None,
+        UntriedMoves: list = None
+        ) -> None:
+        self.Move = Move
+        self.Parent = Parent
+        self.Children = list()
+        self.UntriedMoves = UntriedMoves if UntriedMoves is not None else list()
+        self.Visits = 0
+        self.TotalReward = 0.0
+        self.Availability = 0
+
+    def __repr__(self) -> str:
+        return f"MCTSNode(Move={self.Move}, Visits={self.Visits}, MeanReward={self.MeanReward():.2f})"
+
+    def MeanReward(self) -> float:
+        return self.TotalReward / self.Visits if self.Visits else 0.0
+
+    def UCB1(
+        self,
+        ExplorationConstant: float,
+        RewardRange: list
+        ) -> float:
+        """
+        The UCB1 score of the node. The mean reward is rescaled to [0, 1] with the range of the rewards seen so far,
+        so that the exploration constant does not depend on the scale of the scores.
+
+        In an information-set search, the visits of the parent are replaced by the Availability of the node.
+        """
+
+        if self.Visits == 0:
+            return float("inf")
+
+        Low, High = RewardRange
+        if High > Low:
+            Exploitation = (self.MeanReward() - Low) / (High - Low)
+        else:
+            Exploitation = 0.5
+
+        return Exploitation + ExplorationConstant * math.sqrt(math.log(self.Availability or self.Parent.Visits) / self.Visits)
+
+    def SelectChild(
+        self,
+        ExplorationConstant: float,
+        RewardRange: list
+        ) -> "MCTSNode":
+        """
+        Returns the child with the highest UCB1 score.
+        """
+
+        return max(self.Children, key=lambda child: child.UCB1(ExplorationConstant, RewardRange))
+
+    def AddChild(
+        self,
+        Move: dict,
+        UntriedMoves: list
+        ) -> "MCTSNode":
+        """
+        Creates, stores and returns a child node for a move.
+        """
+
+        Child = MCTSNode(Move=Move, Parent=self, UntriedMoves=UntriedMoves)
+        self.Children.append(Child)
+
+        return Child
+
+    def Backpropagate(
+        self,
+        Reward: float,
+        Visits: int = 1
+        ) -> None:
+        """
+        Adds the visits and the (total) reward to the node and to every ancestor, up to the root.
+        """
+
+        Node = self
+        while Node is not None:
+            Node.Visits += Visits
+            Node.TotalReward += Reward
+            Node = Node.Parent
+
+    def BestChild(self) -> "MCTSNode":
+        """
+        Returns the most visited child (the robust choice), breaking ties with the mean reward.
+        """
+
+        return max(self.Children, key=lambda child: (child.Visits, child.MeanReward()))
+
+
 ## `MCTS`
 
 class AgentCarletto(object):
@@ -835,19 +1223,77 @@ class AgentCarletto(object):
     def __init__(
         self,
         CurrentGameState: ScoponeGameState,
-        ComputationalBudget: int = 500
+        ComputationalBudget: int = 500,
+        ExplorationConstant: float = math.sqrt(2),
+        RolloutBatch: int = 1,
+        GreedyOpponents: bool = True,
+        Decisions: PolicyCache.DecisionCache = None,
+        EndgameCards: int = 0,
+        Solver: Endgame.EndgameSolver = None,
+        Determinizations: int = 0,
+        Instrument: bool = False,
+        Tracer: "Trace.RolloutTracer" = None,
+        ReuseTree: bool = False
         ) -> None:
         """
 
         Args:
             CurrentGameState (ScoponeGameState): a ScoponeGameState representing the current game in all its aspects, because
-                AgentCarletto needs to know what is doing.
+                AgentCarletto needs to know what is doing. A state with mask moves (Bitboard.BitboardGameState) plays its
+                rollouts with them (see Rollout and PlayTurn).
             ComputationalBudget (int, optional): the MCTS algorithm is simulation based; it will explore single branches until a computational budget is exausted.
                 Defaults to 100. Higher budgets might lead to a significant slowdown.
+            ExplorationConstant (float, optional): the exploration constant of UCB1, applied to rewards rescaled to [0, 1].
+                Defaults to sqrt(2).
+            RolloutBatch (int, optional): the number of rollouts played from each new leaf. Above 1, they are played at once
+                by BatchRollout (NumPy) and counted as that many visits. Defaults to 1.
+            GreedyOpponents (bool, optional): the strategy of the other players in PlayTurn: Greedy, or Intermediate
+                (which avoids leaving a scopa to the cards it has not seen). BatchRollout always plays Greedy opponents.
+                Defaults to True.
+            Decisions (PolicyCache.DecisionCache, optional): if given, the decisions of the other players are looked up in this
+                LRU cache, which can be shared across searches; the moves are the same. Leave it off: in the playouts, hands
+                and tables are small, a decision costs a few microseconds and half the lookups miss, so the search is slower
+                with the cache (see PolicyCache.DecisionCache). Defaults to None.
+            EndgameCards (int, optional): rollouts reaching a position with at most this many cards left in the hands
+                stop there, and take the exact value of the rest of the game with perfect play (see Endgame). 0 disables it.
+                The solver is scoped to Endgame.MAX_CARDS (8) or fewer: beyond that, a solve costs far more than a rollout
+                (up to around 100 ms at 12 with a crowded table). Defaults to 0.
+            Solver (Endgame.EndgameSolver, optional): the endgame solver, whose memo table can be shared across searches.
+                Defaults to a new one, if EndgameCards is set.
+            Determinizations (int, optional): if set, TreeSearch does not look at the other players' hands: it is an
+                information-set search, sharing one tree across deals of the unseen cards drawn in batches of this size
+                (see Determinize and InformationSetIteration). 0 searches with every hand visible. Defaults to 0.
+            Instrument (bool, optional): if set, every TreeSearch measures its phases and counts its work in a new
+                Instrumentation.SearchStats, stored in the Instrumentation attribute and summarized by Stats. Defaults to False.
+            Tracer (Trace.RolloutTracer, optional): if given, every scalar rollout (its moves, reward and stop) is recorded
+                in this memory-mapped ring buffer. Defaults to None.
+            ReuseTree (bool, optional): for an agent kept for a whole game: after its move and the other players' replies,
+                Advance promotes the subtree of the move to the root of the next TreeSearch, with its statistics.
+                Defaults to False.
         """
         
         self.CurrentGameState = CurrentGameState
         self.ComputationalBudget = ComputationalBudget
+        self.ExplorationConstant = ExplorationConstant
+        self.RolloutBatch = RolloutBatch
+        self.GreedyOpponents = GreedyOpponents
+        self.Decisions = Decisions
+        self.EndgameCards = EndgameCards
+        self.Solver = Solver if Solver is not None or not EndgameCards else Endgame.EndgameSolver()
+        self.Determinizations = Determinizations
+        self.Instrument = Instrument
+        self.Instrumentation = None
+        self.Tracer = Tracer
+        self.ReuseTree = ReuseTree
+        # The fast path of Bitboard.BitboardGameState: moves as (played card bit, captured cards mask) pairs.
+        self.MaskMoves = hasattr(CurrentGameState, "GetMaskMoves")
+        self.WorkingState = None
+        self.End = None
+        self.Root = None
+        self.Carried = None
+        self.CarriedVisits = 0
+        self.RewardRange = [float("inf"), float("-inf")]
+        self.Iterations = 0
 
     # def __new__(
     #     cls, *args, **kwargs
@@ -878,52 +1324,141 @@ class AgentCarletto(object):
         elif turn == 1 or turn == 3:
             CurrentGameState.Team = "Deck"
 
-    def SimulateTurn(self) -> ScoponeGameState:
+    def Stats(self) -> dict:
+        """
+        Returns the statistics of the last TreeSearch (see Instrumentation.SearchStats.Stats for the keys),
+        an empty dict if the agent is not instrumented (Instrument) or has not searched yet.
         """
-        This function simulates all the player's turns. It takes as an input a ScoponeGameState,
-        in which the MCTS agent has already made a move.
 
-        Returns:
-            ScoponeGameState: a ScoponeGameState resulting from all the players'moves.
+        if self.Instrumentation is None:
+            return {}
+
+        return self.Instrumentation.Stats()
+
+    @staticmethod
+    def TurnOrder(AgentPosition: int) -> list:
+        """
+        Returns the positions of the other players moving after the agent, in order (clockwise), before the agent moves again:
+        1, 2, 3 for the agent in seat 0, 3, 0, 1 for the agent in seat 2.
         """
 
-        ClonedCurrentGameState = self.CurrentGameState.CloneState()
-        
-        if ClonedCurrentGameState.PlayerPosition == 0:
-            turns = range(ClonedCurrentGameState.PlayerPosition + 1, ClonedCurrentGameState.PlayerPosition + 4)
-        else:
-            turns = range(ClonedCurrentGameState.PlayerPosition % 1, ClonedCurrentGameState.PlayerPosition % 4)
+        return [(AgentPosition + offset) % 4 for offset in range(1, 4)]
+
+    def PlayTurn(
+        self,
+        GameState: ScoponeGameState,
+        UndoLog: list = None,
+        Played: list = None
+        ) -> None:
+        """
+        This function plays all the other players' moves IN PLACE on a GameState
+        in which the MCTS agent has already made a move, then gives the turn back to the agent.
 
-        for turn in turns:
-            ClonedCurrentGameState.PlayerPosition = turn
+        Args:
+            GameState (ScoponeGameState): the GameState to be modified.
+            UndoLog (list, optional): if given, the undo entry of every move is appended to it,
+                so that the caller can backtrack with GameState.UndoMove. Defaults to None.
+            Played (list, optional): if given, every move is appended to it. Defaults to None.
+
+        On a state with mask moves, Greedy players decide and play with them (see Bitboard.GreedyMasks): the moves are
+        the same, without decoding the hands and the table. A DecisionCache keeps the players on the move dicts.
+        """
+
+        Stats = self.Instrumentation
+        if Stats is not None:
+            Start = time.perf_counter()
+
+        AgentPosition = GameState.PlayerPosition
+        AgentTeam = GameState.Team
+        Masks = self.MaskMoves and self.GreedyOpponents and self.Decisions is None
+        if Masks and Played is not None:
+            import Bitboard
+
+        for turn in self.TurnOrder(AgentPosition):
+            GameState.PlayerPosition = turn
             if turn == 0 or turn == 2:
-                ClonedCurrentGameState.Team = "Hand"
+                GameState.Team = "Hand"
             elif turn == 1 or turn == 3:
-                ClonedCurrentGameState.Team = "Deck"
-
-            ClonedCurrentGameState.Hand = ClonedCurrentGameState.PlayersCards[turn]
+                GameState.Team = "Deck"
+
+            if Masks:
+                # A player without cards passes, as on the move dicts.
+                if GameState.IsTerminal():
+                    continue
+                played, pick = GameState.GetGreedyMaskMove()
+                Undo = GameState.DoMaskMove(played, pick)
+                if UndoLog is not None:
+                    UndoLog.append(Undo)
+                if Played is not None:
+                    Played.append(Bitboard.MaskMoveToDict(played, pick))
+                continue
+
+            GameState.Hand = GameState.PlayersCards[turn]
+
+            if self.GreedyOpponents:
+                Unseen = []
+            else:
+                # The cards the player has not seen yet: those in the other players' hands.
+                Unseen = [card for player in range(4) if player != turn for card in GameState.PlayersCards[player]]
             
             try:
-                ClonedCurrentGameState = ClonedCurrentGameState.ApplyMove(
-                    ScoponeMove(
-                        LegalMoves=ClonedCurrentGameState.Hand,
-                        Table=ClonedCurrentGameState.Table,
-                    ).GetMove(
-                        Greedy=True,
-                        Standalone=False
-                    )
+                Move = ScoponeMove(
+                    LegalMoves=GameState.Hand,
+                    Table=GameState.Table,
+                    Deck=Unseen,
+                ).GetMove(
+                    Greedy=self.GreedyOpponents,
+                    Standalone=False,
+                    Cache=self.Decisions
                 )
+                Undo = GameState.DoMove(Move)
+                if UndoLog is not None:
+                    UndoLog.append(Undo)
+                if Played is not None:
+                    Played.append(Move)
             except:
                 pass
 
-        ClonedCurrentGameState.PlayerPosition = self.CurrentGameState.PlayerPosition
-        ClonedCurrentGameState.Team = self.CurrentGameState.Team
-        ClonedCurrentGameState.Hand = ClonedCurrentGameState.PlayersCards[ClonedCurrentGameState.PlayerPosition]
-        ClonedCurrentGameState.Reward = ClonedCurrentGameState.ComputeRewards()
+        GameState.PlayerPosition = AgentPosition
+        GameState.Team = AgentTeam
+        if not Masks:
+            GameState.Hand = GameState.PlayersCards[AgentPosition]
+        GameState.Reward = GameState.ComputeRewards()
 
+        if Stats is not None:
+            Stats.Add("opponents", time.perf_counter() - Start)
+
+    def SimulateTurn(self) -> ScoponeGameState:
+        """
+        This function simulates all the player's turns. It takes as an input a ScoponeGameState,
+        in which the MCTS agent has already made a move.
+
+        Returns:
+            ScoponeGameState: a ScoponeGameState resulting from all the players'moves.
+        """
+
+        ClonedCurrentGameState = self.CurrentGameState.CloneState()
+
+        self.PlayTurn(ClonedCurrentGameState)
 
         return ClonedCurrentGameState
 
+    def GetWorkingState(self) -> ScoponeGameState:
+        """
+        Returns the single mutable copy of the CurrentGameState used by rollouts and tree walks.
+        It is cloned once per agent; every walk backtracks to it with UndoMove.
+        """
+
+        if self.WorkingState is None:
+            Start = time.perf_counter()
+            self.WorkingState = self.CurrentGameState.CloneState()
+            self.TurnChecker(self.WorkingState)
+            if self.Instrumentation is not None:
+                self.Instrumentation.Clones += 1
+                self.Instrumentation.Add("clone", time.perf_counter() - Start)
+
+        return self.WorkingState
+
     def Expand(self):
         """
         Expand your CarlettoAgent consciousness and search the Tree.
@@ -931,14 +1466,15 @@ class AgentCarletto(object):
         This method takes all the possible moves and simulate the consequence of playing them,
         updating the GameState and moving the tree one step further down a given branch.
         It is used as a starter, to evaluate all the possible strategies when the Agent needs to play.
+
+        Each move is played on the working state and backtracked: only the resulting children are copied, with Derive.
         """
 
-        ClonedCurrentGameState = self.CurrentGameState.CloneState()
-        self.TurnChecker(ClonedCurrentGameState)
+        WorkingState = self.GetWorkingState()
 
         #@@@@@@@@@ GENERATING NEW CHILDREN @@@@@@@@@@#
 
-        possible_moves_list = ClonedCurrentGameState.FindChildren()
+        possible_moves_list = list(unpack_moves(WorkingState.GetAvailableMoves()))
 
         resulting_game_states = list()
 
@@ -946,100 +1482,518 @@ class AgentCarletto(object):
 
             ############ SELECTING NEW CHILDREN ############
 
-            try:
-                updated_game_state = AgentCarletto(move).SimulateTurn()
-                updated_game_state.ParentMove = move
-                resulting_game_states.append(updated_game_state)
-            except TypeError:
-                EndGame = "We're in the EndGame now.."
-                print(EndGame)
-                break
+            UndoLog = [WorkingState.DoMove(move)]
+            self.PlayTurn(WorkingState, UndoLog)
+
+            resulting_game_states.append(self.CurrentGameState.Derive(WorkingState, move))
+
+            for Undo in reversed(UndoLog):
+                WorkingState.UndoMove(Undo)
 
         return resulting_game_states
 
+    def FinalReward(
+        self,
+        GameState: ScoponeGameState
+        ) -> int:
+        """
+        Computes the reward of a finished game: the cards left on the table go to the team of the last player
+        that has picked cards (team "Deck" if nobody did). The GameState is left unchanged.
+
+        Args:
+            GameState (ScoponeGameState): a terminal GameState.
+
+        Returns:
+            int: the reward of the game for the GameState's team.
+        """
+
+        TablePoints = 0
+
+        if isinstance(GameState.LastTaker, NAType):
+            TakeAllTeam = "Deck"
+        elif GameState.LastTaker == 0 or GameState.LastTaker == 2:
+            TakeAllTeam = "Hand"
+        elif GameState.LastTaker == 1 or GameState.LastTaker == 3:
+            TakeAllTeam = "Deck"
+        
+        for leftover in GameState.Table:
+            TablePoints += convert_to_card(leftover).Value()
+        
+        GameState.TeamScores[TakeAllTeam] += TablePoints
+        TotalReward = GameState.ComputeRewards()
+        GameState.TeamScores[TakeAllTeam] -= TablePoints
+
+        return TotalReward
+
+    def Rollout(
+        self,
+        GameState: ScoponeGameState,
+        UndoLog: list,
+        Path: list = None
+        ) -> float:
+        """
+        Plays random moves for the agent (and Greedy or Intermediate moves for the other players) IN PLACE until the end of the game.
+
+        On a state with mask moves, the agent's random moves are drawn and played with them (GetMaskMoves and DoMaskMove),
+        in the same order as the move dicts: with the same seed, the rollout is the same.
+        With EndgameCards, the rollout stops when few cards are left, and the rest of the game is solved exactly.
+        With a Tracer, the rollout is recorded.
+
+        During a TreeSearch with a Deadline, the rollout is abandoned when the deadline passes (checked before every move):
+        nothing is recorded and None is returned.
+
+        Args:
+            GameState (ScoponeGameState): the working state, modified in place.
+            UndoLog (list): the undo entries of the moves are appended to it, for the caller to backtrack.
+            Path (list, optional): if given, the agent's moves are appended to it. Defaults to None.
+
+        Returns:
+            float: the reward of the finished game (with perfect play from an endgame cutover), None if abandoned.
+        """
+
+        TotalReward = None
+        End = self.End
+        Masks = self.MaskMoves
+        if Masks and (self.Tracer is not None or Path is not None):
+            import Bitboard
+
+        if self.Tracer is not None:
+            Played = list()
+            Player = GameState.PlayerPosition
+            Cards = sum(len(cards) for cards in GameState.PlayersCards.values())
+            Stop = ROLLOUT_FINISHED
+        else:
+            Played = None
+
+        while not GameState.IsTerminal():
+            if End is not None and time.perf_counter() >= End:
+                return None
+
+            if self.EndgameCards and sum(len(cards) for cards in GameState.PlayersCards.values()) <= self.EndgameCards:
+                Stop = ROLLOUT_ENDGAME
+                if self.Instrumentation is not None:
+                    Start = time.perf_counter()
+                    TotalReward = self.Solver.Solve(GameState)[0]
+                    self.Instrumentation.Solves += 1
+                    self.Instrumentation.Add("endgame", time.perf_counter() - Start)
+                else:
+                    TotalReward = self.Solver.Solve(GameState)[0]
+                break
+
+            if Masks:
+                played, pick = random.choice(GameState.GetMaskMoves())
+                UndoLog.append(GameState.DoMaskMove(played, pick))
+                move = None if Played is None and Path is None else Bitboard.MaskMoveToDict(played, pick)
+            else:
+                move = random.choice(list(unpack_moves(GameState.GetAvailableMoves())))
+                UndoLog.append(GameState.DoMove(move))
+            if Played is not None:
+                Played.append(move)
+            self.PlayTurn(GameState, UndoLog, Played)
+            if Path is not None:
+                Path.append(move)
+
+        if TotalReward is None:
+            TotalReward = self.FinalReward(GameState)
+
+        if Played is not None:
+            self.Tracer.Record(Played, TotalReward, Player, Cards, Stop)
+
+        return TotalReward
+
     def Simulate(self) -> tuple:
         """
         This methods performs the rollout (simulate a game until the end) 
         and backpropagation (computes the final scores, their rewards and maps them to the origin of the branch, 
         and the path).
+
+        The rollout is played in place on the working state and backtracked at the end with the undo log:
+        the only copy made (with Derive) is the GameState reached after the first turn, returned as the origin of the branch.
         
         Returns:
             tuple: 
                 - a dict with the simulated game state that started the branch and the reward of the finished game.
-                - a list with all the nodes in the sequence, representing the complete branch.
+                - a list with all the moves in the sequence, representing the complete branch.
         """
         
         Simulation = dict()
         TotalReward = 0
         Path = list()
-        TablePoints = 0
-        
-        ExpandedGameState = self.CurrentGameState.CloneState()
-        counter = 0
+        UndoLog = list()
         
-        while not ExpandedGameState.IsTerminal():
-            ExpandedGameState = ExpandedGameState.FindRandomChildren()
-            ExpandedGameState = AgentCarletto(ExpandedGameState).SimulateTurn()
-            if counter == 0:
-                Simulation = ExpandedGameState
-                Path.append(ExpandedGameState)
-            else:
-                TotalReward = ExpandedGameState.Reward
-                Path.append(ExpandedGameState)
-            counter += 1
-        
-        ### This code block is used to compute the reward in the last turn.
+        ExpandedGameState = self.GetWorkingState()
         
-        if ExpandedGameState.IsTerminal():
-            if isinstance(ExpandedGameState.LastTaker, NAType):
-                TakeAllTeam = "Deck"
-            elif ExpandedGameState.LastTaker == 0 or ExpandedGameState.LastTaker == 2:
-                TakeAllTeam = "Hand"
-            elif ExpandedGameState.LastTaker == 1 or ExpandedGameState.LastTaker == 3:
-                TakeAllTeam = "Deck"
-            
-            for leftover in ExpandedGameState.Table:
-                TablePoints += convert_to_card(leftover).Value()
-            
-            ExpandedGameState.TeamScores[TakeAllTeam] += TablePoints
-            ExpandedGameState.Reward = ExpandedGameState.ComputeRewards()
-                
+        if not ExpandedGameState.IsTerminal():
+            move = random.choice(list(unpack_moves(ExpandedGameState.GetAvailableMoves())))
+            UndoLog.append(ExpandedGameState.DoMove(move))
+            self.PlayTurn(ExpandedGameState, UndoLog)
+            Simulation = self.CurrentGameState.Derive(ExpandedGameState, move)
+            Path.append(move)
+
+            TotalReward = self.Rollout(ExpandedGameState, UndoLog, Path)
+
+        ### Backtrack to the starting GameState.
+
+        for Undo in reversed(UndoLog):
+            ExpandedGameState.UndoMove(Undo)
             
         return {Simulation:TotalReward}, Path
+
+    def SearchIteration(
+        self,
+        Root: MCTSNode
+        ) -> float:
+        """
+        Performs one iteration of UCT from the Root node, on the working state:
+
+        - selection: descend the tree with UCB1 while the nodes are fully expanded;
+        - expansion: add one child for an untried move;
+        - rollout: play the game until the end from the new node (RolloutBatch times, see BatchRollout);
+        - backpropagation: add the reward to every node on the path back to the Root.
+
+        The working state is backtracked at the end.
+
+        Args:
+            Root (MCTSNode): the root of the search tree.
+
+        Returns:
+            float: the (mean) reward of the rollouts.
+        """
+
+        GameState = self.GetWorkingState()
+        UndoLog = list()
+        Node = Root
+
+        Stats = self.Instrumentation
+        if Stats is not None:
+            Start = time.perf_counter()
+
+        while not Node.UntriedMoves and Node.Children:
+            Node = Node.SelectChild(self.ExplorationConstant, self.RewardRange)
+            UndoLog.append(GameState.DoMove(Node.Move))
+            self.PlayTurn(GameState, UndoLog)
+
+        if Stats is not None:
+            Selected = time.perf_counter()
+            Stats.Add("selection", Selected - Start)
+
+        if Node.UntriedMoves:
+            move = Node.UntriedMoves.pop(random.randrange(len(Node.UntriedMoves)))
+            UndoLog.append(GameState.DoMove(move))
+            self.PlayTurn(GameState, UndoLog)
+            Node = Node.AddChild(move, self.LegalMoves(GameState))
+            if Stats is not None:
+                Stats.AddNode(len(Node.UntriedMoves))
+
+        if Stats is not None:
+            Stats.Add("expansion", time.perf_counter() - Selected)
+
+        Reward = self.Evaluate(Node, GameState, UndoLog)
+
+        if Stats is not None:
+            Stats.Moves += len(UndoLog)
+
+        for Undo in reversed(UndoLog):
+            GameState.UndoMove(Undo)
+
+        return Reward
+
+    def Evaluate(
+        self,
+        Node: MCTSNode,
+        GameState: ScoponeGameState,
+        UndoLog: list
+        ) -> float:
+        """
+        Plays the rollouts from a new node (RolloutBatch of them, see BatchRollout) and backpropagates their reward.
+        The moves of the scalar rollout are appended to UndoLog.
+
+        Returns:
+            float: the (mean) reward of the rollouts, None if the rollout was abandoned at the deadline (nothing is backpropagated).
+        """
+
+        Stats = self.Instrumentation
+        if Stats is not None:
+            Start = time.perf_counter()
+
+        if self.RolloutBatch > 1:
+            import BatchRollout
+
+            Rewards = BatchRollout.Rollouts(GameState, self.RolloutBatch)
+            Reward = float(Rewards.mean())
+            Total, Count = float(Rewards.sum()), self.RolloutBatch
+            self.RewardRange[0] = min(self.RewardRange[0], float(Rewards.min()))
+            self.RewardRange[1] = max(self.RewardRange[1], float(Rewards.max()))
+        else:
+            Reward = self.Rollout(GameState, UndoLog)
+            if Reward is None:
+                return None
+            Total, Count = Reward, 1
+            self.RewardRange[0] = min(self.RewardRange[0], Reward)
+            self.RewardRange[1] = max(self.RewardRange[1], Reward)
+
+        if Stats is not None:
+            Played = time.perf_counter()
+            Stats.Add("rollout", Played - Start)
+            Stats.Rollouts += Count
+
+        Node.Backpropagate(Total, Count)
+
+        if Stats is not None:
+            Stats.Add("backpropagation", time.perf_counter() - Played)
+
+        return Reward
+
+    def InformationSetIteration(
+        self,
+        Root: MCTSNode,
+        Deal: dict
+        ) -> float:
+        """
+        Performs one iteration of single-observer information-set MCTS: the other players' hands of the working state
+        are replaced by a deal of the unseen cards (a determinization), and the iteration is restricted to the moves
+        that are legal in it. The tree is shared by all the determinizations: a node stands for the agent's moves
+        from the root, whatever the hidden cards.
+
+        - selection: descend with UCB1 among the children legal in the determinization, while all its legal moves are expanded,
+          counting one Availability for each of those children;
+        - expansion: add one child for a legal move not in the tree yet;
+        - rollout and backpropagation, as in SearchIteration.
+
+        The working state is backtracked, and its hands restored, at the end.
+
+        Args:
+            Root (MCTSNode): the root of the search tree.
+            Deal (dict): the hands of the other players, {player: list of cards} (see Determinize.DeterminizationSampler.Deals).
+
+        Returns:
+            float: the (mean) reward of the rollouts.
+        """
+
+        GameState = self.GetWorkingState()
+        Dealt = GameState.Redeal(Deal)
+
+        UndoLog = list()
+        Node = Root
+
+        Stats = self.Instrumentation
+        if Stats is not None:
+            Start = time.perf_counter()
+
+        while True:
+            Legal = {move_key(move): move for move in self.LegalMoves(GameState)}
+            if not Legal:
+                break
+
+            Tried = {move_key(child.Move): child for child in Node.Children}
+            Compatible = [child for key, child in Tried.items() if key in Legal]
+            Untried = [move for key, move in Legal.items() if key not in Tried]
+
+            if Untried:
+                if Stats is not None:
+                    Selected = time.perf_counter()
+                    Stats.Add("selection", Selected - Start)
+                    Start = Selected
+                move = random.choice(Untried)
+                UndoLog.append(GameState.DoMove(move))
+                self.PlayTurn(GameState, UndoLog)
+                Node = Node.AddChild(move, list())
+                Node.Availability = 1
+                if Stats is not None:
+                    # The legal moves of the new node depend on the determinization: count those of this one.
+                    Stats.AddNode(len(self.LegalMoves(GameState)))
+                    Stats.Add("expansion", time.perf_counter() - Start)
+                    Start = None
+                break
+
+            for child in Compatible:
+                child.Availability += 1
+            Node = max(Compatible, key=lambda child: child.UCB1(self.ExplorationConstant, self.RewardRange))
+            UndoLog.append(GameState.DoMove(Node.Move))
+            self.PlayTurn(GameState, UndoLog)
+
+        if Stats is not None and Start is not None:
+            Stats.Add("selection", time.perf_counter() - Start)
+
+        Reward = self.Evaluate(Node, GameState, UndoLog)
+
+        if Stats is not None:
+            Stats.Moves += len(UndoLog)
+
+        for Undo in reversed(UndoLog):
+            GameState.UndoMove(Undo)
+
+        GameState.Restore(Dealt)
+
+        return Reward
+
+    def Advance(
+        self,
+        GameState: ScoponeGameState,
+        Move: dict
+        ) -> int:
+        """
+        Moves the agent on to its next decision, in GameState: the position reached after its Move and the other players' replies.
+
+        With ReuseTree, the child of the root for the Move becomes the root of the next TreeSearch, keeping its statistics,
+        if it stands for the same position. A child stands for the move followed by the replies of the opponents' policy
+        (see PlayTurn): it is kept if the Move played and those replies on the working state reach the GameState
+        (same hash). In an information-set search, nodes only stand for the agent's moves, whatever the other players'
+        replies: the child is always kept. Otherwise the next search starts from scratch.
+
+        Args:
+            GameState (ScoponeGameState): the position of the agent's next decision.
+            Move (dict): the move the agent played last.
+
+        Returns:
+            int: the visits carried over to the next search (0 if none).
+        """
+
+        Subtree = None
+
+        if self.ReuseTree and self.Root is not None:
+            Key = move_key(Move)
+            Subtree = next((child for child in self.Root.Children if move_key(child.Move) == Key), None)
+
+        if Subtree is not None and not self.Determinizations:
+            WorkingState = self.GetWorkingState()
+            UndoLog = [WorkingState.DoMove(Move)]
+            self.PlayTurn(WorkingState, UndoLog)
+            if hash(WorkingState) != hash(GameState) or WorkingState.Table != GameState.Table:
+                Subtree = None
+            for Undo in reversed(UndoLog):
+                WorkingState.UndoMove(Undo)
+
+        if Subtree is not None:
+            Subtree.Parent = None
+
+        self.CurrentGameState = GameState
+        self.WorkingState = None
+        self.End = None
+        self.Root = None
+        self.Carried = Subtree
+
+        return Subtree.Visits if Subtree is not None else 0
+
+    def LegalMoves(
+        self,
+        GameState: ScoponeGameState
+        ) -> list:
+        """
+        Returns the list of the moves available to the agent in a GameState (none if it is terminal).
+        """
+
+        if GameState.IsTerminal():
+            return list()
+
+        return list(unpack_moves(GameState.GetAvailableMoves()))
     
-    def TreeSearch(self) -> dict:
+    def TreeSearch(
+        self,
+        Deadline: float = None
+        ) -> dict:
         """
         This method performs the Monte Carlo Tree Search for our Agent and outputs the 
         resulting best move.
+
+        It runs ComputationalBudget iterations of UCT (see SearchIteration) and returns the most visited move at the root.
+        With Determinizations, the iterations are those of information-set MCTS (see InformationSetIteration), each one on
+        the next deal of a batch drawn by Determinize.DeterminizationSampler.
+
+        With ReuseTree, the search starts from the subtree promoted by Advance, if any; the visits it carries are stored in
+        the CarriedVisits attribute.
+
+        With Instrument, the time of each phase and the work done are stored in the Instrumentation attribute
+        (see Instrumentation.SearchStats), and returned by Stats.
+
+        With a Deadline, the search is anytime: ComputationalBudget is ignored and iterations run until the deadline,
+        stopping early when the next iteration could overrun it (it is assumed to last up to 1.5 times the longest one so far).
+        An iteration still running at the deadline is abandoned during its rollout, without backpropagating; only an exact
+        endgame solve (EndgameCards) is not interrupted. The cyclic garbage collector is paused during the search, since
+        one of its full collections can take longer than a short deadline: it runs again after the decision.
+        The number of iterations completed is stored in the Iterations attribute.
+
+        Args:
+            Deadline (float, optional): the time available for the decision, in milliseconds. Defaults to None.
         
         Returns:
-            dict: a game move {card to be played: card/s to be taken}.
+            dict: a game move {card to be played: card/s to be taken}, None if the game is over (the agent has no card left).
         """
-        
-        maxBudget = self.ComputationalBudget
-        
-        Parents = self.Expand()
-        BestMove = {key: 0 for key in Parents}
-        
-        Simulation, Path = self.Simulate()
-        
-        while maxBudget > 0:
-            NeoSimulation, NeoPath = self.Simulate()
-            for State in Simulation.keys():
-                for NeoState in NeoSimulation.keys():
-                    # No need to explore already seen branches.
-                    if Path != NeoPath:
-                        if State == NeoState:
-                            BestMove[State] = max(Simulation[State], NeoSimulation[NeoState])
-                        elif State != NeoState:
-                            if Simulation[State] < NeoSimulation[NeoState]:
-                                BestMove[NeoState] = NeoSimulation[NeoState]
-                        
-            maxBudget -= 1
-        
-        # points = BestMove[max(BestMove, key=BestMove.get)]
-        BestMove = max(BestMove, key=BestMove.get)
-        BestMove = BestMove.ParentMove
-            
-            
-        return BestMove.ParentMove      
\ No newline at end of file
+
+        Start = time.perf_counter()
+
+        self.Instrumentation = Instrumentation.SearchStats() if self.Instrument else None
+        self.Iterations = 0
+
+        # The moves of the position itself: a carried root of an information-set search has no UntriedMoves of its own.
+        LegalMoves = self.LegalMoves(self.GetWorkingState())
+
+        if self.Carried is not None:
+            # The subtree promoted by Advance: its statistics (and the reward range they were rescaled with) are kept.
+            self.Root, self.Carried = self.Carried, None
+            self.CarriedVisits = self.Root.Visits
+        else:
+            self.RewardRange = [float("inf"), float("-inf")]
+            self.Root = MCTSNode(UntriedMoves=LegalMoves)
+            self.CarriedVisits = 0
+            if self.Instrumentation is not None:
+                self.Instrumentation.AddNode(len(self.Root.UntriedMoves))
+
+        if self.Instrumentation is not None:
+            self.Instrumentation.Carried = self.CarriedVisits
+
+        if not LegalMoves:
+            # A terminal position: there is no move to search.
+            return None
+
+        if self.Determinizations:
+            import Determinize
+
+            Sampler = Determinize.DeterminizationSampler(self.GetWorkingState())
+            Deals = list()
+
+            def Iterate(Root):
+                if not Deals:
+                    Deals.extend(Sampler.Deals(self.Determinizations))
+                return self.InformationSetIteration(Root, Deals.pop())
+        else:
+            Iterate = self.SearchIteration
+
+        # A full collection can take longer than a short deadline: the collector is paused until the move is chosen.
+        Collecting = Deadline is not None and gc.isenabled()
+        if Collecting:
+            gc.disable()
+
+        try:
+            if Deadline is None:
+                for _ in range(self.ComputationalBudget):
+                    Iterate(self.Root)
+                self.Iterations = self.ComputationalBudget
+            else:
+                # Keep 3% of the deadline for the final choice and for timing jitter.
+                End = self.End = Start + 0.97 * Deadline / 1000
+                Now = time.perf_counter()
+                Longest = 0.0
+                while Now + 1.5 * Longest < End:
+                    if Iterate(self.Root) is None:
+                        break
+                    self.Iterations += 1
+                    Last, Now = Now, time.perf_counter()
+                    Longest = max(Longest, Now - Last)
+
+            if self.Tracer is not None:
+                self.Tracer.Flush()
+
+            if self.Instrumentation is not None:
+                self.Instrumentation.Iterations = self.Iterations
+                self.Instrumentation.Elapsed = time.perf_counter() - Start
+
+            if not self.Root.Children:
+                # Not even one iteration fitted in the deadline.
+                return LegalMoves[0]
+
+            return self.Root.BestChild().Move
+        finally:
+            self.End = None
+            if Collecting:
+                gc.enable()
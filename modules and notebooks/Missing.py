@@ -0,0 +1,34 @@
+## `NA`
+
+class NAType(object):
+    """
+    The type of NA, the missing value of the agent modules (an empty Card's rank and suit, the LastTaker of a game
+    where nobody has taken yet, the ParentMove of a root state): a singleton, tested with isinstance(value, NAType).
+
+    It stands in for pandas.NA, whose import alone costs more than the whole agent. As pandas.NA, it has no truth value.
+    It is kept as a singleton by copies and pickles, so that states can be sent to worker processes.
+    """
+
+    __slots__ = ()
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __repr__(self) -> str:
+        return "<NA>"
+
+    def __bool__(self):
+        raise TypeError("boolean value of NA is ambiguous")
+
+    def __hash__(self) -> int:
+        return 0x4E41
+
+    def __reduce__(self) -> str:
+        return "NA"
+
+
+NA = NAType()
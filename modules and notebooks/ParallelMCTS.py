@@ -0,0 +1,458 @@
+import concurrent.futures
+import copy
+import math
+import os
+import random
+import sys
+import threading
+import time
+
+import Instrumentation
+import PolicyCache
+from MCTS import AgentCarletto, MCTSNode, ScoponeGameState, move_key, unpack_moves
+
+
+## Worker
+
+def _RootSearch(
+    GameState: ScoponeGameState,
+    ComputationalBudget: int,
+    Deadline: float,
+    ExplorationConstant: float,
+    Seed: int
+    ) -> tuple:
+    """
+    Runs an independent UCT search in a worker process, and returns the statistics of the root's children.
+
+    Returns:
+        tuple: a list of (move, visits, total reward) for each child of the root, and the number of iterations performed.
+    """
+
+    random.seed(Seed)
+
+    agent = AgentCarletto(GameState, ComputationalBudget, ExplorationConstant=ExplorationConstant)
+    agent.TreeSearch(Deadline=Deadline)
+
+    return [(child.Move, child.Visits, child.TotalReward) for child in agent.Root.Children], agent.Iterations
+
+
+## `RootParallelCarletto`
+
+class RootParallelCarletto(object):
+    """
+    Root-parallel Monte Carlo Tree Search.
+
+    Each of the Workers processes searches the same ScoponeGameState independently, with its own random seed;
+    the visits and rewards of the root's children are then summed over the workers, and the most visited move is played.
+
+    The process pool is created once and kept across decisions, so that the spawn cost is not paid at every move:
+    close it with Close(), or use the object as a context manager.
+    """
+
+    def __init__(
+        self,
+        Workers: int = os.cpu_count(),
+        ComputationalBudget: int = 500,
+        ExplorationConstant: float = math.sqrt(2),
+        Seed: int = None
+        ) -> None:
+        """
+        Args:
+            Workers (int, optional): the number of worker processes. Defaults to the number of CPUs.
+            ComputationalBudget (int, optional): the number of iterations of each worker. Defaults to 500.
+            ExplorationConstant (float, optional): the UCB1 exploration constant. Defaults to sqrt(2).
+            Seed (int, optional): the seed from which the workers' seeds are drawn. Defaults to None.
+        """
+
+        self.Workers = Workers
+        self.ComputationalBudget = ComputationalBudget
+        self.ExplorationConstant = ExplorationConstant
+        self.Random = random.Random(Seed)
+        self.Pool = concurrent.futures.ProcessPoolExecutor(max_workers=Workers)
+        self.Iterations = 0
+
+    def __enter__(self) -> "RootParallelCarletto":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.Close()
+
+    def Close(self) -> None:
+        """
+        Shuts the process pool down.
+        """
+        self.Pool.shutdown()
+
+    def TreeSearch(
+        self,
+        CurrentGameState: ScoponeGameState,
+        Deadline: float = None
+        ) -> dict:
+        """
+        Searches CurrentGameState on every worker and merges their root statistics into a single decision.
+
+        Args:
+            CurrentGameState (ScoponeGameState): the GameState in which the agent has to play.
+            Deadline (float, optional): the time available to each worker, in milliseconds. Defaults to None.
+
+        Returns:
+            dict: a game move {card to be played: card/s to be taken}, None if the game is over.
+        """
+
+        Futures = [
+            self.Pool.submit(
+                _RootSearch,
+                CurrentGameState,
+                self.ComputationalBudget,
+                Deadline,
+                self.ExplorationConstant,
+                self.Random.getrandbits(32)
+            )
+            for _ in range(self.Workers)
+        ]
+
+        Moves, Visits, Rewards = {}, {}, {}
+        self.Iterations = 0
+
+        for Future in Futures:
+            Children, Iterations = Future.result()
+            self.Iterations += Iterations
+            for Move, ChildVisits, TotalReward in Children:
+                key = move_key(Move)
+                Moves[key] = Move
+                Visits[key] = Visits.get(key, 0) + ChildVisits
+                Rewards[key] = Rewards.get(key, 0) + TotalReward
+
+        self.RootStatistics = {key: (Visits[key], Rewards[key] / Visits[key]) for key in Moves}
+
+        if not Moves:
+            # Not even one iteration fitted in the deadline (or the game is over).
+            return next(unpack_moves(CurrentGameState.GetAvailableMoves()), None)
+
+        Best = max(Moves, key=lambda key: self.RootStatistics[key])
+
+        return Moves[Best]
+
+
+## Shared caches
+
+class StripedDecisionCache(PolicyCache.DecisionCache):
+    """
+    A DecisionCache that search threads can share: the positions are split over Stripes LRU caches by the hash of
+    their key, each behind its own lock, and each holding Size / Stripes positions.
+    """
+
+    def __init__(
+        self,
+        Size: int = 1 << 16,
+        Stripes: int = 64
+        ) -> None:
+        """
+        Args:
+            Size (int, optional): the maximum number of cached positions, over all stripes. Defaults to 65536.
+            Stripes (int, optional): the number of caches and locks. Defaults to 64.
+        """
+
+        super().__init__(Size)
+        self.Caches = [PolicyCache.DecisionCache(max(1, Size // Stripes)) for _ in range(Stripes)]
+        self.Locks = [threading.Lock() for _ in range(Stripes)]
+
+    def __len__(self) -> int:
+        return sum(len(cache) for cache in self.Caches)
+
+    def Options(
+        self,
+        key: tuple,
+        compute,
+        *args
+        ) -> tuple:
+        """
+        Returns the cached options of a position (see DecisionCache.Options), from the cache of its stripe.
+        """
+
+        stripe = hash(key) % len(self.Caches)
+        with self.Locks[stripe]:
+            return self.Caches[stripe].Options(key, compute, *args)
+
+    def Stats(self) -> dict:
+        """
+        Returns the cache counters, summed over the stripes.
+        """
+
+        Stats = dict()
+        for stripe, cache in enumerate(self.Caches):
+            with self.Locks[stripe]:
+                for name, value in cache.Stats().items():
+                    Stats[name] = Stats.get(name, 0) + value
+
+        return Stats
+
+
+## `TreeParallelCarletto`
+
+def GILEnabled() -> bool:
+    """
+    Whether the interpreter runs with the GIL (always True before free-threaded builds existed).
+    """
+    return getattr(sys, "_is_gil_enabled", lambda: True)()
+
+
+class TreeParallelCarletto(AgentCarletto):
+    """
+    Tree-parallel Monte Carlo Tree Search.
+
+    Several threads share one UCT tree. Each thread plays on its own working state, and:
+
+    - applies a virtual loss (one visit with the lowest reward seen so far) to every node it selects,
+      so that the other threads are pushed towards different branches;
+    - removes the virtual loss and adds the real reward when it backpropagates.
+
+    Node statistics and expansions are protected by a small array of striped locks (a node's lock depends on its id),
+    so threads only contend when they update the same nodes. The decision cache shared by the threads is striped
+    the same way (see StripedDecisionCache); with Instrument, each thread counts its work in its own SearchStats,
+    merged into the Instrumentation attribute at the end (the times of the phases are summed over the threads).
+
+    This mode is for free-threaded builds of Python only. With the GIL, threads cannot run the search in parallel: they
+    complete no more iterations per second than the sequential search (see Benchmarks.BenchmarkTreeParallel), and the
+    virtual losses only change which branches the same budget explores. Unless Force is set, the search then falls back
+    to the sequential AgentCarletto.TreeSearch; Force is only meant to measure that cost.
+    """
+
+    def __init__(
+        self,
+        CurrentGameState: ScoponeGameState,
+        ComputationalBudget: int = 500,
+        Threads: int = os.cpu_count(),
+        Force: bool = False,
+        ExplorationConstant: float = math.sqrt(2),
+        Stripes: int = 64,
+        Decisions: StripedDecisionCache = None,
+        Instrument: bool = False,
+        ReuseTree: bool = False
+        ) -> None:
+        """
+        Args:
+            CurrentGameState (ScoponeGameState): the GameState in which the agent has to play.
+            ComputationalBudget (int, optional): the total number of iterations, over all threads. Defaults to 500.
+            Threads (int, optional): the number of search threads. Defaults to the number of CPUs.
+            Force (bool, optional): run the threads even with the GIL, for measurements only. Defaults to False.
+            ExplorationConstant (float, optional): the UCB1 exploration constant. Defaults to sqrt(2).
+            Stripes (int, optional): the number of locks shared by the tree nodes. Defaults to 64.
+            Decisions (StripedDecisionCache, optional): the decisions of the other players, shared by all threads.
+                A plain DecisionCache is only accepted by a single thread. Defaults to None.
+            Instrument (bool, optional): see AgentCarletto. Defaults to False.
+            ReuseTree (bool, optional): see AgentCarletto. Defaults to False.
+        """
+
+        super().__init__(
+            CurrentGameState,
+            ComputationalBudget,
+            ExplorationConstant=ExplorationConstant,
+            Decisions=Decisions,
+            Instrument=Instrument,
+            ReuseTree=ReuseTree
+        )
+
+        self.Threads = Threads if Force or not GILEnabled() else 1
+        if self.Threads > 1 and Decisions is not None and not isinstance(Decisions, StripedDecisionCache):
+            raise TypeError("a decision cache shared by search threads must be a StripedDecisionCache")
+        self.Locks = [threading.Lock() for _ in range(Stripes)]
+        self.CounterLock = threading.Lock()
+
+    def NodeLock(
+        self,
+        Node: MCTSNode
+        ) -> threading.Lock:
+        return self.Locks[(id(Node) >> 4) % len(self.Locks)]
+
+    def AddVirtualLoss(
+        self,
+        Node: MCTSNode
+        ) -> float:
+        """
+        Counts a pending visit on a node, with the lowest reward seen so far. Returns the reward applied.
+        """
+
+        Loss = self.RewardRange[0] if self.RewardRange[0] != float("inf") else 0.0
+        with self.NodeLock(Node):
+            Node.Visits += 1
+            Node.TotalReward += Loss
+
+        return Loss
+
+    def ParallelIteration(
+        self,
+        GameState: ScoponeGameState
+        ) -> float:
+        """
+        Performs one UCT iteration on the shared tree, using the thread's own working state.
+
+        Returns:
+            float: the reward of the rollout, None if it was abandoned at the deadline (the virtual losses are removed).
+        """
+
+        UndoLog = list()
+        Node = self.Root
+        Path = [(Node, self.AddVirtualLoss(Node))]
+
+        while True:
+            with self.NodeLock(Node):
+                if Node.UntriedMoves:
+                    move = Node.UntriedMoves.pop(random.randrange(len(Node.UntriedMoves)))
+                    Child = None
+                elif Node.Children:
+                    Child = Node.SelectChild(self.ExplorationConstant, self.RewardRange)
+                else:
+                    break
+
+            if Child is None:
+                UndoLog.append(GameState.DoMove(move))
+                self.PlayTurn(GameState, UndoLog)
+                Child = MCTSNode(Move=move, Parent=Node, UntriedMoves=self.LegalMoves(GameState))
+                if self.Instrumentation is not None:
+                    self.Instrumentation.AddNode(len(Child.UntriedMoves))
+                Path.append((Child, self.AddVirtualLoss(Child)))
+                with self.NodeLock(Node):
+                    Node.Children.append(Child)
+                Node = Child
+                break
+
+            UndoLog.append(GameState.DoMove(Child.Move))
+            self.PlayTurn(GameState, UndoLog)
+            Path.append((Child, self.AddVirtualLoss(Child)))
+            Node = Child
+
+        Reward = self.Rollout(GameState, UndoLog)
+
+        if Reward is None:
+            for PathNode, Loss in Path:
+                with self.NodeLock(PathNode):
+                    PathNode.Visits -= 1
+                    PathNode.TotalReward -= Loss
+            for Undo in reversed(UndoLog):
+                GameState.UndoMove(Undo)
+            return None
+
+        if self.Instrumentation is not None:
+            self.Instrumentation.Rollouts += 1
+            self.Instrumentation.Moves += len(UndoLog)
+
+        with self.CounterLock:
+            self.RewardRange[0] = min(self.RewardRange[0], Reward)
+            self.RewardRange[1] = max(self.RewardRange[1], Reward)
+
+        # The visit has already been counted by the virtual loss: only the reward is corrected.
+        for PathNode, Loss in Path:
+            with self.NodeLock(PathNode):
+                PathNode.TotalReward += Reward - Loss
+
+        for Undo in reversed(UndoLog):
+            GameState.UndoMove(Undo)
+
+        return Reward
+
+    def SearchThread(
+        self,
+        End: float,
+        Stats: Instrumentation.SearchStats = None
+        ) -> None:
+        """
+        The body of a search thread: runs iterations until the budget is exhausted or (if End is given) until the deadline.
+
+        The iterations run on a shallow copy of the agent, sharing the tree, the locks and the striped tables,
+        with Stats (the thread's own SearchStats, or None) as its Instrumentation.
+        """
+
+        Worker = copy.copy(self)
+        Worker.Instrumentation = Stats
+
+        GameState = self.CurrentGameState.CloneState()
+        self.TurnChecker(GameState)
+        Longest = 0.0
+        Now = time.perf_counter()
+
+        while True:
+            if End is None:
+                with self.CounterLock:
+                    if self.Iterations >= self.ComputationalBudget:
+                        return
+                    self.Iterations += 1
+            elif Now + 1.5 * Longest >= End:
+                return
+
+            if Worker.ParallelIteration(GameState) is None:
+                return
+
+            Last, Now = Now, time.perf_counter()
+            Longest = max(Longest, Now - Last)
+            if End is not None:
+                with self.CounterLock:
+                    self.Iterations += 1
+
+    def TreeSearch(
+        self,
+        Deadline: float = None
+        ) -> dict:
+        """
+        Runs the tree-parallel search and returns the most visited move at the root.
+        Falls back to AgentCarletto.TreeSearch with a single thread.
+
+        As in AgentCarletto.TreeSearch, with ReuseTree the threads start from the subtree promoted by Advance, and a
+        rollout still running at the deadline is abandoned.
+
+        Args:
+            Deadline (float, optional): the time available for the decision, in milliseconds. Defaults to None.
+
+        Returns:
+            dict: a game move {card to be played: card/s to be taken}, None if the game is over.
+        """
+
+        if self.Threads <= 1:
+            return super().TreeSearch(Deadline)
+
+        Start = time.perf_counter()
+        End = None if Deadline is None else Start + 0.97 * Deadline / 1000
+
+        self.Instrumentation = Instrumentation.SearchStats() if self.Instrument else None
+        self.Iterations = 0
+        LegalMoves = self.LegalMoves(self.GetWorkingState())
+
+        if self.Carried is not None:
+            # The subtree promoted by Advance, as in AgentCarletto.TreeSearch.
+            self.Root, self.Carried = self.Carried, None
+            self.CarriedVisits = self.Root.Visits
+        else:
+            self.RewardRange = [float("inf"), float("-inf")]
+            self.Root = MCTSNode(UntriedMoves=LegalMoves)
+            self.CarriedVisits = 0
+            if self.Instrumentation is not None:
+                self.Instrumentation.AddNode(len(self.Root.UntriedMoves))
+
+        if self.Instrumentation is not None:
+            self.Instrumentation.Carried = self.CarriedVisits
+
+        if not LegalMoves:
+            return None
+
+        # The threads' rollouts are abandoned at the deadline (see AgentCarletto.Rollout).
+        self.End = End
+        try:
+            Stats = [Instrumentation.SearchStats() if self.Instrument else None for _ in range(self.Threads)]
+            Threads = [threading.Thread(target=self.SearchThread, args=(End, Stats[index])) for index in range(self.Threads)]
+            for Thread in Threads:
+                Thread.start()
+            for Thread in Threads:
+                Thread.join()
+        finally:
+            self.End = None
+
+        if self.Instrumentation is not None:
+            for ThreadStats in Stats:
+                self.Instrumentation.Merge(ThreadStats)
+            self.Instrumentation.Iterations = self.Iterations
+            self.Instrumentation.Elapsed = time.perf_counter() - Start
+
+        if not self.Root.Children:
+            return LegalMoves[0]
+
+        return self.Root.BestChild().Move
@@ -0,0 +1,303 @@
+import argparse
+import concurrent.futures
+import math
+import os
+import random
+import time
+
+from MCTS import AgentCarletto, ScoponeGameState, ScoponeMove, convert_to_card
+
+from Missing import NAType
+
+
+## Agents
+
+# An agent is a (name, budget) pair: the budget is the number of iterations of the MCTS agents.
+AGENTS = ("greedy", "intermediate", "mcts", "ismcts")
+
+# The deals drawn at once by the information-set agent.
+ISMCTS_DETERMINIZATIONS = 16
+
+
+def ParseAgent(Spec: str) -> tuple:
+    """
+    Parses an agent from the command line: "greedy", "intermediate", "mcts[:budget]" or "ismcts[:budget]".
+
+    Returns:
+        tuple: (name, budget).
+    """
+
+    Name, _, Budget = Spec.partition(":")
+    if Name not in AGENTS:
+        raise ValueError(f"Unknown agent {Name!r}, expected one of {', '.join(AGENTS)}.")
+
+    return Name, int(Budget) if Budget else 100
+
+
+def AgentName(Agent: tuple) -> str:
+    Name, Budget = Agent
+    return f"{Name}:{Budget}" if Name in ("mcts", "ismcts") else Name
+
+
+def Decide(
+    Agent: tuple,
+    GameState: ScoponeGameState
+    ) -> dict:
+    """
+    The move of an agent for the player to move in a GameState, which is left unchanged.
+
+    The rule-based agents only look at their hand and at the table (Intermediate also at the cards it has not seen);
+    "mcts" is AgentCarletto searching with every hand visible, "ismcts" its information-set search.
+    """
+
+    Name, Budget = Agent
+
+    if Name == "greedy":
+        return ScoponeMove(LegalMoves=GameState.Hand, Table=GameState.Table).GetMove(Greedy=True)
+
+    if Name == "intermediate":
+        Unseen = [card for player in range(4) if player != GameState.PlayerPosition for card in GameState.PlayersCards[player]]
+        return ScoponeMove(LegalMoves=GameState.Hand, Table=GameState.Table, Deck=Unseen).GetMove(Greedy=False)
+
+    Determinizations = ISMCTS_DETERMINIZATIONS if Name == "ismcts" else 0
+    return AgentCarletto(GameState, Budget, Determinizations=Determinizations).TreeSearch()
+
+
+## Game
+
+def DealGame(Seed: int) -> ScoponeGameState:
+    """
+    Deals the 40 cards (10 per player) with a fixed seed. Player 0 moves first.
+    """
+
+    deck = [(rank, suit) for suit in range(1, 5) for rank in range(1, 11)]
+    random.Random(Seed).shuffle(deck)
+
+    return ScoponeGameState(
+        PlayerPosition=0,
+        PlayersCards={player: deck[player * 10:(player + 1) * 10] for player in range(4)},
+        Team="Hand",
+        TeamScores={"Hand": 0, "Deck": 0},
+        Table=[],
+        Deck=[]
+    )
+
+
+def PlayGame(
+    Seats: list,
+    Seed: int
+    ) -> dict:
+    """
+    Plays a full game between four agents: Seats[p] plays for player p, players 0 and 2 are team "Hand", 1 and 3 team "Deck".
+    At the end, the cards left on the table go to the team of the last player that has taken (team "Deck" if nobody did).
+
+    Args:
+        Seats (list): the four agents, as (name, budget) pairs.
+        Seed (int): the seed of the deal and of the agents.
+
+    Returns:
+        dict: the seed, the final scores {"Hand": ..., "Deck": ...}, and the decisions of each agent {name: (count, seconds)}.
+    """
+
+    random.seed(Seed)
+    GameState = DealGame(Seed)
+    Decisions = dict()
+
+    for ply in range(40):
+        player = ply % 4
+        GameState.PlayerPosition = player
+        GameState.Team = "Hand" if player % 2 == 0 else "Deck"
+        GameState.Hand = GameState.PlayersCards[player]
+        GameState.Reward = GameState.ComputeRewards()
+
+        Start = time.perf_counter()
+        Move = Decide(Seats[player], GameState)
+        Elapsed = time.perf_counter() - Start
+
+        Count, Seconds = Decisions.get(AgentName(Seats[player]), (0, 0.0))
+        Decisions[AgentName(Seats[player])] = (Count + 1, Seconds + Elapsed)
+
+        GameState.DoMove(Move)
+
+    Scores = dict(GameState.TeamScores)
+    if isinstance(GameState.LastTaker, NAType):
+        TakeAllTeam = "Deck"
+    else:
+        TakeAllTeam = "Hand" if GameState.LastTaker % 2 == 0 else "Deck"
+    Scores[TakeAllTeam] += sum(convert_to_card(card).Value() for card in GameState.Table)
+
+    return {"Seed": Seed, "Scores": Scores, "Decisions": Decisions}
+
+
+## Tournament
+
+class TournamentStats(object):
+    """
+    Online statistics of a match between two agents A and B, updated game by game:
+
+    - the win rate of A (ties count half), with a 95% Wilson interval;
+    - the mean score difference A - B, with a 95% normal interval (Welford's running variance);
+    - games per second (wall clock) and, for each agent, decisions per second of decision time.
+    """
+
+    def __init__(self) -> None:
+        self.Games = 0
+        self.Wins = 0
+        self.Ties = 0
+        self.Mean = 0.0
+        self.M2 = 0.0
+        self.Decisions = dict()
+        self.Start = time.perf_counter()
+
+    def Update(
+        self,
+        Difference: int,
+        Decisions: dict
+        ) -> None:
+        """
+        Adds a game, with the score difference A - B and the decisions {name: (count, seconds)} of its agents.
+        """
+
+        self.Games += 1
+        self.Wins += Difference > 0
+        self.Ties += Difference == 0
+
+        Delta = Difference - self.Mean
+        self.Mean += Delta / self.Games
+        self.M2 += Delta * (Difference - self.Mean)
+
+        for Name, (Count, Seconds) in Decisions.items():
+            Total, Elapsed = self.Decisions.get(Name, (0, 0.0))
+            self.Decisions[Name] = (Total + Count, Elapsed + Seconds)
+
+    def WinRate(self) -> tuple:
+        """
+        Returns:
+            tuple: the win rate of A and its 95% Wilson interval.
+        """
+
+        n = self.Games
+        if n == 0:
+            return 0.0, 0.0, 1.0
+
+        z = 1.96
+        p = (self.Wins + 0.5 * self.Ties) / n
+        Center = (p + z * z / (2 * n)) / (1 + z * z / n)
+        Half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+
+        return p, max(0.0, Center - Half), min(1.0, Center + Half)
+
+    def ScoreDifference(self) -> tuple:
+        """
+        Returns:
+            tuple: the mean score difference A - B and its 95% interval.
+        """
+
+        if self.Games < 2:
+            return self.Mean, float("-inf"), float("inf")
+
+        Half = 1.96 * math.sqrt(self.M2 / (self.Games - 1) / self.Games)
+        return self.Mean, self.Mean - Half, self.Mean + Half
+
+    def Summary(self) -> dict:
+        Elapsed = time.perf_counter() - self.Start
+        WinRate, WinLow, WinHigh = self.WinRate()
+        Difference, DifferenceLow, DifferenceHigh = self.ScoreDifference()
+
+        Summary = {
+            "games": self.Games,
+            "win rate": WinRate,
+            "win rate 95% CI": (WinLow, WinHigh),
+            "score difference": Difference,
+            "score difference 95% CI": (DifferenceLow, DifferenceHigh),
+            "games/s": self.Games / Elapsed if Elapsed > 0 else 0.0,
+        }
+        for Name, (Count, Seconds) in sorted(self.Decisions.items()):
+            Summary[f"{Name} decisions/s"] = Count / Seconds if Seconds > 0 else float("inf")
+
+        return Summary
+
+
+def _PlayMatchGame(
+    AgentA: tuple,
+    AgentB: tuple,
+    Game: int,
+    Seed: int
+    ) -> tuple:
+    """
+    Plays game number Game of a match: each deal is played twice, with A as team "Hand" and then as team "Deck".
+
+    Returns:
+        tuple: the score difference A - B and the decisions of the game.
+    """
+
+    AFirst = Game % 2 == 0
+    Seats = [AgentA, AgentB, AgentA, AgentB] if AFirst else [AgentB, AgentA, AgentB, AgentA]
+    Result = PlayGame(Seats, Seed + Game // 2)
+
+    Difference = Result["Scores"]["Hand"] - Result["Scores"]["Deck"]
+    return (Difference if AFirst else -Difference), Result["Decisions"]
+
+
+def Tournament(
+    AgentA: tuple,
+    AgentB: tuple,
+    Games: int,
+    Workers: int = os.cpu_count(),
+    Seed: int = 0
+    ):
+    """
+    Plays Games games between A and B (rotating their seats on each deal) over a pool of Workers processes,
+    yielding the running TournamentStats after every finished game. With one worker, the games are played in this process.
+
+    Args:
+        AgentA (tuple): the first agent, as a (name, budget) pair (see ParseAgent).
+        AgentB (tuple): the second agent.
+        Games (int): the number of games.
+        Workers (int, optional): the number of worker processes. Defaults to the number of CPUs.
+        Seed (int, optional): the seed of the first deal. Defaults to 0.
+
+    Yields:
+        TournamentStats: the statistics so far.
+    """
+
+    Stats = TournamentStats()
+
+    if Workers <= 1:
+        for Game in range(Games):
+            Stats.Update(*_PlayMatchGame(AgentA, AgentB, Game, Seed))
+            yield Stats
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=Workers) as Pool:
+        Futures = [Pool.submit(_PlayMatchGame, AgentA, AgentB, Game, Seed) for Game in range(Games)]
+        for Future in concurrent.futures.as_completed(Futures):
+            Stats.Update(*Future.result())
+            yield Stats
+
+
+def FormatSummary(Summary: dict) -> str:
+    Parts = []
+    for key, value in Summary.items():
+        if isinstance(value, tuple):
+            Parts.append(f"{key}: [{value[0]:.3f}, {value[1]:.3f}]")
+        elif isinstance(value, float):
+            Parts.append(f"{key}: {value:.3f}")
+        else:
+            Parts.append(f"{key}: {value}")
+    return ", ".join(Parts)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Self-play tournament between two Scopone agents.")
+    parser.add_argument("a", help="greedy, intermediate, mcts[:budget] or ismcts[:budget]")
+    parser.add_argument("b", help="greedy, intermediate, mcts[:budget] or ismcts[:budget]")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--every", type=int, default=10, help="print the running statistics every N games")
+    args = parser.parse_args()
+
+    for Stats in Tournament(ParseAgent(args.a), ParseAgent(args.b), args.games, args.workers, args.seed):
+        if Stats.Games % args.every == 0 or Stats.Games == args.games:
+            print(FormatSummary(Stats.Summary()), flush=True)
@@ -0,0 +1,239 @@
+import argparse
+import array
+import os
+
+import numpy as np
+
+from Bitboard import ALL_CARDS, CARD_BITS, DecodeMask
+from MCTS import ROLLOUT_ENDGAME, ROLLOUT_FINISHED, convert_to_card
+
+
+## Trace Records
+
+# A rollout is stored as a fixed-width record: the moves played (by the agent and by the other players, at most 40),
+# each as the id of the card played (see Bitboard.ALL_CARDS) and the mask of the cards taken (0 for a card placed).
+MAX_MOVES = 40
+NO_CARD = 255
+
+# How a rollout ended: at the end of the game, or solved exactly (AgentCarletto.EndgameCards).
+# Code 1, a cutoff on a transposition table, is only found in older traces.
+FINISHED, ENDGAME = ROLLOUT_FINISHED, ROLLOUT_ENDGAME
+STOPS = ("finished", "transposition", "endgame")
+
+RECORD = np.dtype([
+    ("Sequence", np.uint64),            # 1 for the first rollout recorded in the file, 0 for an empty slot.
+    ("Reward", np.float64),             # the reward of the rollout, for the team of the agent.
+    ("Player", np.uint8),               # the player to move when the rollout started.
+    ("Cards", np.uint8),                # the cards left in the hands when the rollout started.
+    ("Length", np.uint8),               # the number of moves.
+    ("Stop", np.uint8),                 # FINISHED or ENDGAME.
+    ("Played", np.uint8, (MAX_MOVES,)),
+    ("Taken", np.uint64, (MAX_MOVES,)),
+])
+
+# Card ids of both (rank, suit) tuples and Card objects (a Card hashes as its id, not as its tuple).
+CARD_IDS = {**CARD_BITS, **{convert_to_card(card): index for card, index in CARD_BITS.items()}}
+
+
+def EncodeMoves(Moves: list) -> tuple:
+    """
+    Converts moves {card to be played: card or cards to be taken} into the Played and Taken fields of a record, as bytes:
+    the card ids and the masks of the cards taken, padded to MAX_MOVES.
+    """
+
+    played = bytearray([NO_CARD]) * MAX_MOVES
+    taken = array.array("Q", bytes(8 * MAX_MOVES))
+
+    for index, move in enumerate(Moves):
+        card, pick = next(iter(move.items()))
+        if isinstance(pick, list):
+            mask = 0
+            for other in pick:
+                mask |= 1 << CARD_IDS[other]
+        else:
+            mask = 1 << CARD_IDS[pick]
+        played[index] = CARD_IDS[card]
+        taken[index] = mask
+
+    return bytes(played), taken.tobytes()
+
+
+## `RolloutTracer`
+
+class RolloutTracer(object):
+    """
+    Records the rollouts of AgentCarletto (see its Tracer argument) into a ring buffer of Capacity fixed-width records
+    (see RECORD), memory-mapped from a file on local disk: once the buffer is full, the oldest rollouts are overwritten.
+
+    Records are encoded as they come and written Block at a time; Flush writes the pending ones (TreeSearch flushes at
+    the end of every search) and Close writes the file back to disk. An existing trace file of the same Capacity is
+    appended to; any other existing file is only replaced with Overwrite. A file should be written by one process at
+    a time: give each worker its own.
+    """
+
+    def __init__(
+        self,
+        Path: str,
+        Capacity: int = 1 << 16,
+        Block: int = 256,
+        Overwrite: bool = False
+        ) -> None:
+        """
+        Args:
+            Path (str): the trace file.
+            Capacity (int, optional): the number of rollouts kept. Defaults to 65536 (about 25 MB).
+            Block (int, optional): the number of records written at once. Defaults to 256.
+            Overwrite (bool, optional): replace an existing file whose size is not that of a trace of this Capacity
+                (another Capacity, or not a trace). Defaults to False: a ValueError is raised instead.
+        """
+
+        self.Path = Path
+        self.Capacity = Capacity
+        self.Block = Block
+        self.Pending = list()
+
+        Exists = os.path.exists(Path)
+        if Exists and os.path.getsize(Path) == Capacity * RECORD.itemsize:
+            self.Records = np.memmap(Path, dtype=RECORD, mode="r+", shape=(Capacity,))
+            self.Count = int(self.Records["Sequence"].max())
+        else:
+            if Exists and not Overwrite:
+                raise ValueError(
+                    f"{Path} is not a trace of {Capacity} rollouts ({os.path.getsize(Path)} bytes): "
+                    "pass Overwrite=True to replace it."
+                )
+            self.Records = np.memmap(Path, dtype=RECORD, mode="w+", shape=(Capacity,))
+            self.Count = 0
+
+    def __len__(self) -> int:
+        return min(self.Count + len(self.Pending), self.Capacity)
+
+    def Record(
+        self,
+        Moves: list,
+        Reward: float,
+        Player: int,
+        Cards: int,
+        Stop: int = FINISHED
+        ) -> None:
+        """
+        Records a rollout: its moves, in the format of ScoponeGameState.DoMove, its reward, the player to move and
+        the number of cards in the hands at its start, and how it ended.
+        """
+
+        self.Pending.append((Reward, Player, Cards, Stop, len(Moves), *EncodeMoves(Moves)))
+        if len(self.Pending) >= self.Block:
+            self.Flush()
+
+    def Flush(self) -> None:
+        """
+        Writes the pending records into the buffer.
+        """
+
+        if not self.Pending:
+            return
+
+        Count = len(self.Pending)
+        Rewards, Players, Cards, Stops, Lengths, Played, Taken = zip(*self.Pending)
+
+        Block = np.empty(Count, dtype=RECORD)
+        Block["Sequence"] = np.arange(self.Count + 1, self.Count + Count + 1)
+        Block["Reward"] = Rewards
+        Block["Player"] = Players
+        Block["Cards"] = Cards
+        Block["Length"] = Lengths
+        Block["Stop"] = Stops
+        Block["Played"] = np.frombuffer(b"".join(Played), dtype=np.uint8).reshape(Count, MAX_MOVES)
+        Block["Taken"] = np.frombuffer(b"".join(Taken), dtype=np.uint64).reshape(Count, MAX_MOVES)
+
+        self.Records[(self.Count + np.arange(Count)) % self.Capacity] = Block
+        self.Count += Count
+        self.Pending.clear()
+
+    def Close(self) -> None:
+        """
+        Writes the pending records, and the buffer to disk.
+        """
+
+        self.Flush()
+        self.Records.flush()
+
+    def Stats(self) -> dict:
+        """
+        Returns the tracer counters.
+        """
+
+        return {
+            "Recorded": self.Count + len(self.Pending),
+            "Kept": len(self),
+            "Overwritten": max(0, self.Count + len(self.Pending) - self.Capacity),
+            "Capacity": self.Capacity,
+        }
+
+
+## Reader
+
+def ReadTrace(Path: str) -> np.ndarray:
+    """
+    Reads a trace file (see RolloutTracer).
+
+    Returns:
+        np.ndarray: the records kept, oldest first (a view on the memory-mapped file).
+    """
+
+    Records = np.memmap(Path, dtype=RECORD, mode="r")
+    Records = Records[Records["Sequence"] > 0]
+
+    return Records[np.argsort(Records["Sequence"], kind="stable")]
+
+
+def TraceMoves(Record) -> list:
+    """
+    The moves of a record, as (card played, cards taken) in (rank, suit) tuples.
+    """
+
+    return [
+        (ALL_CARDS[Record["Played"][move]], DecodeMask(int(Record["Taken"][move])))
+        for move in range(Record["Length"])
+    ]
+
+
+def TraceSummary(Records: np.ndarray) -> dict:
+    """
+    Aggregates the records of a trace: their rewards and lengths, how they ended, and how often the moves took cards.
+    """
+
+    if len(Records) == 0:
+        return {"rollouts": 0}
+
+    Lengths = Records["Length"].astype(np.int64)
+    Played = np.arange(MAX_MOVES) < Lengths[:, None]
+    Taking = (Records["Taken"] != 0) & Played
+
+    Summary = {
+        "rollouts": len(Records),
+        "mean reward": float(Records["Reward"].mean()),
+        "min reward": float(Records["Reward"].min()),
+        "max reward": float(Records["Reward"].max()),
+        "mean length": float(Lengths.mean()),
+        "captures per move": float(Taking.sum() / max(1, Played.sum())),
+    }
+    for Stop, Name in enumerate(STOPS):
+        Summary[f"stopped: {Name}"] = int((Records["Stop"] == Stop).sum())
+
+    return Summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarizes a trace of rollouts.")
+    parser.add_argument("path")
+    parser.add_argument("--show", type=int, default=0, help="print the moves of the last N rollouts")
+    args = parser.parse_args()
+
+    Records = ReadTrace(args.path)
+    for key, value in TraceSummary(Records).items():
+        print(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}")
+
+    for Record in Records[len(Records) - args.show:] if args.show else []:
+        Moves = ", ".join(f"{card}x{list(taken)}" if taken else f"{card}" for card, taken in TraceMoves(Record))
+        print(f"#{Record['Sequence']} reward {Record['Reward']:.0f} ({STOPS[Record['Stop']]}): {Moves}")
@@ -0,0 +1,44 @@
+import os
+import random
+import sys
+
+import pytest
+
+# The modules are imported by name from the directory above, as the notebooks do.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def NextPlayer(GameState) -> None:
+    """
+    Passes the turn to the next player, as Tournament.PlayGame does between moves.
+    """
+
+    GameState.PlayerPosition = (GameState.PlayerPosition + 1) % 4
+    GameState.Team = "Hand" if GameState.PlayerPosition % 2 == 0 else "Deck"
+    GameState.Hand = GameState.PlayersCards[GameState.PlayerPosition]
+    GameState.Reward = GameState.ComputeRewards()
+
+
+def RandomGame(seed: int) -> list:
+    """
+    The positions of a seeded game of random moves, each with the move played from it.
+    """
+
+    import MCTS
+    import Tournament
+
+    rng = random.Random(seed)
+    GameState = Tournament.DealGame(seed)
+    positions = []
+    while not GameState.IsTerminal():
+        move = rng.choice(list(MCTS.unpack_moves(GameState.GetAvailableMoves())))
+        positions.append((GameState.CloneState(), move))
+        GameState.DoMove(move)
+        NextPlayer(GameState)
+
+    return positions
+
+
+@pytest.fixture(params=range(4))
+def game(request) -> list:
+    return RandomGame(request.param)
@@ -0,0 +1,40 @@
+import pytest
+
+import Benchmarks
+import Endgame
+import MCTS
+from conftest import NextPlayer
+
+
+def Endgames(cards: int, count: int = 12) -> list:
+    """
+    Positions with `cards` cards left in the hands: from random games, and dealt with 4 and 10 cards on the table.
+    """
+
+    plies = 10 - cards // 4
+    return ([Benchmarks.MidGameState(seed, plies) for seed in range(count)]
+            + [Benchmarks.EndgameState(seed, cards, table) for table in (4, 10) for seed in range(count)])
+
+
+@pytest.mark.parametrize("cards", [4, Endgame.MAX_CARDS])
+def test_solver_matches_brute_force(cards):
+    for GameState in Endgames(cards):
+        before = GameState.CloneState()
+        reward, move = Endgame.EndgameSolver().Solve(GameState)
+        assert GameState == before
+
+        sign = 1 if GameState.Team == "Hand" else -1
+        assert reward == Benchmarks.PlainMinimax(GameState.CloneState()) * sign
+
+        # The best move is a legal one, and reaches the same value.
+        assert MCTS.move_key(move) in {MCTS.move_key(other) for other in MCTS.unpack_moves(GameState.GetAvailableMoves())}
+        GameState.DoMove(move)
+        NextPlayer(GameState)
+        assert Benchmarks.PlainMinimax(GameState) * sign == reward
+
+
+def test_shared_solver_memo():
+    solver = Endgame.EndgameSolver()
+    rewards = [solver.Solve(GameState)[0] for GameState in Endgames(8)]
+    assert rewards == [Endgame.EndgameSolver().Solve(GameState)[0] for GameState in Endgames(8)]
+    assert solver.Stats()["Hits"] > 0
@@ -0,0 +1,105 @@
+import random
+
+import pytest
+
+import Benchmarks
+import Bitboard
+import MCTS
+from conftest import NextPlayer
+
+
+def MoveKeys(GameState) -> set:
+    return {MCTS.move_key(move) for move in MCTS.unpack_moves(GameState.GetAvailableMoves())}
+
+
+def Snapshot(GameState) -> tuple:
+    """
+    Everything DoMove changes in a ScoponeGameState.
+    """
+
+    return (
+        {player: list(cards) for player, cards in GameState.PlayersCards.items()},
+        list(GameState.Table),
+        dict(GameState.TeamScores),
+        repr(GameState.LastTaker),
+        GameState.Reward,
+        GameState.ZobristKey,
+        hash(GameState),
+    )
+
+
+## Move generation
+
+@pytest.mark.parametrize("size", range(0, 13))
+def test_combinations_match_itertools(size):
+    for seed in range(20):
+        table = Benchmarks.RandomTable(size, seed)
+        combinations = MCTS.ScoponeMove.GetCombinations(table)
+        legacy = Benchmarks.LegacyCombinations(table)
+        for total in range(1, 11):
+            found = {frozenset(MCTS.convert_to_card(card).Id for card in combination) for combination in combinations.get(total, [])}
+            expected = {frozenset(MCTS.convert_to_card(card).Id for card in combination) for combination in legacy[total]}
+            assert found == expected
+
+
+def test_bitboard_moves_match(game):
+    for GameState, _ in game:
+        Board = Bitboard.BitboardGameState.FromGameState(GameState)
+        expected = MoveKeys(GameState)
+        assert MoveKeys(Board) == expected
+        assert {MCTS.move_key(Bitboard.MaskMoveToDict(*move)) for move in Board.GetMaskMoves()} == expected
+
+
+def test_greedy_masks_match_greedy(game):
+    for GameState, _ in game:
+        Board = Bitboard.BitboardGameState.FromGameState(GameState)
+        hand, table = Bitboard.DecodeMask(Board.Hands[Board.PlayerPosition]), Bitboard.DecodeMask(Board.TableMask)
+        expected = MCTS.ScoponeMove(LegalMoves=hand, Table=table).GetMove(Greedy=True)
+        assert MCTS.move_key(Bitboard.MaskMoveToDict(*Board.GetGreedyMaskMove())) == MCTS.move_key(expected)
+
+
+## Make / unmake
+
+def test_undo_restores_scopone_state(game):
+    for GameState, _ in game:
+        before = Snapshot(GameState)
+        for move in MCTS.unpack_moves(GameState.GetAvailableMoves()):
+            Undo = GameState.DoMove(move)
+            assert GameState.ZobristKey == MCTS.zobrist_key(GameState.PlayersCards, GameState.Table, GameState.TeamScores)
+            GameState.UndoMove(Undo)
+            assert Snapshot(GameState) == before
+
+
+def test_undo_restores_bitboard_state(game):
+    for GameState, _ in game:
+        Board = Bitboard.BitboardGameState.FromGameState(GameState)
+        before = Board.CloneState()
+        for played, pick in Board.GetMaskMoves():
+            Undo = Board.DoMaskMove(played, pick)
+            Board.UndoMove(Undo)
+            assert Board == before
+            assert hash(Board) == hash(before)
+            assert Board.TeamScores == before.TeamScores and Board.Reward == before.Reward
+
+
+def test_bitboard_follows_scopone_game(game):
+    Board = Bitboard.BitboardGameState.FromGameState(game[0][0])
+    for GameState, move in game:
+        assert Board == Bitboard.BitboardGameState.FromGameState(GameState)
+        assert Board.Reward == GameState.Reward
+        Board.DoMove(move)
+        NextPlayer(Board)
+
+
+def test_random_rollout_undo_log():
+    random.seed(0)
+    GameState = Benchmarks.DealGameState(0, Bitboard.BitboardGameState)
+    before = GameState.CloneState()
+    agent = MCTS.AgentCarletto(GameState)
+    WorkingState = agent.GetWorkingState()
+    UndoLog = []
+    agent.Rollout(WorkingState, UndoLog)
+    assert WorkingState.IsTerminal()
+    for Undo in reversed(UndoLog):
+        WorkingState.UndoMove(Undo)
+    assert WorkingState == before
@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+import Benchmarks
+import Greedy_MOD
+import Intermediate
+import PolicyCache
+
+
+def Positions(count: int = 300, seed: int = 0) -> list:
+    return [(hand, table, [card for card in Greedy_MOD.values if card not in hand and card not in table])
+            for hand, table in Benchmarks.GreedyPositions(count, seed)]
+
+
+## Tie sets
+
+@pytest.mark.parametrize("name, options, policy", [
+    ("Greedy", lambda hand, table, unseen: PolicyCache.GreedyOptions(hand, table),
+     lambda hand, table, unseen: Greedy_MOD.Greedy(hand, table, True)),
+    ("Intermediate", lambda hand, table, unseen: PolicyCache.IntermediateOptions(hand, table, unseen),
+     lambda hand, table, unseen: Intermediate.Intermediate(hand, table, unseen, True)),
+])
+def test_every_tied_card_is_a_decision(name, options, policy):
+    """
+    Whichever of the tied cards comes first in the hand is the one the policy plays, and no other card is ever played.
+    """
+
+    for hand, table, unseen in Positions():
+        Kind, Tied, Pool, Empty = options(hand, table, unseen)
+        assert Tied and all(card in hand for card in Tied)
+        if Kind == PolicyCache.PLACE and Pool is not None:
+            # Ties broken by the iteration order of a set, not by the hand.
+            assert policy(hand, table, unseen) in Tied
+            continue
+        for card in Tied:
+            reordered = [card] + [other for other in hand if other != card]
+            assert policy(reordered, table, unseen) == card
+
+
+## `DecisionCache`
+
+@pytest.mark.parametrize("Standalone", [True, False])
+def test_cached_decisions_match(Standalone):
+    rng = random.Random(0)
+    cache = PolicyCache.DecisionCache(Size=64)
+    for hand, table, unseen in Positions():
+        # The same position with reshuffled hands, so that ties are broken differently on hits.
+        for _ in range(3):
+            hand = list(hand)
+            rng.shuffle(hand)
+            assert cache.Greedy(hand, table, Standalone) == Greedy_MOD.Greedy(hand, table, Standalone)
+            assert (cache.Intermediate(hand, table, unseen, Standalone)
+                    == Intermediate.Intermediate(hand, table, unseen, Standalone))
+
+    stats = cache.Stats()
+    assert stats["Entries"] == 64
+    assert stats["Evictions"] > 0 and stats["Hits"] > 0
+
+
+def test_other_values_are_not_cached():
+    values = dict(Greedy_MOD.values)
+    cache = PolicyCache.DecisionCache()
+    for hand, table, unseen in Positions(50):
+        assert cache.Greedy(hand, table, False, values) == Greedy_MOD.Greedy(hand, table, False, values)
+    assert len(cache) == 0
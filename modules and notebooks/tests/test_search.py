@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+import Benchmarks
+import Bitboard
+import MCTS
+import Tournament
+from conftest import NextPlayer
+
+
+def LegalKeys(GameState) -> set:
+    return {MCTS.move_key(move) for move in MCTS.unpack_moves(GameState.GetAvailableMoves())}
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_carried_visit_with_few_determinizations(seed):
+    """
+    Regression: with a budget of 5, 4 determinizations and a tree carried over by Advance (1 visit), the second search
+    of the game, with 9 cards in hand, used to run out of iterations before expanding the root and returned None.
+    """
+
+    random.seed(seed)
+    GameState = Tournament.DealGame(seed)
+    agent = MCTS.AgentCarletto(GameState, 5, Determinizations=4, ReuseTree=True)
+    move = agent.TreeSearch()
+    assert MCTS.move_key(move) in LegalKeys(GameState)
+
+    GameState.DoMove(move)
+    for _ in range(4):
+        NextPlayer(GameState)
+        if GameState.PlayerPosition != 0:
+            GameState.DoMove(Tournament.Decide(("greedy", 0), GameState))
+
+    assert len(GameState.Hand) == 9
+    assert agent.Advance(GameState, move) == 1
+    move = agent.TreeSearch()
+    assert move is not None
+    assert MCTS.move_key(move) in LegalKeys(GameState)
+
+
+def test_no_move_in_a_finished_game():
+    GameState = Benchmarks.EndgameState(0, 0, 3)
+    assert MCTS.AgentCarletto(GameState, 5).TreeSearch() is None
+
+
+@pytest.mark.parametrize("plies", [0, 2, 5])
+def test_mask_rollouts_match_move_rollouts(plies):
+    """
+    On a BitboardGameState, rollouts played through the mask moves take the same decisions as through move dicts.
+    """
+
+    GameState = Bitboard.BitboardGameState.FromGameState(Benchmarks.MidGameState(plies, plies))
+    searches = []
+    for masks in (True, False):
+        agent = MCTS.AgentCarletto(GameState, 30)
+        assert agent.MaskMoves
+        agent.MaskMoves = masks
+        random.seed(plies)
+        move = agent.TreeSearch()
+        searches.append((MCTS.move_key(move), [(child.Visits, child.TotalReward) for child in agent.Root.Children]))
+        assert agent.GetWorkingState() == GameState
+
+    assert searches[0] == searches[1]
@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+import Benchmarks
+import Bitboard
+import MCTS
+import Trace
+
+
+def test_moves_round_trip(game, tmp_path):
+    moves = [move for _, move in game]
+    Path = str(tmp_path / "rollouts.trace")
+    tracer = Trace.RolloutTracer(Path, Capacity=8, Block=2)
+    tracer.Record(moves, 3.0, 0, 40)
+    tracer.Close()
+
+    (Record,) = Trace.ReadTrace(Path)
+    assert (Record["Reward"], Record["Player"], Record["Cards"], Record["Stop"]) == (3.0, 0, 40, Trace.FINISHED)
+    assert [MCTS.move_key({card: taken}) for card, taken in Trace.TraceMoves(Record)] == list(map(MCTS.move_key, moves))
+
+
+def test_ring_buffer_keeps_the_last_rollouts(tmp_path):
+    Path = str(tmp_path / "rollouts.trace")
+    tracer = Trace.RolloutTracer(Path, Capacity=4, Block=3)
+    for reward in range(6):
+        tracer.Record([], float(reward), 0, 0)
+    tracer.Close()
+    assert tracer.Stats() == {"Recorded": 6, "Kept": 4, "Overwritten": 2, "Capacity": 4}
+
+    # An existing trace of the same Capacity is appended to.
+    tracer = Trace.RolloutTracer(Path, Capacity=4)
+    tracer.Record([], 6.0, 0, 0)
+    tracer.Close()
+    assert list(Trace.ReadTrace(Path)["Reward"]) == [3.0, 4.0, 5.0, 6.0]
+
+
+def test_other_files_need_overwrite(tmp_path):
+    Path = tmp_path / "rollouts.trace"
+    Path.write_bytes(b"not a trace")
+    with pytest.raises(ValueError):
+        Trace.RolloutTracer(str(Path), Capacity=4)
+    assert Path.read_bytes() == b"not a trace"
+
+    tracer = Trace.RolloutTracer(str(Path), Capacity=4, Overwrite=True)
+    tracer.Close()
+    assert len(Trace.ReadTrace(str(Path))) == 0
+
+
+def test_traced_rollouts_replay(tmp_path):
+    """
+    The moves of a traced rollout, replayed from the position it started from, end the game with the reward recorded.
+    """
+
+    Path = str(tmp_path / "rollouts.trace")
+    random.seed(0)
+    GameState = Benchmarks.MidGameState(0, 2, Bitboard.BitboardGameState)
+    tracer = Trace.RolloutTracer(Path, Capacity=64)
+    agent = MCTS.AgentCarletto(GameState, Tracer=tracer)
+    WorkingState = agent.GetWorkingState()
+    for _ in range(20):
+        UndoLog = []
+        agent.Rollout(WorkingState, UndoLog)
+        for Undo in reversed(UndoLog):
+            WorkingState.UndoMove(Undo)
+    tracer.Close()
+
+    Records = Trace.ReadTrace(Path)
+    assert len(Records) == 20
+    for Record in Records:
+        assert (Record["Player"], Record["Cards"], Record["Length"]) == (0, 32, 32)
+        Replay = GameState.CloneState()
+        for ply, (card, taken) in enumerate(Trace.TraceMoves(Record)):
+            Replay.PlayerPosition = ply % 4
+            Replay.Team = "Hand" if ply % 2 == 0 else "Deck"
+            Replay.DoMaskMove(1 << Bitboard.CardBit(card), Bitboard.EncodeCards(taken))
+        Replay.PlayerPosition, Replay.Team = 0, "Hand"
+        assert Replay.IsTerminal()
+        assert agent.FinalReward(Replay) == Record["Reward"]